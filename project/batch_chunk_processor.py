@@ -1,10 +1,22 @@
 import argparse
+import hashlib
 import os
 import json
 import logging
-from milvus_rag_handler import MilvusRAGHandler
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from milvus_rag_handler import close_handlers, get_handler
 from tqdm import tqdm
-from chunk_processor import process_markdown_file
+from chunk_processor import (
+    CHUNK_FILE_SUFFIXES,
+    CHUNKER_VERSION,
+    count_chunk_file,
+    iter_chunk_file,
+    iter_markdown_chunks,
+    process_markdown_file,
+    write_chunks_jsonl
+)
 
 # Configure logging
 logging.basicConfig(
@@ -13,8 +25,212 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def process_directory(input_dir: str, output_dir: str) -> None:
-    """Process all markdown files in input directory and save chunks to output directory."""
+MANIFEST_FILENAME = "manifest.json"
+DEFAULT_MAX_TOKENS = 1024
+
+def file_hash(file_path: str) -> str:
+    """Return the SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(output_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Load the chunk manifest from the output directory.
+    
+    The manifest maps each source filename to the content hash, chunker
+    version, token budget and output path of its last successful chunking
+    run, and whether that output has been ingested into Milvus.
+    """
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    if not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r') as f:
+            return json.load(f).get("files", {})
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable manifest {manifest_path}: {str(e)}")
+        return {}
+
+def save_manifest(output_dir: str, entries: Dict[str, Dict[str, Any]]) -> None:
+    """Atomically write the chunk manifest to the output directory."""
+    manifest_path = os.path.join(output_dir, MANIFEST_FILENAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({"files": dict(sorted(entries.items()))}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def is_up_to_date(
+    entry: Optional[Dict[str, Any]],
+    content_hash: str,
+    max_tokens: Optional[int],
+    output_file: str
+) -> bool:
+    """Check whether a manifest entry matches the current source and chunker."""
+    return (
+        entry is not None
+        and entry.get("sha256") == content_hash
+        and entry.get("chunker_version") == CHUNKER_VERSION
+        and entry.get("max_tokens") == max_tokens
+        and entry.get("output") == output_file
+        and os.path.exists(output_file)
+    )
+
+def _remove_stale_outputs(output_file: str, entry: Optional[Dict[str, Any]] = None) -> List[str]:
+    """
+    Delete other chunk files for the same chapter as output_file.
+    
+    These are the chapter's chunk file in the other output format and the
+    output recorded in its previous manifest entry, so switching --format
+    does not leave two copies for update-knowledge to ingest. Returns the
+    paths removed.
+    """
+    stem = output_file.rsplit("_chunks.", 1)[0]
+    candidates = [stem + suffix for suffix in CHUNK_FILE_SUFFIXES]
+    if entry and entry.get("output"):
+        candidates.append(entry["output"])
+    removed = []
+    for path in candidates:
+        if path != output_file and path not in removed and os.path.exists(path):
+            os.remove(path)
+            removed.append(path)
+    return removed
+
+def chunk_file(
+    file_path: str,
+    output_file: str,
+    output_format: str = "json",
+    validate: bool = True,
+    max_tokens: Optional[int] = None
+) -> int:
+    """
+    Chunk one markdown file and write its chunk file.
+    
+    JSONL output is written incrementally as chunks are produced; JSON
+    output is written as one indented array. Returns the number of chunks.
+    """
+    if output_format == "jsonl":
+        chunks = iter_markdown_chunks(file_path, validate=validate, max_tokens=max_tokens)
+        return write_chunks_jsonl(chunks, output_file)
+    
+    chunks = process_markdown_file(file_path, validate=validate, max_tokens=max_tokens)
+    with open(output_file, 'w') as f:
+        json.dump(chunks, f, indent=2)
+    return len(chunks)
+
+def iter_chunked_files(
+    jobs: List[Tuple[str, str]],
+    workers: int = 1,
+    **options: Any
+) -> Iterator[Tuple[str, str, Optional[int], Optional[Exception]]]:
+    """
+    Run chunk_file for (file_path, output_file) jobs and yield
+    (file_path, output_file, chunk_count, error) in the order given.
+
+    With workers > 1 the files are fanned out over a process pool; results
+    are still yielded in input order so output is deterministic.
+    """
+    if workers <= 1:
+        for file_path, output_file in jobs:
+            try:
+                yield file_path, output_file, chunk_file(file_path, output_file, **options), None
+            except Exception as e:
+                yield file_path, output_file, None, e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(chunk_file, file_path, output_file, **options)
+            for file_path, output_file in jobs
+        ]
+        for (file_path, output_file), future in zip(jobs, futures):
+            try:
+                yield file_path, output_file, future.result(), None
+            except Exception as e:
+                yield file_path, output_file, None, e
+
+def _milvus_error_file(output_file: str) -> str:
+    """Path of the Milvus ingestion error placeholder for a chunk file."""
+    return os.path.splitext(output_file)[0] + '_milvus_error.txt'
+
+def _write_milvus_error(output_file: str, error: Exception) -> None:
+    """Create error placeholder for a Milvus ingestion failure."""
+    error_file = _milvus_error_file(output_file)
+    with open(error_file, 'w') as f:
+        f.write(f"Milvus ingestion error: {str(error)}")
+    logger.info(f"Created Milvus error placeholder at {error_file}")
+
+def ingest_chunks(produced: Dict[str, int]) -> Dict[str, Any]:
+    """
+    Ingest the chunk files produced in this run, mapped to their chunk
+    counts, into Milvus with the shared handler (see get_handler).
+    """
+    stats = {"files": 0, "inserted": 0, "errors": 0, "seconds": 0.0, "failed": []}
+    if not produced:
+        return stats
+    
+    start = time.perf_counter()
+    try:
+        handler = get_handler()
+    except Exception as e:
+        logger.error(f"Milvus connection failed: {str(e)}")
+        for output_file in produced:
+            _write_milvus_error(output_file, e)
+        stats["errors"] = len(produced)
+        stats["failed"] = list(produced)
+        return stats
+    
+    for output_file, chunk_count in tqdm(produced.items(), desc="Ingesting chapters"):
+        try:
+            stats["inserted"] += handler.insert_chunks(
+                iter_chunk_file(output_file), total_chunks=chunk_count
+            )
+            stats["files"] += 1
+            logger.info(f"Ingested {chunk_count} chunks from {output_file} into Milvus")
+            # Clear any placeholder left by a previous failed run
+            error_file = _milvus_error_file(output_file)
+            if os.path.exists(error_file):
+                os.remove(error_file)
+        except Exception as e:
+            logger.error(f"Milvus ingestion failed for {output_file}: {str(e)}")
+            _write_milvus_error(output_file, e)
+            stats["errors"] += 1
+            stats["failed"].append(output_file)
+    
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+def process_directory(
+    input_dir: str,
+    output_dir: str,
+    workers: int = 1,
+    ingest: bool = True,
+    force: bool = False,
+    validate: bool = True,
+    max_tokens: Optional[int] = DEFAULT_MAX_TOKENS,
+    output_format: str = "json"
+) -> Dict[str, int]:
+    """
+    Process all markdown files in input directory and save chunks to output directory.
+    
+    Chunking runs first for every changed file; the chunks produced are
+    then ingested into Milvus in a single stage when ingest is True. Files
+    whose content hash and chunker version match the manifest in the
+    output directory are skipped unless force is True; with ingest, an
+    unchanged file whose chunks never reached Milvus (a --no-ingest run or
+    a failed ingestion) is ingested from its existing chunk file without
+    re-chunking. Set validate to False to skip chunk validation on trusted
+    re-runs. Heading sections over max_tokens are split into sub-chunks;
+    None disables splitting. output_format is "json" (one indented array
+    per file) or "jsonl" (one chunk per line, written as chunks are
+    produced).
+    
+    Returns:
+        Mapping of output chunk file path to the number of chunks written
+        this run
+    """
     # Create output directory if it doesn't exist
     os.makedirs(output_dir, exist_ok=True)
     
@@ -27,35 +243,64 @@ def process_directory(input_dir: str, output_dir: str) -> None:
     
     logger.info(f"Found {len(md_files)} Markdown files to process")
     
-    # Process each file with progress bar
-    for filename in tqdm(md_files, desc="Processing chapters"):
+    # Skip files unchanged since the last run
+    manifest = load_manifest(output_dir)
+    hashes = {}
+    jobs = []
+    pending = {}
+    for filename in md_files:
         file_path = os.path.join(input_dir, filename)
         output_file = os.path.join(
             output_dir, 
-            f"{filename.split('-')[0]}_chunks.json"  # Use chapter number prefix
+            f"{filename.split('-')[0]}_chunks.{output_format}"  # Use chapter number prefix
         )
+        hashes[filename] = file_hash(file_path)
+        entry = manifest.get(filename)
+        if not force and is_up_to_date(entry, hashes[filename], max_tokens, output_file):
+            if ingest and not entry.get("ingested"):
+                pending[output_file] = filename
+            continue
+        jobs.append((file_path, output_file))
+    logger.info(
+        f"{len(md_files) - len(jobs)} unchanged files skipped, {len(jobs)} to chunk, "
+        f"{len(pending)} unchanged files still to ingest"
+    )
+    
+    if workers > 1:
+        logger.info(f"Chunking with {workers} worker processes")
+    
+    results = iter_chunked_files(
+        jobs,
+        workers,
+        output_format=output_format,
+        validate=validate,
+        max_tokens=max_tokens
+    )
+    produced = {}
+    sources = {}
+    
+    # Process each file with progress bar
+    chunk_start = time.perf_counter()
+    for file_path, output_file, chunk_count, error in tqdm(results, total=len(jobs), desc="Processing chapters"):
+        filename = os.path.basename(file_path)
         
         try:
             logger.info(f"Processing {filename}")
-            chunks = process_markdown_file(file_path)
+            if error is not None:
+                raise error
             
-            # Save chunks to JSON file
-            with open(output_file, 'w') as f:
-                json.dump(chunks, f, indent=2)
             logger.info(f"Saved chunks to {output_file}")
-            
-            # Ingest into Milvus
-            try:
-                handler = MilvusRAGHandler()
-                handler.update_knowledge_base(knowledge_dir=output_dir)
-                logger.info(f"Ingested chunks for {filename} into Milvus")
-            except Exception as e:
-                logger.error(f"Milvus ingestion failed for {filename}: {str(e)}")
-                # Create error placeholder for Milvus failure
-                error_file = output_file.replace('.json', '_milvus_error.txt')
-                with open(error_file, 'w') as f:
-                    f.write(f"Milvus ingestion error: {str(e)}")
-                logger.info(f"Created Milvus error placeholder at {error_file}")
+            for stale_file in _remove_stale_outputs(output_file, manifest.get(filename)):
+                logger.info(f"Removed stale chunk file {stale_file}")
+            produced[output_file] = chunk_count
+            sources[output_file] = filename
+            manifest[filename] = {
+                "sha256": hashes[filename],
+                "chunker_version": CHUNKER_VERSION,
+                "max_tokens": max_tokens,
+                "output": output_file,
+                "ingested": False
+            }
                 
         except Exception as e:
             logger.error(f"Error processing {filename}: {str(e)}")
@@ -63,6 +308,36 @@ def process_directory(input_dir: str, output_dir: str) -> None:
             with open(output_file, 'w') as f:
                 json.dump({"error": str(e)}, f)
             logger.info(f"Created error placeholder at {output_file}")
+            manifest.pop(filename, None)
+    chunk_seconds = time.perf_counter() - chunk_start
+    
+    total_chunks = sum(produced.values())
+    logger.info(
+        f"Chunked {len(produced)} files into {total_chunks} chunks in {chunk_seconds:.2f}s "
+        f"({total_chunks / max(chunk_seconds, 1e-9):.1f} chunks/s)"
+    )
+    
+    # Ingest into Milvus, including unchanged files not yet ingested
+    if ingest:
+        to_ingest = {output_file: count_chunk_file(output_file) for output_file in pending}
+        to_ingest.update(produced)
+        sources.update(pending)
+        ingest_stats = ingest_chunks(to_ingest)
+        logger.info(
+            f"Inserted {ingest_stats['inserted']} chunks from {ingest_stats['files']} files "
+            f"in {ingest_stats['seconds']:.2f}s "
+            f"({ingest_stats['inserted'] / max(ingest_stats['seconds'], 1e-9):.1f} inserts/s, "
+            f"{ingest_stats['errors']} errors)"
+        )
+        # Files that failed ingestion stay un-ingested and are retried on
+        # the next run from their existing chunk files
+        failed = set(ingest_stats["failed"])
+        for output_file in to_ingest:
+            if output_file not in failed:
+                manifest[sources[output_file]]["ingested"] = True
+    
+    save_manifest(output_dir, manifest)
+    return produced
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
@@ -74,6 +349,28 @@ if __name__ == "__main__":
     parser.add_argument('--output-dir', 
                         default='chunks',
                         help='Output directory for JSON chunks')
+    parser.add_argument('--workers',
+                        type=int,
+                        default=1,
+                        help='Number of worker processes for chunking (default: 1)')
+    parser.add_argument('--no-ingest',
+                        action='store_true',
+                        help='Only write chunk files, skip Milvus ingestion')
+    parser.add_argument('--force',
+                        action='store_true',
+                        help='Re-chunk every file, ignoring the manifest')
+    parser.add_argument('--skip-validation',
+                        action='store_true',
+                        help='Skip chunk validation (trusted re-runs only)')
+    parser.add_argument('--max-tokens',
+                        type=int,
+                        default=DEFAULT_MAX_TOKENS,
+                        help='Token budget per chunk; larger sections are split '
+                             f'(default: {DEFAULT_MAX_TOKENS}, 0 disables)')
+    parser.add_argument('--format',
+                        choices=['json', 'jsonl'],
+                        default='json',
+                        help='Chunk file format; jsonl is written and read incrementally')
     
     args = parser.parse_args()
     
@@ -81,5 +378,17 @@ if __name__ == "__main__":
     logger.info(f"Input directory: {args.input_dir}")
     logger.info(f"Output directory: {args.output_dir}")
     
-    process_directory(args.input_dir, args.output_dir)
+    try:
+        process_directory(
+            args.input_dir,
+            args.output_dir,
+            workers=args.workers,
+            ingest=not args.no_ingest,
+            force=args.force,
+            validate=not args.skip_validation,
+            max_tokens=args.max_tokens or None,
+            output_format=args.format
+        )
+    finally:
+        close_handlers()
     logger.info("Batch processing completed")
\ No newline at end of file
@@ -0,0 +1,222 @@
+"""
+Recall/latency benchmark for Milvus vector indexes.
+
+Embeds the chunks in a chunk directory (``chunks`` by default) with the
+configured embedding model, then loads them into a scratch Milvus
+collection once per index configuration and measures recall@k and search
+latency for a sweep of search parameters (``nprobe`` for IVF indexes,
+``ef`` for HNSW). The ground truth is exact nearest-neighbour search in
+NumPy, equivalent to a FLAT index. Queries are the chunks' heading
+paths, which resemble the peripheral questions sent at generation time.
+
+``--synthetic N`` replaces the chunks with N clustered random vectors,
+with perturbed corpus vectors as queries, to size indexes for corpora
+larger than the one at hand without embedding anything. Either way a
+Milvus server (from ``--config``) is required; the scratch collections
+are dropped afterwards.
+
+Usage:
+    python benchmark_ann.py [--config config.yaml] [--chunks-dir chunks]
+        [--queries 200] [--top-k 10] [--target-recall 0.95]
+        [--index FLAT IVF_FLAT IVF_SQ8 HNSW] [--synthetic N]
+"""
+
+import argparse
+import json
+import math
+import os
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+import numpy as np
+from pymilvus import Collection, CollectionSchema, DataType, FieldSchema, utility
+
+from chunk_processor import CHUNK_FILE_SUFFIXES, iter_chunk_file
+from milvus_rag_handler import MilvusRAGHandler
+
+SCRATCH_PREFIX = "ann_benchmark_"
+
+
+def load_chunks(chunks_dir: str) -> Iterator[Dict[str, Any]]:
+    """Yield the chunks of every *_chunks.json(l) file in filename order, skipping error placeholders."""
+    for filename in sorted(os.listdir(chunks_dir)):
+        if filename.endswith(CHUNK_FILE_SUFFIXES):
+            try:
+                chunks = list(iter_chunk_file(os.path.join(chunks_dir, filename)))
+            except ValueError as e:
+                print(f"skipping {e}")
+                continue
+            yield from chunks
+
+
+def corpus_from_chunks(
+    handler: MilvusRAGHandler,
+    chunks_dir: str,
+    query_count: int,
+    rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Embed chunk contents as the corpus and sampled heading paths as queries."""
+    chunks = list(load_chunks(chunks_dir))
+    headings = sorted({" > ".join(c["heading_hierarchy"]) for c in chunks if c.get("heading_hierarchy")})
+    sample = [headings[i] for i in rng.choice(len(headings), min(query_count, len(headings)), replace=False)]
+    corpus = np.asarray(handler._embed([c["content"] for c in chunks]), dtype=np.float32)
+    queries = np.asarray(handler._embed(sample), dtype=np.float32)
+    return corpus, queries
+
+
+def synthetic_corpus(
+    size: int,
+    dim: int,
+    query_count: int,
+    rng: np.random.Generator
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Clustered random vectors, roughly like embeddings of many manuals."""
+    centers = rng.normal(size=(max(1, size // 200), dim)).astype(np.float32)
+    corpus = centers[rng.integers(len(centers), size=size)] + 0.3 * rng.normal(size=(size, dim)).astype(np.float32)
+    queries = corpus[rng.choice(size, query_count, replace=False)]
+    queries = queries + 0.1 * rng.normal(size=queries.shape).astype(np.float32)
+    return corpus, queries
+
+
+def exact_neighbors(corpus: np.ndarray, queries: np.ndarray, top_k: int, metric: str) -> np.ndarray:
+    """Ground-truth top-k row indices per query, as a FLAT index returns them."""
+    if metric == "L2":
+        scores = (corpus ** 2).sum(axis=1)[None, :] - 2 * queries @ corpus.T
+    elif metric == "COSINE":
+        normalized = corpus / np.maximum(np.linalg.norm(corpus, axis=1, keepdims=True), 1e-12)
+        scores = -(queries @ normalized.T)
+    else:
+        scores = -(queries @ corpus.T)
+    top = np.argpartition(scores, top_k - 1, axis=1)[:, :top_k]
+    return np.take_along_axis(top, np.argsort(np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def index_configs(
+    index_types: List[str],
+    size: int,
+    top_k: int
+) -> List[Tuple[Dict[str, Any], List[Dict[str, Any]]]]:
+    """Index build parameters to try, each with the search parameters to sweep."""
+    base_nlist = 2 ** max(4, round(math.log2(math.sqrt(size))))
+    configs = []
+    for index_type in index_types:
+        if index_type == "FLAT":
+            configs.append(({"index_type": "FLAT", "params": {}}, [{}]))
+        elif index_type in ("IVF_FLAT", "IVF_SQ8"):
+            for nlist in (base_nlist, 4 * base_nlist):
+                nprobes = [n for n in (1, 4, 8, 16, 32, 64, 128) if n <= nlist]
+                configs.append(({"index_type": index_type, "params": {"nlist": nlist}},
+                                [{"nprobe": n} for n in nprobes]))
+        elif index_type == "HNSW":
+            for m in (8, 16, 32):
+                configs.append(({"index_type": "HNSW", "params": {"M": m, "efConstruction": 200}},
+                                [{"ef": ef} for ef in (16, 32, 64, 128, 256) if ef >= top_k]))
+        else:
+            raise ValueError(f"Unsupported index type: {index_type}")
+    return configs
+
+
+def create_scratch_collection(name: str, dim: int, corpus: np.ndarray) -> Collection:
+    """Create a collection holding only IDs and vectors, and insert the corpus."""
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    schema = CollectionSchema([
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
+        FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=dim)
+    ])
+    collection = Collection(name=name, schema=schema)
+    for start in range(0, len(corpus), 1000):
+        batch = corpus[start:start + 1000]
+        collection.insert([list(range(start, start + len(batch))), batch.tolist()])
+    collection.flush()
+    return collection
+
+
+def run_benchmark(
+    corpus: np.ndarray,
+    queries: np.ndarray,
+    index_types: List[str],
+    top_k: int,
+    metric: str
+) -> List[Dict[str, Any]]:
+    """Build each index configuration and measure every search parameter."""
+    truth = exact_neighbors(corpus, queries, top_k, metric)
+    results = []
+    name = f"{SCRATCH_PREFIX}{os.getpid()}"
+    collection = create_scratch_collection(name, corpus.shape[1], corpus)
+    try:
+        for build, sweeps in index_configs(index_types, len(corpus), top_k):
+            collection.release()
+            if collection.indexes:
+                collection.drop_index()
+            start = time.perf_counter()
+            collection.create_index(field_name="embedding", index_params=dict(build, metric_type=metric))
+            utility.wait_for_index_building_complete(name)
+            build_seconds = time.perf_counter() - start
+            collection.load()
+            for params in sweeps:
+                search = {"metric_type": metric, "params": params}
+                latencies, hits = [], 0
+                for query, expected in zip(queries, truth):
+                    start = time.perf_counter()
+                    found = collection.search([query.tolist()], "embedding", search, limit=top_k)[0]
+                    latencies.append(time.perf_counter() - start)
+                    hits += len({hit.id for hit in found} & set(expected.tolist()))
+                results.append({
+                    "index_type": build["index_type"],
+                    "build_params": build["params"],
+                    "search_params": params,
+                    "recall": hits / (len(queries) * top_k),
+                    "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+                    "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+                    "build_seconds": build_seconds
+                })
+    finally:
+        collection.release()
+        utility.drop_collection(name)
+    return results
+
+
+def recommend(results: List[Dict[str, Any]], target_recall: float) -> Dict[str, Any]:
+    """Fastest configuration (by p95) reaching the target recall."""
+    eligible = [r for r in results if r["recall"] >= target_recall] or results
+    return min(eligible, key=lambda r: r["p95_ms"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark Milvus index recall against exact search')
+    parser.add_argument('--config', default='config.yaml', help='Configuration file with Milvus settings')
+    parser.add_argument('--chunks-dir', default='chunks', help='Directory of chunk JSON/JSONL files')
+    parser.add_argument('--queries', type=int, default=200, help='Number of queries')
+    parser.add_argument('--top-k', type=int, default=10, help='Neighbours per query (recall@k)')
+    parser.add_argument('--target-recall', type=float, default=0.95,
+                        help='Recall the recommended configuration must reach')
+    parser.add_argument('--index', nargs='+', default=['FLAT', 'IVF_FLAT', 'IVF_SQ8', 'HNSW'],
+                        help='Index types to benchmark')
+    parser.add_argument('--synthetic', type=int, default=0,
+                        help='Use this many synthetic vectors instead of the chunk set')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for query sampling')
+    args = parser.parse_args()
+
+    handler = MilvusRAGHandler(config_path=args.config)
+    metric = handler.index_params()["metric_type"]
+    rng = np.random.default_rng(args.seed)
+    if args.synthetic:
+        corpus, queries = synthetic_corpus(args.synthetic, handler.config["embedding_dim"], args.queries, rng)
+        source = f"{args.synthetic} synthetic vectors"
+    else:
+        corpus, queries = corpus_from_chunks(handler, args.chunks_dir, args.queries, rng)
+        source = f"{len(corpus)} chunks from {args.chunks_dir}"
+
+    results = run_benchmark(corpus, queries, args.index, args.top_k, metric)
+    handler.close()
+
+    print(f"ANN indexes: {source}, {len(queries)} queries, recall@{args.top_k}, {metric}")
+    print(f"  {'index':10} {'build params':28} {'search':14} {'recall':>7} {'p50 ms':>8} {'p95 ms':>8} {'build s':>8}")
+    for r in results:
+        print(f"  {r['index_type']:10} {json.dumps(r['build_params']):28} {json.dumps(r['search_params']):14} "
+              f"{r['recall']:7.3f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} {r['build_seconds']:8.1f}")
+    best = recommend(results, args.target_recall)
+    print(f"  recommended for recall >= {args.target_recall}: {best['index_type']} {best['build_params']}, "
+          f"search {best['search_params']} (recall {best['recall']:.3f}, p95 {best['p95_ms']:.2f} ms)")
+    print("  set milvus.index_params / milvus.search_params accordingly and run 'main.py rebuild-index'")
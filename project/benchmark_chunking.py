@@ -0,0 +1,324 @@
+"""
+Micro-benchmarks for the Markdown chunk processor.
+
+Runs the chunker phases over every Markdown file in a documentation
+directory (``../docs`` by default) and compares the current implementation
+against a copy of the baseline chunker, checking that both produce
+identical output.
+
+Usage:
+    python benchmark_chunking.py [--docs-dir ../docs] [--repeat 5]
+"""
+
+import argparse
+import os
+import re
+import time
+from typing import Callable, Dict, List, Tuple
+
+from slugify import slugify
+
+from chunk_processor import (
+    HEADING_PATTERN,
+    LIST_PATTERN,
+    REGISTER_DIAGRAM_PATTERN,
+    TABLE_PATTERN,
+    build_chunks,
+    isolate_tables,
+    parse_registers,
+    restore_tables
+)
+
+
+# Baseline chunker (551802e), copied verbatim so the comparison does not
+# drift as chunk_processor changes. The patterns are unchanged since.
+
+def legacy_isolate_tables(content: str) -> Tuple[str, List[str]]:
+    """Previous implementation: one full-string replace per table."""
+    tables = []
+    protected_content = content
+    for table_match in re.finditer(TABLE_PATTERN, content):
+        placeholder = f"{{TABLE_{len(tables)}}}"
+        protected_content = protected_content.replace(
+            table_match.group(0), placeholder, 1
+        )
+        tables.append(table_match.group(0))
+    return protected_content, tables
+
+
+def legacy_restore_tables(content: str, tables: List[str]) -> str:
+    """Previous implementation: one replace per document table, per chunk."""
+    for i, table in enumerate(tables):
+        placeholder = f"{{TABLE_{i}}}"
+        content = content.replace(placeholder, table)
+    return content
+
+
+def legacy_classify_chunk(content: str) -> str:
+    """Previous implementation: three full-content regex searches per chunk."""
+    if REGISTER_DIAGRAM_PATTERN.search(content):
+        return "register_diagram"
+    if re.search(TABLE_PATTERN, content):
+        return "table"
+    if LIST_PATTERN.search(content):
+        return "list"
+    return "text"
+
+
+def legacy_create_chunk(
+    hierarchy: List[str],
+    content_lines: List[str],
+    source_file: str,
+    chapter_title: str,
+    tables: List[str]
+) -> Dict:
+    """Previous implementation: restores every document table into each chunk."""
+    content = '\n'.join(content_lines).strip()
+
+    # Restore tables in content
+    for i, table in enumerate(tables):
+        placeholder = f"{{TABLE_{i}}}"
+        content = content.replace(placeholder, table)
+
+    # Generate chunk ID from hierarchy
+    chunk_id = slugify('_'.join(hierarchy)) if hierarchy else "root"
+
+    return {
+        "chunk_id": chunk_id,
+        "source_file": source_file,
+        "chapter_title": chapter_title,
+        "heading_hierarchy": hierarchy,
+        "chunk_type": legacy_classify_chunk(content),
+        "content": content
+    }
+
+
+def legacy_build_chunks(
+    protected_content: str,
+    source_file: str,
+    chapter_title: str,
+    tables: List[str]
+) -> List[Dict]:
+    """Previous implementation: uncompiled heading match on every line."""
+    chunks = []
+    current_hierarchy = []
+    current_content = []
+    current_level = 0
+
+    for line in protected_content.split('\n'):
+        heading_match = re.match(HEADING_PATTERN, line)
+        if heading_match:
+            # Save current chunk if exists
+            if current_content:
+                chunk = legacy_create_chunk(
+                    current_hierarchy,
+                    current_content,
+                    source_file,
+                    chapter_title,
+                    tables
+                )
+                chunks.append(chunk)
+                current_content = []
+
+            # Update heading hierarchy
+            level = len(heading_match.group(1))
+            heading_text = heading_match.group(2).strip()
+
+            if level > current_level:
+                current_hierarchy.append(heading_text)
+            else:
+                # Truncate hierarchy to current level and add new heading
+                current_hierarchy = current_hierarchy[:level-1] + [heading_text]
+            current_level = level
+        else:
+            current_content.append(line)
+
+    # Add final chunk
+    if current_content:
+        chunk = legacy_create_chunk(
+            current_hierarchy,
+            current_content,
+            source_file,
+            chapter_title,
+            tables
+        )
+        chunks.append(chunk)
+
+    return chunks
+
+
+def split_sections(protected_content: str) -> List[str]:
+    """Split protected content at headings, approximating chunk bodies."""
+    return re.split(r'^#+\s+.*$', protected_content, flags=re.MULTILINE)
+
+
+def load_corpus(docs_dir: str) -> Dict[str, str]:
+    """Read every Markdown file in the directory, in filename order."""
+    corpus = {}
+    for filename in sorted(os.listdir(docs_dir)):
+        path = os.path.join(docs_dir, filename)
+        if filename.endswith('.md') and os.path.isfile(path):
+            with open(path, 'r') as f:
+                corpus[filename] = f.read()
+    return corpus
+
+
+def time_function(func: Callable, corpus: Dict[str, str], repeat: int) -> float:
+    """Return the best wall-clock time over ``repeat`` runs of the corpus."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for content in corpus.values():
+            func(content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_isolate_tables(corpus: Dict[str, str], repeat: int) -> None:
+    """Compare legacy and single-pass table isolation."""
+    for filename, content in corpus.items():
+        if legacy_isolate_tables(content) != isolate_tables(content):
+            raise AssertionError(f"isolate_tables output differs for {filename}")
+
+    total_bytes = sum(len(c) for c in corpus.values())
+    total_tables = sum(len(isolate_tables(c)[1]) for c in corpus.values())
+    legacy = time_function(legacy_isolate_tables, corpus, repeat)
+    current = time_function(isolate_tables, corpus, repeat)
+
+    print(f"isolate_tables: {len(corpus)} files, {total_bytes / 1e6:.2f} MB, {total_tables} tables")
+    print(f"  legacy:  {legacy * 1000:8.1f} ms  ({total_bytes / legacy / 1e6:6.1f} MB/s)")
+    print(f"  current: {current * 1000:8.1f} ms  ({total_bytes / current / 1e6:6.1f} MB/s)")
+    print(f"  speedup: {legacy / current:.2f}x (outputs identical)")
+
+
+def bench_restore_tables(corpus: Dict[str, str], repeat: int) -> None:
+    """Compare per-table replace and indexed splice table restoration."""
+    documents = []
+    for content in corpus.values():
+        protected_content, tables = isolate_tables(content)
+        documents.append((split_sections(protected_content), tables))
+
+    for sections, tables in documents:
+        for section in sections:
+            if legacy_restore_tables(section, tables) != restore_tables(section, tables)[0]:
+                raise AssertionError("restore_tables output differs")
+
+    def run(restore: Callable) -> float:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for sections, tables in documents:
+                for section in sections:
+                    restore(section, tables)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    total_sections = sum(len(sections) for sections, _ in documents)
+    legacy = run(legacy_restore_tables)
+    current = run(restore_tables)
+
+    print(f"restore_tables: {total_sections} sections")
+    print(f"  legacy:  {legacy * 1000:8.1f} ms")
+    print(f"  current: {current * 1000:8.1f} ms")
+    print(f"  speedup: {legacy / current:.2f}x (outputs identical)")
+
+
+def bench_build_chunks(corpus: Dict[str, str], repeat: int) -> None:
+    """Compare per-line regex matching with the compiled line scanner.
+
+    Only the fields the legacy chunker produced are compared. Its chunks
+    share one heading list, which later headings modify, so each
+    hierarchy is checked against the chunk_id derived from it when the
+    chunk was made. Register metadata did not exist in the legacy chunker;
+    it is checked against a full rescan of each chunk instead (see
+    bench_parse_registers for its cost).
+    """
+    documents = []
+    for filename, content in corpus.items():
+        protected_content, tables = isolate_tables(content)
+        documents.append((filename, protected_content, tables))
+
+    for filename, protected_content, tables in documents:
+        legacy = legacy_build_chunks(protected_content, filename, filename, tables)
+        chunks = build_chunks(protected_content, filename, filename, tables)
+        for chunk in chunks:
+            if chunk.pop("registers", []) != parse_registers(chunk["content"]):
+                raise AssertionError(f"build_chunks registers differ for {filename}")
+            hierarchy = chunk["heading_hierarchy"]
+            if (slugify('_'.join(hierarchy)) if hierarchy else "root") != chunk["chunk_id"]:
+                raise AssertionError(f"build_chunks hierarchy differs for {filename}")
+        fields = ("chunk_id", "source_file", "chapter_title", "chunk_type", "content")
+        if [[c[f] for f in fields] for c in legacy] != [[c[f] for f in fields] for c in chunks]:
+            raise AssertionError(f"build_chunks output differs for {filename}")
+
+    def run(build: Callable) -> float:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for filename, protected_content, tables in documents:
+                build(protected_content, filename, filename, tables)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    total_lines = sum(p.count('\n') + 1 for _, p, _ in documents)
+    legacy = run(legacy_build_chunks)
+    current = run(build_chunks)
+
+    print(f"build_chunks: {total_lines} lines")
+    print(f"  legacy:  {legacy * 1000:8.1f} ms  ({total_lines / legacy:10.0f} lines/s)")
+    print(f"  current: {current * 1000:8.1f} ms  ({total_lines / current:10.0f} lines/s)")
+    print(f"  speedup: {legacy / current:.2f}x (outputs identical)")
+
+
+def bench_parse_registers(corpus: Dict[str, str], repeat: int) -> None:
+    """Time register extraction: rescanning restored sections vs cached tables."""
+    documents = []
+    for content in corpus.values():
+        protected_content, tables = isolate_tables(content)
+        documents.append((split_sections(protected_content), tables))
+
+    for sections, tables in documents:
+        cache = {}
+        for section in sections:
+            if parse_registers(restore_tables(section, tables)[0]) != parse_registers(section, tables, cache):
+                raise AssertionError("parse_registers output differs")
+
+    def run(extract: Callable) -> float:
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for sections, tables in documents:
+                cache = {}
+                for section in sections:
+                    extract(section, tables, cache)
+            best = min(best, time.perf_counter() - start)
+        return best
+
+    total_registers = sum(
+        len(parse_registers(section, tables)) for sections, tables in documents for section in sections
+    )
+    rescan = run(lambda section, tables, cache: parse_registers(restore_tables(section, tables)[0]))
+    cached = run(parse_registers)
+
+    print(f"parse_registers: {sum(len(s) for s, _ in documents)} sections, {total_registers} registers")
+    print(f"  rescan:  {rescan * 1000:8.1f} ms")
+    print(f"  cached:  {cached * 1000:8.1f} ms")
+    print(f"  speedup: {rescan / cached:.2f}x (outputs identical)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the Markdown chunk processor')
+    parser.add_argument('--docs-dir',
+                        default='../docs',
+                        help='Directory containing Markdown files')
+    parser.add_argument('--repeat',
+                        type=int,
+                        default=5,
+                        help='Number of timed runs (best is reported)')
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.docs_dir)
+    bench_isolate_tables(corpus, args.repeat)
+    bench_restore_tables(corpus, args.repeat)
+    bench_build_chunks(corpus, args.repeat)
+    bench_parse_registers(corpus, args.repeat)
@@ -0,0 +1,170 @@
+"""
+Throughput benchmark for the Ollama embedding client.
+
+Starts a local stand-in for the Ollama embedding API in a separate process
+and embeds paragraphs from a documentation directory (``../docs`` by
+default), comparing the previous one-blocking-request-per-text loop with
+OllamaEmbeddingClient.
+The stand-in serves ``/api/embeddings`` and, unless ``--no-batch`` is
+given, the batch ``/api/embed`` endpoint; ``--fail-rate`` makes a fraction
+of requests fail with HTTP 500 to exercise retries.
+
+Usage:
+    python benchmark_embeddings.py [--docs-dir ../docs] [--texts 2000]
+        [--latency 0.005] [--concurrency 4] [--batch-size 32] [--no-batch]
+        [--fail-rate 0.0]
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import requests
+
+from milvus_rag_handler import OllamaEmbeddingClient
+
+EMBEDDING_DIM = 768
+
+
+def fake_embedding(text: str) -> List[float]:
+    """Deterministic stand-in embedding derived from the text hash."""
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], 'little')
+    rng = random.Random(seed)
+    return [rng.random() for _ in range(EMBEDDING_DIM)]
+
+
+def make_handler(latency: float, batch: bool, fail_rate: float):
+    """Build a request handler emulating Ollama's embedding endpoints."""
+
+    class StandInHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Like Ollama itself; otherwise keep-alive replies stall on Nagle
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            if self.path == "/api/embed" and not batch:
+                return self._reply(404, {"error": "not found"})
+            if random.random() < fail_rate:
+                return self._reply(500, {"error": "injected failure"})
+            if self.path == "/api/embed":
+                texts = payload["input"]
+                # Model time grows with the batch, minus the per-request overhead
+                time.sleep(latency * (1 + 0.1 * len(texts)))
+                return self._reply(200, {"embeddings": [fake_embedding(t) for t in texts]})
+            if self.path == "/api/embeddings":
+                time.sleep(latency)
+                return self._reply(200, {"embedding": fake_embedding(payload["prompt"])})
+            self._reply(404, {"error": "not found"})
+
+        def _reply(self, status: int, body: dict) -> None:
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StandInHandler
+
+
+def serve(port_queue, latency: float, batch: bool, fail_rate: float) -> None:
+    """Run the stand-in server, reporting its port through port_queue."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(latency, batch, fail_rate))
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def load_texts(docs_dir: str, limit: int) -> List[str]:
+    """Collect up to limit non-empty paragraphs from the Markdown files."""
+    texts = []
+    for filename in sorted(os.listdir(docs_dir)):
+        if not filename.endswith('.md'):
+            continue
+        with open(os.path.join(docs_dir, filename), 'r') as f:
+            for paragraph in f.read().split('\n\n'):
+                if paragraph.strip():
+                    texts.append(paragraph.strip()[:2000])
+                    if len(texts) >= limit:
+                        return texts
+    return texts
+
+
+def legacy_embed(endpoint: str, model: str, texts: List[str]) -> List[List[float]]:
+    """Previous implementation: one blocking request per text, no pooling."""
+    embeddings = []
+    for text in texts:
+        try:
+            response = requests.post(
+                f"{endpoint}/api/embeddings",
+                json={"model": model, "prompt": text},
+                timeout=10.0
+            )
+            response.raise_for_status()
+            embeddings.append(response.json().get("embedding", []))
+        except Exception:
+            embeddings.append([])
+    return embeddings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark Ollama embedding throughput')
+    parser.add_argument('--docs-dir', default='../docs', help='Directory containing Markdown files')
+    parser.add_argument('--texts', type=int, default=2000, help='Number of paragraphs to embed')
+    parser.add_argument('--latency', type=float, default=0.005,
+                        help='Stand-in server latency per request, in seconds')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent requests')
+    parser.add_argument('--batch-size', type=int, default=32, help='Texts per /api/embed request')
+    parser.add_argument('--no-batch', action='store_true', help='Stand-in without /api/embed')
+    parser.add_argument('--fail-rate', type=float, default=0.0,
+                        help='Fraction of requests failing with HTTP 500')
+    args = parser.parse_args()
+
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve,
+        args=(port_queue, args.latency, not args.no_batch, args.fail_rate),
+        daemon=True
+    )
+    server.start()
+    endpoint = f"http://127.0.0.1:{port_queue.get()}"
+    texts = load_texts(args.docs_dir, args.texts)
+
+    start = time.perf_counter()
+    legacy = legacy_embed(endpoint, "stand-in", texts)
+    legacy_time = time.perf_counter() - start
+    legacy_missing = sum(1 for embedding in legacy if not embedding)
+
+    client = OllamaEmbeddingClient(
+        endpoint, "stand-in",
+        concurrency=args.concurrency,
+        batch_size=args.batch_size,
+        retry_backoff=0.01
+    )
+    start = time.perf_counter()
+    current = client.embed(texts)
+    current_time = time.perf_counter() - start
+    client.close()
+    server.terminate()
+
+    expected = [fake_embedding(text) for text in texts]
+    if current != expected:
+        raise AssertionError("OllamaEmbeddingClient returned wrong or misordered embeddings")
+
+    mode = "per-text /api/embeddings" if args.no_batch else f"/api/embed, batch {args.batch_size}"
+    print(f"embeddings: {len(texts)} texts, {args.latency * 1000:.1f} ms latency, "
+          f"{args.fail_rate:.0%} failures")
+    print(f"  legacy:  {legacy_time:7.2f} s  ({len(texts) / legacy_time:8.1f} texts/s, "
+          f"{legacy_missing} empty)")
+    print(f"  current: {current_time:7.2f} s  ({len(texts) / current_time:8.1f} texts/s, "
+          f"{mode}, concurrency {args.concurrency})")
+    print(f"  speedup: {legacy_time / current_time:.2f}x (embeddings match)")
@@ -1,10 +1,18 @@
+import os
 import re
 import json
+from collections import deque
+from functools import lru_cache
 from slugify import slugify
-from jsonschema import validate
-from typing import List, Dict, Tuple
+from jsonschema import Draft7Validator
+from jsonschema.exceptions import best_match
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator, Set
 
 # Constants
+# Bump whenever chunk output changes so incremental batch runs re-chunk
+CHUNKER_VERSION = "1.4"
+# Chunk files written by batch_chunk_processor end in one of these
+CHUNK_FILE_SUFFIXES = ("_chunks.json", "_chunks.jsonl")
 TABLE_PATTERN = r'(\|.*\|\n)(?:\| *:?[-]+:? *\|)+\n((?:\|.*\|\n?)+)'
 HEADING_PATTERN = r'^(#+)\s+(.*)$'
 REGISTER_DIAGRAM_PATTERN = re.compile(
@@ -12,6 +20,36 @@ REGISTER_DIAGRAM_PATTERN = re.compile(
     re.IGNORECASE
 )
 LIST_PATTERN = re.compile(r'^(\s*[-*+] .+|\s*\d+\. .+)', re.MULTILINE)
+TABLE_PLACEHOLDER_PATTERN = re.compile(r'\{TABLE_(\d+)\}')
+TABLE_REGEX = re.compile(TABLE_PATTERN)
+HEADING_REGEX = re.compile(HEADING_PATTERN)
+
+# Plain-text splitting: segments end after sentence punctuation followed by
+# whitespace, or at a blank line; oversized segments fall back to words
+TEXT_BOUNDARY_REGEX = re.compile(r'(?<=[.!?])\s+|\n\s*\n')
+WORD_REGEX = re.compile(r'\S+\s*')
+
+# One-pass line classifier: a single anchored match per line says whether
+# it is a heading, a table row or a list item. Register figure captions can
+# appear anywhere in a line, so they are searched for separately and only
+# on lines that mention a figure at all.
+LINE_SCANNER = re.compile(
+    r'(#+)\s+(.*)$'
+    r'|(?P<table_row>\s*\|)'
+    r'|(?P<list_item>\s*(?:[-*+]|\d+\.) .+)'
+)
+
+# Register table parsing
+REGISTER_ADDRESS_HEADERS = ("address", "offset")
+REGISTER_NAME_HEADERS = ("register name", "mnemonic", "register", "name")
+REGISTER_WIDTH_HEADERS = ("size (bits)", "size", "width", "width (bits)")
+REGISTER_RESET_HEADERS = ("reset", "reset value")
+HEX_PATTERN = re.compile(r'0x([0-9a-f_]+)', re.IGNORECASE)
+FOOTNOTE_PATTERN = re.compile(r'\s+\d+$')
+REGISTER_CAPTION_NAME_PATTERN = re.compile(
+    r'Figure\s+\d+-\d+\..*?register.*\(([^()]+)\)\s*$',
+    re.IGNORECASE
+)
 
 # JSON schema for output validation
 CHUNK_SCHEMA = {
@@ -28,6 +66,25 @@ CHUNK_SCHEMA = {
             "type": "string",
             "enum": ["text", "table", "list", "register_diagram"]
         },
+        "table_ids": {
+            "type": "array",
+            "items": {"type": "integer"}
+        },
+        "part": {"type": "integer", "minimum": 1},
+        "registers": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "offset": {"type": ["string", "null"]},
+                    "width": {"type": ["integer", "null"]},
+                    "reset_value": {"type": ["string", "null"]}
+                },
+                "required": ["name", "offset", "width", "reset_value"]
+            }
+        },
+        "of": {"type": "integer", "minimum": 1},
         "content": {"type": "string"}
     },
     "required": [
@@ -36,53 +93,104 @@ CHUNK_SCHEMA = {
     ]
 }
 
+# Compiled once; the schema itself is checked at import time
+Draft7Validator.check_schema(CHUNK_SCHEMA)
+CHUNK_VALIDATOR = Draft7Validator(CHUNK_SCHEMA)
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """Load the tiktoken encoding once; None if it is unavailable"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    """Count tokens using tiktoken, falling back to a character estimate"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
 def isolate_tables(content: str) -> Tuple[str, List[str]]:
     """
     Phase 1: Identify and isolate tables in the content
     Returns content with tables replaced by placeholders and list of tables
+
+    Single pass over the content: text between table matches is sliced by
+    offset into a buffer and joined once at the end, so the cost is linear
+    in the chapter size rather than one full-string copy per table.
     """
     tables = []
-    protected_content = content
-    for table_match in re.finditer(TABLE_PATTERN, content):
-        placeholder = f"{{TABLE_{len(tables)}}}"
-        protected_content = protected_content.replace(
-            table_match.group(0), placeholder, 1
-        )
+    parts = []
+    last_end = 0
+    for table_match in TABLE_REGEX.finditer(content):
+        start, end = table_match.span()
+        parts.append(content[last_end:start])
+        parts.append(f"{{TABLE_{len(tables)}}}")
         tables.append(table_match.group(0))
-    return protected_content, tables
+        last_end = end
+    parts.append(content[last_end:])
+    return ''.join(parts), tables
 
 def build_chunks(
     protected_content: str, 
     source_file: str, 
     chapter_title: str, 
-    tables: List[str]
+    tables: List[str],
+    max_tokens: Optional[int] = None
 ) -> List[Dict]:
     """
     Phase 2: Build hierarchical chunks from the protected content
+    Sections over max_tokens are split into sub-chunks (see create_chunks)
+    """
+    return list(iter_build_chunks(
+        protected_content, source_file, chapter_title, tables, max_tokens
+    ))
+
+def iter_build_chunks(
+    protected_content: str, 
+    source_file: str, 
+    chapter_title: str, 
+    tables: List[str],
+    max_tokens: Optional[int] = None
+) -> Iterator[Dict]:
+    """
+    Yield the Phase 2 chunks one heading section at a time
+    Each line is classified once by LINE_SCANNER; the line kinds seen in a
+    section decide its chunk type without rescanning the section content.
     """
-    chunks = []
     current_hierarchy = []
     current_content = []
+    current_kinds = set()
     current_level = 0
+    register_cache = {}
+    scan = LINE_SCANNER.match
+    find_caption = REGISTER_DIAGRAM_PATTERN.search
     
     for line in protected_content.split('\n'):
-        heading_match = re.match(HEADING_PATTERN, line)
-        if heading_match:
+        line_match = scan(line)
+        kind = line_match.lastgroup if line_match else None
+        if line_match and kind is None:
             # Save current chunk if exists
             if current_content:
-                chunk = create_chunk(
+                yield from create_chunks(
                     current_hierarchy, 
                     current_content, 
                     source_file, 
                     chapter_title, 
-                    tables
+                    tables,
+                    max_tokens,
+                    current_kinds,
+                    register_cache
                 )
-                chunks.append(chunk)
                 current_content = []
+                current_kinds = set()
             
             # Update heading hierarchy
-            level = len(heading_match.group(1))
-            heading_text = heading_match.group(2).strip()
+            level = len(line_match.group(1))
+            heading_text = line_match.group(2).strip()
             
             if level > current_level:
                 current_hierarchy.append(heading_text)
@@ -92,90 +200,563 @@ def build_chunks(
             current_level = level
         else:
             current_content.append(line)
+            if kind:
+                current_kinds.add(kind)
+                if kind == "table_row" and is_register_header(line):
+                    current_kinds.add("register_header")
+            if ('igure' in line or 'IGURE' in line) and find_caption(line):
+                current_kinds.add("register_caption")
     
     # Add final chunk
     if current_content:
-        chunk = create_chunk(
+        yield from create_chunks(
             current_hierarchy, 
             current_content, 
             source_file, 
             chapter_title, 
-            tables
+            tables,
+            max_tokens,
+            current_kinds,
+            register_cache
         )
-        chunks.append(chunk)
+
+def create_chunks(
+    hierarchy: List[str], 
+    content_lines: List[str], 
+    source_file: str, 
+    chapter_title: str, 
+    tables: List[str],
+    max_tokens: Optional[int] = None,
+    line_kinds: Optional[Set[str]] = None,
+    register_cache: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Create the chunks for one heading section
+    Without max_tokens, or when the section fits, this is a single chunk.
+    Otherwise the section is split into sub-chunks that share its heading
+    hierarchy and carry a 1-based part/of index; each part's chunk_id gets
+    a -p<part> suffix so that IDs stay unique.
+    line_kinds are the LINE_SCANNER kinds of the section's lines, if known.
+    register_cache is shared by the document's chunks (see parse_registers).
+    """
+    if max_tokens is None:
+        return [create_chunk(
+            hierarchy, content_lines, source_file, chapter_title, tables, line_kinds, register_cache
+        )]
     
+    parts = split_section(
+        '\n'.join(content_lines).strip(), tables, max_tokens
+    )
+    if len(parts) <= 1:
+        return [create_chunk(
+            hierarchy, content_lines, source_file, chapter_title, tables, line_kinds, register_cache
+        )]
+    
+    chunks = []
+    for i, part in enumerate(parts, 1):
+        chunk = create_chunk(
+            hierarchy, [part], source_file, chapter_title, tables, register_cache=register_cache
+        )
+        chunk["chunk_id"] = f"{chunk['chunk_id']}-p{i}"
+        chunk["part"] = i
+        chunk["of"] = len(parts)
+        chunks.append(chunk)
     return chunks
 
+def split_section(
+    protected_content: str,
+    tables: List[str],
+    max_tokens: int
+) -> List[str]:
+    """
+    Split protected section content into parts of at most max_tokens
+    Parts are packed from blank-line separated blocks. Tables, whether
+    isolated as placeholders or left as runs of '|' rows, are never split;
+    a table larger than the budget becomes a part of its own. Oversized
+    text blocks fall back to line and then word boundaries.
+    """
+    if count_tokens(restore_tables(protected_content, tables)[0]) <= max_tokens:
+        return [protected_content]
+    
+    pieces = []  # (separator, protected text, token count)
+    
+    def add_piece(separator: str, text: str) -> None:
+        restored = restore_tables(text, tables)[0]
+        pieces.append((separator, text, count_tokens(separator + restored)))
+    
+    for block in protected_content.split('\n\n'):
+        if (count_tokens(restore_tables(block, tables)[0]) <= max_tokens
+                or TABLE_PLACEHOLDER_PATTERN.search(block)):
+            add_piece('\n\n', block)
+            continue
+        
+        table_rows = []
+        for line in block.split('\n') + ['']:
+            if line.lstrip().startswith('|'):
+                table_rows.append(line)
+                continue
+            if table_rows:
+                add_piece('\n', '\n'.join(table_rows))
+                table_rows = []
+            if count_tokens(line) <= max_tokens:
+                add_piece('\n', line)
+            else:
+                for word in line.split(' '):
+                    add_piece(' ', word)
+    
+    parts = []
+    current = []
+    current_tokens = 0
+    for separator, text, tokens in pieces:
+        if current and current_tokens + tokens > max_tokens:
+            parts.append(''.join(current).strip())
+            current = []
+            current_tokens = 0
+        current.append(separator + text if current else text)
+        current_tokens += tokens
+    if current:
+        parts.append(''.join(current).strip())
+    return [part for part in parts if part]
+
+def iter_text_chunks(
+    content: str,
+    max_tokens: int,
+    overlap_tokens: int = 0
+) -> Iterator[str]:
+    """
+    Split plain text into overlapping chunks of at most max_tokens, lazily
+    Chunks are packed from sentence and paragraph segments found in one
+    pass over the content; a segment larger than the budget is split at
+    words, and a word larger than the budget into max_tokens characters.
+    Each chunk starts with the trailing segments of the previous one, up to
+    overlap_tokens (capped at half of max_tokens), but always ends past it,
+    so every chunk makes progress and the work is linear in the content.
+    Sizes are the sum of segment token counts.
+    """
+    for start, end in iter_text_spans(content, max_tokens, overlap_tokens):
+        yield content[start:end].strip()
+
+def iter_text_spans(
+    content: str,
+    max_tokens: int,
+    overlap_tokens: int = 0
+) -> Iterator[Tuple[int, int]]:
+    """
+    Yield the (start, end) content offsets of the iter_text_chunks chunks
+    Each chunk is content[start:end].strip(); the spans are cheap to keep,
+    so callers can count the chunks before slicing them out.
+    """
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = min(max(0, overlap_tokens), max_tokens // 2)
+    window = deque()  # (start, end, tokens) of the segments in the chunk
+    window_tokens = 0
+    
+    for segment in _text_segments(content, max_tokens):
+        if window and window_tokens + segment[2] > max_tokens:
+            if content[window[0][0]:window[-1][1]].strip():
+                yield window[0][0], window[-1][1]
+            # Keep the overlap: drop the first segment, then as many more
+            # as the overlap budget and the next segment require
+            window_tokens -= window.popleft()[2]
+            while window and (window_tokens > overlap_tokens
+                              or window_tokens + segment[2] > max_tokens):
+                window_tokens -= window.popleft()[2]
+        window.append(segment)
+        window_tokens += segment[2]
+    
+    # The last segment is always new, so the final window is emitted
+    if window and content[window[0][0]:window[-1][1]].strip():
+        yield window[0][0], window[-1][1]
+
+def _text_segments(content: str, max_tokens: int) -> Iterator[Tuple[int, int, int]]:
+    """Yield (start, end, tokens) of consecutive text segments within max_tokens"""
+    start = 0
+    ends = [match.end() for match in TEXT_BOUNDARY_REGEX.finditer(content)]
+    if not ends or ends[-1] < len(content):
+        ends.append(len(content))
+    for end in ends:
+        tokens = count_tokens(content[start:end])
+        if tokens <= max_tokens:
+            yield start, end, tokens
+        else:
+            yield from _split_words(content, start, end, max_tokens)
+        start = end
+
+def _split_words(
+    content: str,
+    start: int,
+    end: int,
+    max_tokens: int
+) -> Iterator[Tuple[int, int, int]]:
+    """Yield content[start:end] as words, and words over max_tokens in pieces"""
+    for word in WORD_REGEX.finditer(content, start, end):
+        word_start, word_end = word.span()
+        tokens = count_tokens(word.group(0))
+        if tokens <= max_tokens:
+            yield word_start, word_end, tokens
+            continue
+        for piece_start in range(word_start, word_end, max_tokens):
+            piece_end = min(piece_start + max_tokens, word_end)
+            yield piece_start, piece_end, count_tokens(content[piece_start:piece_end])
+
 def create_chunk(
     hierarchy: List[str], 
     content_lines: List[str], 
     source_file: str, 
     chapter_title: str, 
-    tables: List[str]
+    tables: List[str],
+    line_kinds: Optional[Set[str]] = None,
+    register_cache: Optional[Dict] = None
 ) -> Dict:
-    """Create a chunk dictionary from content lines and hierarchy"""
-    content = '\n'.join(content_lines).strip()
+    """
+    Create a chunk dictionary from content lines and hierarchy
+    When line_kinds is given and no table is restored, the chunk type comes
+    from the scanned line kinds instead of a rescan of the content.
+    """
+    protected_content = '\n'.join(content_lines).strip()
     
-    # Restore tables in content
-    for i, table in enumerate(tables):
-        placeholder = f"{{TABLE_{i}}}"
-        content = content.replace(placeholder, table)
+    # Restore tables in content: one placeholder scan per chunk, splicing
+    # each table back in by index
+    content, table_ids = restore_tables(protected_content, tables)
+    if line_kinds is None or table_ids:
+        chunk_type = classify_chunk(content)
+    else:
+        chunk_type = chunk_type_from_kinds(line_kinds, content)
     
     # Generate chunk ID from hierarchy
     chunk_id = slugify('_'.join(hierarchy)) if hierarchy else "root"
     
-    return {
+    chunk = {
         "chunk_id": chunk_id,
         "source_file": source_file,
         "chapter_title": chapter_title,
-        "heading_hierarchy": hierarchy,
-        "chunk_type": classify_chunk(content),
+        "heading_hierarchy": list(hierarchy),
+        "chunk_type": chunk_type,
+        "table_ids": table_ids,
         "content": content
     }
+    
+    # Structured register metadata from register maps and bit diagrams,
+    # for chunks with a register caption or an address/offset table header
+    if (line_kinds is None or not line_kinds.isdisjoint(("register_caption", "register_header"))
+            or any(is_register_header(tables[i][:tables[i].find('\n')]) for i in table_ids)):
+        registers = parse_registers(protected_content, tables, register_cache)
+        if registers:
+            chunk["registers"] = registers
+    return chunk
 
-def classify_chunk(content: str) -> str:
-    """Classify chunk type based on content patterns"""
-    if REGISTER_DIAGRAM_PATTERN.search(content):
+def restore_tables(content: str, tables: List[str]) -> Tuple[str, List[int]]:
+    """
+    Replace {TABLE_n} placeholders in content with the isolated tables
+    Returns restored content and the table indices found in it
+    """
+    table_ids = []
+    if not tables or '{TABLE_' not in content:
+        return content, table_ids
+    parts = []
+    last_end = 0
+    for placeholder_match in TABLE_PLACEHOLDER_PATTERN.finditer(content):
+        table_id = int(placeholder_match.group(1))
+        if table_id >= len(tables):
+            continue
+        start, end = placeholder_match.span()
+        parts.append(content[last_end:start])
+        parts.append(tables[table_id])
+        table_ids.append(table_id)
+        last_end = end
+    if not table_ids:
+        return content, table_ids
+    parts.append(content[last_end:])
+    return ''.join(parts), table_ids
+
+def scan_line_kinds(lines: Iterable[str]) -> Set[str]:
+    """
+    Return the line kinds found in lines: table_row, list_item and
+    register_caption. Headings are not reported.
+    """
+    kinds = set()
+    scan = LINE_SCANNER.match
+    find_caption = REGISTER_DIAGRAM_PATTERN.search
+    for line in lines:
+        line_match = scan(line)
+        if line_match and line_match.lastgroup:
+            kinds.add(line_match.lastgroup)
+        if ('igure' in line or 'IGURE' in line) and find_caption(line):
+            kinds.add("register_caption")
+    return kinds
+
+def chunk_type_from_kinds(kinds: Set[str], content: str) -> str:
+    """
+    Map scanned line kinds to a chunk type
+    A table row only makes a table chunk if the content holds a full table
+    (header, separator and rows), which is checked on the content itself.
+    """
+    if "register_caption" in kinds:
         return "register_diagram"
-    if re.search(TABLE_PATTERN, content):
+    if "table_row" in kinds and TABLE_REGEX.search(content):
         return "table"
-    if LIST_PATTERN.search(content):
+    if "list_item" in kinds:
         return "list"
     return "text"
 
+def classify_chunk(content: str) -> str:
+    """Classify chunk type based on content patterns"""
+    return chunk_type_from_kinds(scan_line_kinds(content.split('\n')), content)
+
+def iter_pipe_tables(
+    content: str,
+    tables: Optional[List[str]] = None
+) -> Iterator[Tuple[Optional[str], List[str], Optional[int]]]:
+    """
+    Yield (caption, lines, table_id) for each run of '|' rows in content
+    caption is the register figure caption directly above the table, if
+    any; rows are split into cells with split_table_row when needed.
+    With tables, a {TABLE_n} placeholder line stands for isolated table n
+    and yields its rows with table_id n; other runs have table_id None.
+    """
+    caption = None
+    lines = []
+    for line in content.split('\n') + ['']:
+        stripped = line.strip()
+        if stripped.startswith('|'):
+            lines.append(stripped)
+            continue
+        if lines:
+            yield caption, lines, None
+            lines = []
+        if tables and stripped.startswith('{TABLE_'):
+            placeholder_match = TABLE_PLACEHOLDER_PATTERN.fullmatch(stripped)
+            if placeholder_match and int(placeholder_match.group(1)) < len(tables):
+                table_id = int(placeholder_match.group(1))
+                yield caption, [row.strip() for row in tables[table_id].strip().split('\n')], table_id
+                continue
+        if not stripped or stripped.startswith('<!--'):
+            continue
+        if ('igure' in stripped or 'IGURE' in stripped) and REGISTER_DIAGRAM_PATTERN.search(stripped):
+            caption = stripped
+        else:
+            caption = None
+
+def is_register_header(line: str) -> bool:
+    """True if a table row could head a register summary (address/offset column)"""
+    line = line.lower()
+    return 'address' in line or 'offset' in line
+
+def split_table_row(line: str) -> Optional[List[str]]:
+    """Split a '|' row into stripped cells; None for separator rows"""
+    cells = [cell.strip() for cell in line.strip('|').split('|')]
+    if all(cell and set(cell) <= set('-: ') for cell in cells):
+        return None
+    return cells
+
+def parse_register_offset(cell: str) -> Optional[str]:
+    """
+    Normalise an address cell to a hex offset from the module base
+    'Base (0xFFF4_8000)' is offset 0x00, 'Base + 0x8' is 0x08 and a bare
+    '0x02' is taken as an offset. Returns None if no offset is found.
+    """
+    cell = cell.replace('\\', '')
+    if cell.lower().startswith('base'):
+        if '+' not in cell:
+            return "0x00"
+        cell = cell.split('+', 1)[1]
+    hex_match = HEX_PATTERN.search(cell)
+    if not hex_match:
+        return None
+    return f"0x{int(hex_match.group(1).replace('_', ''), 16):02X}"
+
+def _find_column(header: List[str], names: Tuple[str, ...]) -> Optional[int]:
+    """Index of the first normalised header cell starting with one of names"""
+    for name in names:
+        for i, cell in enumerate(header):
+            if cell == name or cell.startswith(name + ' '):
+                return i
+    return None
+
+def parse_register_summary(lines: List[str]) -> List[Dict]:
+    """
+    Parse a register summary (memory map) table
+    The header needs an address/offset column and a register name or
+    mnemonic column; size and reset columns are used when present.
+    Reserved rows are skipped.
+    """
+    header = [FOOTNOTE_PATTERN.sub('', cell.lower()) for cell in split_table_row(lines[0]) or []]
+    address_col = _find_column(header, REGISTER_ADDRESS_HEADERS)
+    name_col = _find_column(header, REGISTER_NAME_HEADERS)
+    if address_col is None or name_col is None or address_col == name_col:
+        return []
+    width_col = _find_column(header, REGISTER_WIDTH_HEADERS)
+    reset_col = _find_column(header, REGISTER_RESET_HEADERS)
+    
+    registers = []
+    for line in lines[1:]:
+        row = split_table_row(line)
+        if row is None or len(row) != len(header):
+            continue
+        name = FOOTNOTE_PATTERN.sub('', row[name_col].replace('\\', ''))
+        if not name or name == '-' or name.lower().startswith('reserved'):
+            continue
+        width = row[width_col] if width_col is not None else ''
+        reset = row[reset_col] if reset_col is not None else ''
+        reset_match = HEX_PATTERN.search(reset)
+        registers.append({
+            "name": name,
+            "offset": parse_register_offset(row[address_col]),
+            "width": int(width) if width.isdigit() else None,
+            "reset_value": (
+                f"0x{int(reset_match.group(1).replace('_', ''), 16):X}"
+                if reset_match else None
+            )
+        })
+    return registers
+
+def parse_register_diagram(caption: str, lines: List[str]) -> Optional[Dict]:
+    """
+    Parse a register bit diagram under a 'Figure N-M. ... Register (NAME)'
+    caption. Bit-number rows label the columns of the following Reset row;
+    bit 0 is the most significant bit. The reset value is only set when
+    every bit has a 0/1 reset value.
+    """
+    caption_match = REGISTER_CAPTION_NAME_PATTERN.search(caption.replace('\\', ''))
+    if not caption_match:
+        return None
+    
+    bits = []
+    reset_bits = {}
+    offset = None
+    for line in lines:
+        row = split_table_row(line)
+        if row is None:
+            continue
+        label, cells = row[0].lower(), row[1:]
+        if not label and cells and all(cell.isdigit() for cell in cells):
+            bits = [int(cell) for cell in cells]
+        elif label == 'reset':
+            reset_bits.update(zip(bits, cells))
+        elif label == 'reg addr' and offset is None and cells:
+            offset = parse_register_offset(cells[0])
+    if not reset_bits:
+        return None
+    
+    width = max(reset_bits) + 1
+    reset_value = None
+    if (len(reset_bits) == width
+            and all(value in ('0', '1') for value in reset_bits.values())):
+        value = 0
+        for bit, bit_value in reset_bits.items():
+            value |= int(bit_value) << (width - 1 - bit)
+        reset_value = f"0x{value:0{(width + 3) // 4}X}"
+    return {
+        "name": caption_match.group(1).strip(),
+        "offset": offset,
+        "width": width,
+        "reset_value": reset_value
+    }
+
+def parse_registers(
+    content: str,
+    tables: Optional[List[str]] = None,
+    cache: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Extract structured register metadata from the tables in content
+    Register summary tables give names, offsets and widths; register bit
+    diagrams fill in reset values. Entries are merged by register name,
+    in order of first appearance. Only tables with a register caption or
+    an address/offset header are parsed. With tables, content may hold
+    their {TABLE_n} placeholders, and the registers of each isolated table
+    are kept in cache by table id and caption.
+    """
+    registers = {}
+    for caption, lines, table_id in iter_pipe_tables(content, tables):
+        if not caption and not is_register_header(lines[0]):
+            continue
+        key = (table_id, caption)
+        if cache is not None and table_id is not None and key in cache:
+            parsed = cache[key]
+        else:
+            if caption:
+                parsed = [parse_register_diagram(caption, lines)]
+            else:
+                parsed = parse_register_summary(lines)
+            if cache is not None and table_id is not None:
+                cache[key] = parsed
+        for register in parsed:
+            if register is None:
+                continue
+            existing = registers.setdefault(register["name"], dict(register))
+            for field, value in register.items():
+                if existing[field] is None:
+                    existing[field] = value
+    return list(registers.values())
+
+def registers_complete(registers: List[Dict]) -> bool:
+    """True if every register has a name, offset, width and reset value"""
+    return bool(registers) and all(
+        all(register.get(key) is not None for key in ("name", "offset", "width", "reset_value"))
+        for register in registers
+    )
+
 def validate_chunks(chunks: List[Dict], original_tables: List[str]) -> None:
     """
     Phase 3: Validate chunks against rules and schema
     """
-    # Validate against JSON schema
+    for _ in iter_validated_chunks(chunks, original_tables):
+        pass
+
+def iter_validated_chunks(
+    chunks: Iterable[Dict],
+    original_tables: List[str]
+) -> Iterator[Dict]:
+    """
+    Validate chunks as they stream through
+    Each chunk is checked against the schema before it is yielded; the
+    table checks run once the last chunk has passed.
+    """
+    table_chunk_count = 0
+    restored_ids = set()
     for chunk in chunks:
-        validate(instance=chunk, schema=CHUNK_SCHEMA)
+        # Validate against JSON schema
+        error = best_match(CHUNK_VALIDATOR.iter_errors(chunk))
+        if error is not None:
+            raise error
+        if chunk["chunk_type"] == "table":
+            table_chunk_count += 1
+        restored_ids.update(chunk.get("table_ids", []))
+        yield chunk
     
     # Check no table was split
-    chunk_tables = [
-        c["content"] for c in chunks 
-        if c["chunk_type"] == "table"
-    ]
-    if len(chunk_tables) != len(original_tables):
+    if table_chunk_count != len(original_tables):
         raise ValueError(
-            f"Table count mismatch: {len(chunk_tables)} vs {len(original_tables)}"
+            f"Table count mismatch: {table_chunk_count} vs {len(original_tables)}"
         )
     
-    # Check all tables are present
-    for table in original_tables:
-        if not any(table in chunk["content"] for chunk in chunks):
+    # Check all tables are present, by the placeholder IDs each chunk owns
+    for table_id, table in enumerate(original_tables):
+        if table_id not in restored_ids:
             raise ValueError(f"Table missing from chunks: {table[:50]}...")
-    
-    # Check hierarchy continuity
-    hierarchy_levels = {}
-    for chunk in chunks:
-        for i, heading in enumerate(chunk["heading_hierarchy"]):
-            if i not in hierarchy_levels:
-                hierarchy_levels[i] = set()
-            hierarchy_levels[i].add(heading)
 
-def process_markdown_file(file_path: str) -> List[Dict]:
-    """Process a markdown file and return JSON chunks"""
+def process_markdown_file(
+    file_path: str,
+    validate: bool = True,
+    max_tokens: Optional[int] = None
+) -> List[Dict]:
+    """
+    Process a markdown file and return JSON chunks
+    Set validate to False to skip Phase 3 on trusted re-runs, and
+    max_tokens to split heading sections larger than that token budget
+    """
+    return list(iter_markdown_chunks(file_path, validate, max_tokens))
+
+def iter_markdown_chunks(
+    file_path: str,
+    validate: bool = True,
+    max_tokens: Optional[int] = None
+) -> Iterator[Dict]:
+    """
+    Process a markdown file, yielding chunks as they are built
+    Validation errors for whole-file rules are raised after the last chunk
+    """
     # Extract chapter title from filename
     chapter_title = re.sub(r'\.md$', '', file_path.split('/')[-1])
     
@@ -187,17 +768,71 @@ def process_markdown_file(file_path: str) -> List[Dict]:
     protected_content, tables = isolate_tables(content)
     
     # Phase 2: Hierarchical chunking
-    chunks = build_chunks(
+    chunks = iter_build_chunks(
         protected_content, 
         file_path, 
         chapter_title, 
-        tables
+        tables,
+        max_tokens
     )
     
     # Phase 3: Validation
-    validate_chunks(chunks, tables)
+    if validate:
+        chunks = iter_validated_chunks(chunks, tables)
     
-    return chunks
+    yield from chunks
+
+def write_chunks_jsonl(chunks: Iterable[Dict], output_file: str) -> int:
+    """
+    Write chunks to a JSONL file, one chunk per line, as they are produced
+    The file is written under a temporary name and only moved into place
+    once every chunk has been written. Returns the number of chunks.
+    """
+    tmp_file = output_file + ".tmp"
+    count = 0
+    try:
+        with open(tmp_file, 'w') as f:
+            for chunk in chunks:
+                f.write(json.dumps(chunk))
+                f.write('\n')
+                count += 1
+        os.replace(tmp_file, output_file)
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+    return count
+
+def iter_chunk_file(chunk_file: str) -> Iterator[Dict]:
+    """
+    Read chunks from a .jsonl or .json chunk file
+    JSONL files are streamed line by line with bounded memory; JSON files
+    are loaded whole. Raises ValueError for error placeholder files.
+    """
+    with open(chunk_file, 'r') as f:
+        if chunk_file.endswith('.jsonl'):
+            for line in f:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise ValueError(f"{chunk_file} is an error placeholder: {chunk['error']}")
+                yield chunk
+            return
+        data = json.load(f)
+    if isinstance(data, dict):
+        raise ValueError(f"{chunk_file} is an error placeholder: {data.get('error')}")
+    yield from data
+
+def count_chunk_file(chunk_file: str) -> int:
+    """
+    Count the chunks in a .jsonl or .json chunk file
+    JSONL lines are counted without being parsed; JSON files are loaded.
+    """
+    with open(chunk_file, 'r') as f:
+        if chunk_file.endswith('.jsonl'):
+            return sum(1 for line in f if line.strip())
+        data = json.load(f)
+    return len(data) if isinstance(data, list) else 0
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,48 @@
+"""Shared test fixtures for handlers that run without a Milvus server."""
+
+import itertools
+from unittest.mock import patch
+
+import pytest
+import yaml
+
+from milvus_rag_handler import MilvusRAGHandler
+
+TEST_MILVUS_CONFIG = {'embedding_model': 'test-embedding', 'embedding_dim': 4}
+
+
+@pytest.fixture
+def write_config(tmp_path):
+    """Write a configuration file under tmp_path and return its path.
+
+    The milvus section of the configuration is merged over
+    TEST_MILVUS_CONFIG, so tests do not depend on the working directory
+    or on test_config.yaml.
+    """
+    counter = itertools.count()
+
+    def write(config=None):
+        config = dict(config or {})
+        config['milvus'] = dict(TEST_MILVUS_CONFIG, **config.get('milvus', {}))
+        path = tmp_path / f"config_{next(counter)}.yaml"
+        path.write_text(yaml.safe_dump(config))
+        return str(path)
+    return write
+
+
+@pytest.fixture
+def handler_factory(write_config):
+    """Factory for handlers built from an in-memory configuration.
+
+    With collection, the server connection is skipped and each collection
+    is made by calling collection().
+    """
+    def make(config=None, collection=None):
+        config_path = write_config(config)
+        if collection is None:
+            return MilvusRAGHandler(config_path=config_path)
+        with patch('milvus_rag_handler.MilvusRAGHandler._connect'), \
+                patch('milvus_rag_handler.MilvusRAGHandler._init_collection',
+                      side_effect=lambda name: collection()):
+            return MilvusRAGHandler(config_path=config_path)
+    return make
@@ -35,7 +35,8 @@ import yaml
 from model_manager import ModelManager, GenerationResult
 from validation_engine import ValidationEngine, ValidationResult, Severity
 from todo_processor import TodoProcessor
-from milvus_rag_handler import MilvusRAGHandler
+from milvus_rag_handler import MilvusRAGHandler, close_handlers, get_handler
+from chunk_processor import parse_registers, registers_complete
 
 
 class PipelineStep(Enum):
@@ -163,13 +164,14 @@ class GenerationPipeline:
         self.logger = logging.getLogger(__name__)
         
         # Load configuration
+        self.config_path = config_path
         self.config = self._load_config(config_path)
         
         # Initialize components
         self.model_manager = ModelManager(config_path)
         self.validation_engine = ValidationEngine(self.config.get("validation", {}))
         self.todo_processor = TodoProcessor(self.config.get("todo", {}))
-        self.rag_handler = None  # Initialize when needed
+        self.rag_handler: Optional[MilvusRAGHandler] = None  # Shared handler, set when needed
         
         # Pipeline state
         self.current_state: Optional[PipelineState] = None
@@ -259,11 +261,11 @@ class GenerationPipeline:
             self.current_state.end_time = datetime.now()
             return self.current_state
         
-        # Initialize RAG handler if configured
-        if self.config.get("milvus", {}).get("host"):
+        # Use the process-wide RAG handler if configured; it stays connected
+        # across runs and is closed with close_handlers()
+        if self.rag_handler is None and self.config.get("milvus", {}).get("host"):
             try:
-                self.rag_handler = MilvusRAGHandler(self.config)
-                await self.rag_handler.connect()
+                self.rag_handler = get_handler(self.config_path)
             except Exception as e:
                 self.logger.warning(f"Failed to initialize RAG handler: {e}")
         
@@ -325,10 +327,6 @@ class GenerationPipeline:
         finally:
             self.current_state.end_time = datetime.now()
             self._save_pipeline_state()
-            
-            # Cleanup
-            if self.rag_handler:
-                self.rag_handler.disconnect()
         
         return self.current_state
     
@@ -539,10 +537,36 @@ class GenerationPipeline:
         
         # Multi-pass approach for accuracy
         max_passes = 3
+        first_pass = 0
         best_result = None
         best_score = 0.0
         
-        for pass_num in range(max_passes):
+        # Pre-seed from register tables parsed out of the documentation: the
+        # initial extraction pass is skipped, and when every register has an
+        # offset, width and reset value a single refinement pass is enough
+        seed = None
+        parsed_registers = parse_registers(documentation)
+        if parsed_registers:
+            seed = {
+                "registers": [
+                    {
+                        "name": register["name"],
+                        "address": register["offset"],
+                        "size": register["width"],
+                        "reset_value": register["reset_value"]
+                    }
+                    for register in parsed_registers
+                ]
+            }
+            first_pass = 1
+            if registers_complete(parsed_registers):
+                max_passes = 2
+            self.logger.info(
+                f"Register mapping pre-seeded with {len(parsed_registers)} parsed registers "
+                f"({max_passes - first_pass} LLM pass(es))"
+            )
+        
+        for pass_num in range(first_pass, max_passes):
             self.logger.info(f"Register mapping pass {pass_num + 1}/{max_passes}")
             
             # Build prompt with increasing detail
@@ -551,7 +575,7 @@ class GenerationPipeline:
                 summary, 
                 metadata,
                 pass_num=pass_num,
-                previous_attempt=best_result.data if best_result else None
+                previous_attempt=best_result.data if best_result else seed
             )
             
             # Use best model for this critical step
@@ -1591,11 +1615,12 @@ private void StartTimer()
         return exported_files
     
     def cleanup(self) -> None:
-        """Cleanup resources."""
+        """Cleanup resources, including the shared RAG handlers."""
         self.executor.shutdown(wait=True)
         self.model_manager.shutdown()
         if self.rag_handler:
-            self.rag_handler.disconnect()
+            close_handlers()
+            self.rag_handler = None
 
 
 # Example usage
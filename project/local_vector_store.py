@@ -0,0 +1,551 @@
+"""
+In-process vector store backend for MilvusRAGHandler.
+
+MilvusRAGHandler talks to its vector store through the subset of the
+pymilvus ``Collection`` API it uses: ``search``, ``query``,
+``query_iterator``, ``insert``, ``upsert``, ``delete``, ``flush``,
+``num_entities``, ``name``, ``schema``, ``indexes``, ``describe``,
+``load``, ``release``, ``create_index`` and ``drop_index``, with filters written as Milvus boolean
+expressions. LocalCollection implements that interface with NumPy, so
+the handler runs without a Milvus server when ``milvus.backend`` is
+``local``.
+
+Each collection is stored as two files in the store directory:
+``<name>.f32`` holds the embeddings as a raw float32 matrix, which is
+memory-mapped copy-on-write when the collection is opened, and
+``<name>.json`` holds the IDs, contents, metadata and timestamps.
+Changes are kept in memory until ``flush`` rewrites both files.
+
+Only the filter expressions the handler builds are supported: ``and``,
+``or``, ``not`` and parentheses over comparisons (``==``, ``!=``, ``<``,
+``<=``, ``>``, ``>=``, ``in``, ``not in`` and ``like``) of ``id``,
+scalar fields and ``metadata["key"]`` paths with literals.
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+
+FILTER_TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+        (?P<string>"(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')
+      | (?P<number>-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)
+      | (?P<op>==|!=|<=|>=|<|>|&&|\|\||!|\(|\)|\[|\]|,)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_]*)
+    )''', re.VERBOSE)
+
+_MISSING = object()
+
+_COMPARISONS = {
+    "==": lambda a, b: a == b,
+    "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+
+
+def _tokenize_filter(expr: str) -> List[tuple]:
+    """Split a filter expression into (kind, value) tokens."""
+    tokens = []
+    position = 0
+    expr = expr.rstrip()
+    while position < len(expr):
+        match = FILTER_TOKEN_PATTERN.match(expr, position)
+        if not match:
+            raise ValueError(f"Unsupported filter expression at {position}: {expr!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "string":
+            value = re.sub(r'\\(.)', r'\1', text[1:-1])
+        elif kind == "number":
+            value = float(text) if any(c in text for c in ".eE") else int(text)
+        elif kind == "name" and text in ("true", "false", "True", "False"):
+            kind, value = "number", text.lower() == "true"
+        elif kind == "name" and text in ("and", "or", "not", "in", "like"):
+            kind, value = "op", text
+        else:
+            value = text
+        tokens.append((kind, value))
+        position = match.end()
+    return tokens
+
+
+def compile_filter(expr: Optional[str]) -> Callable[[Dict[str, Any]], bool]:
+    """
+    Compile a Milvus filter expression into a predicate over rows.
+
+    Rows are dictionaries with the collection fields. Comparisons on a
+    missing metadata key are false, as in Milvus.
+
+    Args:
+        expr: Filter expression; None or empty matches every row
+
+    Returns:
+        Predicate taking a row and returning whether it matches
+
+    Raises:
+        ValueError: If the expression is not supported
+    """
+    if not expr or not expr.strip():
+        return lambda row: True
+    tokens = _tokenize_filter(expr)
+    position = 0
+
+    def peek(*values):
+        if position < len(tokens) and tokens[position][0] == "op" and tokens[position][1] in values:
+            return tokens[position][1]
+        return None
+
+    def take(kind=None, value=None):
+        nonlocal position
+        if position >= len(tokens):
+            raise ValueError(f"Unexpected end of filter expression: {expr!r}")
+        token = tokens[position]
+        if (kind and token[0] != kind) or (value and token[1] != value):
+            raise ValueError(f"Unexpected {token[1]!r} in filter expression: {expr!r}")
+        position += 1
+        return token[1]
+
+    def parse_or():
+        terms = [parse_and()]
+        while peek("or", "||"):
+            take()
+            terms.append(parse_and())
+        return terms[0] if len(terms) == 1 else (lambda row: any(t(row) for t in terms))
+
+    def parse_and():
+        terms = [parse_not()]
+        while peek("and", "&&"):
+            take()
+            terms.append(parse_not())
+        return terms[0] if len(terms) == 1 else (lambda row: all(t(row) for t in terms))
+
+    def parse_not():
+        if peek("not", "!"):
+            take()
+            term = parse_not()
+            return lambda row: not term(row)
+        if peek("("):
+            take()
+            term = parse_or()
+            take("op", ")")
+            return term
+        return parse_comparison()
+
+    def parse_field():
+        path = [take("name")]
+        while peek("["):
+            take()
+            path.append(take("string"))
+            take("op", "]")
+
+        def get(row):
+            value = row.get(path[0], _MISSING)
+            for key in path[1:]:
+                if not isinstance(value, dict):
+                    return _MISSING
+                value = value.get(key, _MISSING)
+            return value
+        return get
+
+    def parse_list():
+        take("op", "[")
+        values = []
+        while not peek("]"):
+            kind, value = tokens[position] if position < len(tokens) else (None, None)
+            if kind not in ("string", "number"):
+                raise ValueError(f"Unsupported list element in filter expression: {expr!r}")
+            values.append(take())
+            if not peek("]"):
+                take("op", ",")
+        take("op", "]")
+        return values
+
+    def parse_comparison():
+        get = parse_field()
+        if peek("not"):
+            take()
+            take("op", "in")
+            values = set(parse_list())
+            return lambda row: (v := get(row)) is not _MISSING and v not in values
+        operator = take("op")
+        if operator == "in":
+            values = set(parse_list())
+            return lambda row: get(row) in values
+        if operator == "like":
+            # % and _ are wildcards unless escaped with a backslash
+            pattern = re.compile(
+                "".join(
+                    re.escape(escaped) if escaped else ".*" if c == "%" else "." if c == "_" else re.escape(c)
+                    for escaped, c in re.findall(r'\\(.)|(.)', take("string"), re.DOTALL)
+                ),
+                re.DOTALL
+            )
+            return lambda row: isinstance(v := get(row), str) and pattern.fullmatch(v) is not None
+        if operator not in _COMPARISONS:
+            raise ValueError(f"Unsupported operator {operator!r} in filter expression: {expr!r}")
+        compare = _COMPARISONS[operator]
+        literal = take()
+
+        def predicate(row):
+            value = get(row)
+            if value is _MISSING:
+                return False
+            try:
+                return compare(value, literal)
+            except TypeError:
+                return False
+        return predicate
+
+    predicate = parse_or()
+    if position != len(tokens):
+        raise ValueError(f"Unexpected {tokens[position][1]!r} in filter expression: {expr!r}")
+    return predicate
+
+
+class LocalHit:
+    """Search hit with the attributes of a pymilvus Hit."""
+
+    def __init__(self, doc_id: int, distance: float, entity: Dict[str, Any]):
+        self.id = doc_id
+        self.distance = distance
+        self.entity = entity
+
+
+class LocalMutationResult:
+    """Result of an insert, upsert or delete, like pymilvus MutationResult."""
+
+    def __init__(self, primary_keys: List[int]):
+        self.primary_keys = primary_keys
+        self.insert_count = len(primary_keys)
+        self.delete_count = len(primary_keys)
+
+
+class LocalSchema:
+    """Collection schema; IDs are always supplied by the caller."""
+
+    auto_id = False
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "auto_id": False,
+            "fields": [
+                {"name": "id", "type": "INT64", "is_primary": True},
+                {"name": "content", "type": "VARCHAR"},
+                {"name": "embedding", "type": "FLOAT_VECTOR", "dim": self.dim},
+                {"name": "metadata", "type": "JSON"},
+                {"name": "timestamp", "type": "INT64"}
+            ]
+        }
+
+
+class LocalQueryIterator:
+    """Batched iterator over query results, like pymilvus QueryIterator."""
+
+    def __init__(self, rows: List[Dict[str, Any]], batch_size: int):
+        self._rows = rows
+        self._batch_size = batch_size
+        self._position = 0
+
+    def next(self) -> List[Dict[str, Any]]:
+        batch = self._rows[self._position:self._position + self._batch_size]
+        self._position += len(batch)
+        return batch
+
+    def close(self) -> None:
+        self._rows = []
+
+
+class LocalCollection:
+    """
+    NumPy-backed stand-in for a pymilvus Collection.
+
+    Rows live in parallel lists with one embedding row per entity in a
+    float32 matrix; deleting moves the last row into the freed slot, so
+    the matrix stays dense. Searches are exact: one matrix-vector product
+    over the rows matching the filter, then a partial sort for the top k.
+    Filter results are cached per expression until the next change.
+    """
+
+    def __init__(self, name: str, directory: str, dim: int, metric_type: str = "L2"):
+        """
+        Open a collection, loading it from directory if it was flushed before.
+
+        Args:
+            name: Collection name, also the base name of its files
+            directory: Store directory, created if missing
+            dim: Embedding dimension
+            metric_type: L2, IP or COSINE
+
+        Raises:
+            ValueError: If the stored collection does not match dim
+        """
+        self.logger = logging.getLogger(__name__)
+        self.name = name
+        self.dim = dim
+        self.metric_type = metric_type.upper()
+        self.schema = LocalSchema(dim)
+        self.indexes: List[Any] = []
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._vectors_path = self.directory / f"{name}.f32"
+        self._rows_path = self.directory / f"{name}.json"
+        self._lock = threading.RLock()
+        self._masks: Dict[str, np.ndarray] = {}
+
+        self._ids: List[int] = []
+        self._contents: List[str] = []
+        self._metadata: List[Dict[str, Any]] = []
+        self._timestamps: List[int] = []
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+
+        if self._rows_path.exists():
+            with open(self._rows_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data["dim"] != dim:
+                raise ValueError(f"Collection {name} has dimension {data['dim']}, expected {dim}")
+            self._ids = data["ids"]
+            self._contents = data["contents"]
+            self._metadata = data["metadata"]
+            self._timestamps = data["timestamps"]
+            if self._ids:
+                self._vectors = np.memmap(
+                    self._vectors_path, dtype=np.float32, mode='c', shape=(len(self._ids), dim)
+                )
+        self._slots = {doc_id: slot for slot, doc_id in enumerate(self._ids)}
+        self._squared_norms = np.einsum('ij,ij->i', self._vectors, self._vectors)
+
+    @property
+    def num_entities(self) -> int:
+        return len(self._ids)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"collection_name": self.name, "backend": "local", "path": str(self.directory)}
+
+    def load(self) -> None:
+        """Collections are always loaded; kept for API compatibility."""
+
+    def release(self) -> None:
+        """Collections are always loaded; kept for API compatibility."""
+
+    def drop_index(self) -> None:
+        """Searches are exact and use no index; kept for API compatibility."""
+
+    def create_index(self, field_name: str, index_params: Dict[str, Any]) -> None:
+        """Searches are exact; only the metric type is used."""
+        self.metric_type = index_params.get("metric_type", self.metric_type).upper()
+
+    def insert(self, entities: List[Dict[str, Any]]) -> LocalMutationResult:
+        """Insert entities; IDs must be new."""
+        with self._lock:
+            for entity in entities:
+                if entity.get("id") in self._slots:
+                    raise ValueError(f"Duplicate primary key {entity.get('id')} in {self.name}")
+        return self.upsert(entities)
+
+    def upsert(self, entities: List[Dict[str, Any]]) -> LocalMutationResult:
+        """Insert entities, replacing existing entities with the same ID."""
+        if not entities:
+            return LocalMutationResult([])
+        if any("id" not in entity for entity in entities):
+            raise ValueError(f"Collection {self.name} requires an id for every entity")
+        vectors = np.asarray([entity["embedding"] for entity in entities], dtype=np.float32)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match {self.dim}")
+        with self._lock:
+            new = sum(1 for entity in entities if entity["id"] not in self._slots)
+            self._reserve(len(self._ids) + new)
+            for entity, vector in zip(entities, vectors):
+                slot = self._slots.get(entity["id"])
+                if slot is None:
+                    slot = len(self._ids)
+                    self._slots[entity["id"]] = slot
+                    self._ids.append(entity["id"])
+                    self._contents.append(entity["content"])
+                    self._metadata.append(entity.get("metadata") or {})
+                    self._timestamps.append(entity.get("timestamp", 0))
+                else:
+                    self._contents[slot] = entity["content"]
+                    self._metadata[slot] = entity.get("metadata") or {}
+                    self._timestamps[slot] = entity.get("timestamp", 0)
+                self._vectors[slot] = vector
+                self._squared_norms[slot] = float(vector @ vector)
+            self._masks.clear()
+        return LocalMutationResult([entity["id"] for entity in entities])
+
+    def delete(self, expr: str) -> LocalMutationResult:
+        """Delete the entities matching a filter expression."""
+        with self._lock:
+            doomed = [self._ids[slot] for slot in np.flatnonzero(self._mask(expr))]
+            for doc_id in doomed:
+                slot = self._slots.pop(doc_id)
+                last = len(self._ids) - 1
+                if slot != last:
+                    moved = self._ids[last]
+                    self._ids[slot] = moved
+                    self._contents[slot] = self._contents[last]
+                    self._metadata[slot] = self._metadata[last]
+                    self._timestamps[slot] = self._timestamps[last]
+                    self._vectors[slot] = self._vectors[last]
+                    self._squared_norms[slot] = self._squared_norms[last]
+                    self._slots[moved] = slot
+                for column in (self._ids, self._contents, self._metadata, self._timestamps):
+                    column.pop()
+            self._masks.clear()
+        return LocalMutationResult(doomed)
+
+    def flush(self) -> None:
+        """Write the collection to disk, replacing both files atomically."""
+        with self._lock:
+            count = len(self._ids)
+            tmp_vectors = self._vectors_path.with_name(f"{self._vectors_path.name}.{os.getpid()}.tmp")
+            with open(tmp_vectors, 'wb') as f:
+                np.ascontiguousarray(self._vectors[:count]).tofile(f)
+            tmp_rows = self._rows_path.with_name(f"{self._rows_path.name}.{os.getpid()}.tmp")
+            with open(tmp_rows, 'w', encoding='utf-8') as f:
+                json.dump({
+                    "dim": self.dim,
+                    "ids": self._ids,
+                    "contents": self._contents,
+                    "metadata": self._metadata,
+                    "timestamps": self._timestamps
+                }, f)
+            os.replace(tmp_vectors, self._vectors_path)
+            os.replace(tmp_rows, self._rows_path)
+        self.logger.debug(f"Flushed {count} entities of {self.name} to {self.directory}")
+
+    def query(
+        self,
+        expr: str,
+        output_fields: Optional[List[str]] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        **kwargs
+    ) -> List[Dict[str, Any]]:
+        """Entities matching a filter expression, in storage order."""
+        with self._lock:
+            slots = np.flatnonzero(self._mask(expr))
+            end = None if limit is None else offset + limit
+            return [self._entity(slot, output_fields) for slot in slots[offset:end]]
+
+    def query_iterator(
+        self,
+        batch_size: int = 1000,
+        expr: Optional[str] = None,
+        output_fields: Optional[List[str]] = None,
+        **kwargs
+    ) -> LocalQueryIterator:
+        """Iterator over the entities matching a filter expression."""
+        return LocalQueryIterator(self.query(expr, output_fields), batch_size)
+
+    def search(
+        self,
+        data: List[List[float]],
+        anns_field: str = "embedding",
+        param: Optional[Dict[str, Any]] = None,
+        limit: int = 10,
+        expr: Optional[str] = None,
+        output_fields: Optional[List[str]] = None,
+        **kwargs
+    ) -> List[List[LocalHit]]:
+        """
+        Exact top-k search, one list of hits per query vector.
+
+        Distances follow Milvus: squared Euclidean distance for L2
+        (smallest first), inner product for IP and cosine similarity for
+        COSINE (largest first).
+        """
+        metric = ((param or {}).get("metric_type") or self.metric_type).upper()
+        queries = np.asarray(data, dtype=np.float32).reshape(len(data), self.dim)
+        with self._lock:
+            slots = np.flatnonzero(self._mask(expr))
+            if not len(slots):
+                return [[] for _ in queries]
+            if len(slots) == len(self._ids):
+                # Unfiltered: use views instead of copying the matrix
+                vectors = self._vectors[:len(slots)]
+                squared_norms = self._squared_norms[:len(slots), None]
+            else:
+                vectors = self._vectors[slots]
+                squared_norms = self._squared_norms[slots, None]
+            products = vectors @ queries.T
+            if metric == "L2":
+                scores = squared_norms - 2 * products + np.einsum('ij,ij->i', queries, queries)
+            elif metric == "COSINE":
+                norms = np.sqrt(squared_norms) * np.linalg.norm(queries, axis=1)
+                scores = -products / np.maximum(norms, 1e-12)
+            else:
+                scores = -products
+            k = min(limit, len(slots))
+            results = []
+            for column in scores.T:
+                top = np.argpartition(column, k - 1)[:k] if k < len(slots) else np.arange(len(slots))
+                top = top[np.argsort(column[top], kind='stable')]
+                sign = 1.0 if metric == "L2" else -1.0
+                results.append([
+                    LocalHit(
+                        self._ids[slots[i]],
+                        sign * float(column[i]),
+                        self._entity(slots[i], output_fields)
+                    )
+                    for i in top
+                ])
+            return results
+
+    def _mask(self, expr: Optional[str]) -> np.ndarray:
+        """Boolean mask of the rows matching expr, cached until the next change."""
+        key = expr or ""
+        mask = self._masks.get(key)
+        if mask is None:
+            if not key.strip():
+                mask = np.ones(len(self._ids), dtype=bool)
+            else:
+                predicate = compile_filter(expr)
+                mask = np.fromiter(
+                    (predicate(self._row(slot)) for slot in range(len(self._ids))),
+                    dtype=bool, count=len(self._ids)
+                )
+            if len(self._masks) >= 256:
+                self._masks.clear()
+            self._masks[key] = mask
+        return mask
+
+    def _row(self, slot: int) -> Dict[str, Any]:
+        return {
+            "id": self._ids[slot],
+            "content": self._contents[slot],
+            "metadata": self._metadata[slot],
+            "timestamp": self._timestamps[slot]
+        }
+
+    def _entity(self, slot: int, output_fields: Optional[List[str]]) -> Dict[str, Any]:
+        """Row fields to return; the ID is always included."""
+        row = self._row(slot)
+        if output_fields:
+            row = {field: row[field] for field in ["id"] + list(output_fields) if field in row}
+        return row
+
+    def _reserve(self, count: int) -> None:
+        """Make room for count rows, doubling the matrix when it grows."""
+        if count <= len(self._vectors):
+            return
+        capacity = max(count, 2 * len(self._vectors), 64)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        norms = np.zeros(capacity, dtype=np.float32)
+        used = len(self._ids)
+        vectors[:used] = self._vectors[:used]
+        norms[:used] = self._squared_norms[:used]
+        self._vectors = vectors
+        self._squared_norms = norms
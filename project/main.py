@@ -33,7 +33,7 @@ from rich import print as rprint
 from dotenv import load_dotenv
 
 # Import all components
-from milvus_rag_handler import MilvusRAGHandler
+from milvus_rag_handler import MilvusRAGHandler, close_handlers, get_handler
 from model_manager import ModelManager
 from validation_engine import ValidationEngine
 from generation_pipeline import GenerationPipeline
@@ -117,10 +117,10 @@ class RenodeModelGenerator:
         
     @property
     def milvus_handler(self) -> MilvusRAGHandler:
-        """Lazy load Milvus handler."""
+        """Lazy load the shared Milvus handler."""
         if self._milvus_handler is None:
-            # Pass the config path to the handler instead of individual parameters
-            self._milvus_handler = MilvusRAGHandler(self.config_path)
+            # One handler per config file in this process (see get_handler)
+            self._milvus_handler = get_handler(self.config_path)
         return self._milvus_handler
         
     @property
@@ -145,7 +145,7 @@ class RenodeModelGenerator:
             self._generation_pipeline = GenerationPipeline(self.config_path)
             
             # Set required components from Application instance
-            self._generation_pipeline.milvus_handler = self.milvus_handler
+            self._generation_pipeline.rag_handler = self.milvus_handler
             self._generation_pipeline.model_manager = self.model_manager
             self._generation_pipeline.validation_engine = self.validation_engine
             
@@ -187,6 +187,8 @@ class RenodeModelGenerator:
             self.logger.error(f"Unexpected error: {e}", exc_info=True)
             self.console.print(f"[red]Unexpected error: {e}[/red]")
             sys.exit(1)
+        finally:
+            close_handlers()
             
     def _create_parser(self) -> argparse.ArgumentParser:
         """Create command-line argument parser."""
@@ -267,14 +269,31 @@ class RenodeModelGenerator:
         )
         update_parser.add_argument(
             '--knowledge-dir', required=True,
-            help='Path to directory containing documentation files (.md, .cs)'
+            help='Path to directory containing documentation files (.md, .cs) and chunk files (.json, .jsonl)'
         )
         update_parser.add_argument(
             '--config', default='config.yaml',
             help='Path to configuration file (default: config.yaml)'
         )
+        update_parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Show what would be inserted, updated and deleted without writing'
+        )
         update_parser.set_defaults(func=self.cmd_update_knowledge)
         
+        # Rebuild-index command
+        rebuild_index_parser = subparsers.add_parser(
+            'rebuild-index',
+            help='Rebuild the vector indexes from milvus.index_params'
+        )
+        rebuild_index_parser.add_argument(
+            '--collection',
+            choices=['peripheral_docs', 'renode_examples', 'all'],
+            default='all',
+            help='Collection whose index to rebuild (default: all)'
+        )
+        rebuild_index_parser.set_defaults(func=self.cmd_rebuild_index)
+        
         # Resume command
         resume_parser = subparsers.add_parser(
             'resume',
@@ -421,16 +440,43 @@ class RenodeModelGenerator:
         self.console.print(f"\n[bold]Updating knowledge base from:[/bold] {args.knowledge_dir}")
         try:
             # Use the Milvus handler to update the knowledge base
-            stats = self.milvus_handler.update_knowledge_base(args.knowledge_dir)
-            self.console.print(f"[green]✓ Knowledge base updated successfully![/green]")
+            stats = self.milvus_handler.update_knowledge_base(
+                args.knowledge_dir, dry_run=args.dry_run
+            )
+            if args.dry_run:
+                self.console.print(f"[yellow]Dry run: no changes written[/yellow]")
+            else:
+                self.console.print(f"[green]✓ Knowledge base updated successfully![/green]")
             self.console.print(f"  Processed files: {stats['processed']}")
-            self.console.print(f"  Inserted chunks: {stats['inserted']}")
+            if stats["chunk_files"]:
+                self.console.print(f"  Chunk files: {stats['chunk_files']} "
+                                   f"({stats['skipped']} Markdown files not re-chunked)")
+            self.console.print(f"  Inserted/updated chunks: {stats['inserted']}")
+            self.console.print(f"  Unchanged chunks: {stats['unchanged']}")
+            self.console.print(f"  Deleted chunks: {stats['deleted']}")
             self.console.print(f"  Errors: {stats['errors']}")
+            for stage, stage_stats in stats["stages"].items():
+                if stage_stats["seconds"]:
+                    rate = stage_stats["docs"] / stage_stats["seconds"]
+                    self.console.print(f"  {stage.capitalize()} stage: {stage_stats['docs']} docs, {rate:.1f} docs/s")
         except Exception as e:
             self.logger.error(f"Knowledge base update failed: {e}", exc_info=True)
             self.console.print(f"[red]✗ Knowledge base update failed: {e}[/red]")
             sys.exit(1)
             
+    def cmd_rebuild_index(self, args):
+        """Rebuild vector indexes after changing milvus.index_params."""
+        collections = ['peripheral_docs', 'renode_examples'] if args.collection == 'all' else [args.collection]
+        for collection_name in collections:
+            self.console.print(f"\n[bold]Rebuilding index:[/bold] {collection_name}")
+            try:
+                params = self.milvus_handler.rebuild_index(collection_name)
+                self.console.print(f"[green]✓ {params['index_type']} ({params['metric_type']}) {params['params']}[/green]")
+            except Exception as e:
+                self.logger.error(f"Index rebuild failed: {e}", exc_info=True)
+                self.console.print(f"[red]✗ Index rebuild failed: {e}[/red]")
+                sys.exit(1)
+            
     def cmd_validate(self, args):
         """Validate a peripheral model."""
         file_path = Path(args.file)
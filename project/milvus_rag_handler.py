@@ -12,19 +12,33 @@ Key features:
 - Complete document retrieval with all chunks
 - Context validation for completeness
 - Proper chunk ordering by section type
+- Awaitable retrieval for asyncio callers
 - Comprehensive error handling
 
 Author: Renode Model Generator Team
 Version: 2.0.0
 """
 
+import asyncio
+import bisect
+import functools
+import hashlib
+import heapq
+import itertools
 import json
 import logging
+import math
+import os
+import queue
+import re
+import threading
+import time
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple, Set
-from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Set, Iterable, Iterator, Callable
+from collections import defaultdict, OrderedDict
 from enum import Enum
 
 import numpy as np
@@ -39,6 +53,11 @@ from pymilvus import (
 )
 from sentence_transformers import SentenceTransformer
 
+from chunk_processor import (
+    CHUNK_FILE_SUFFIXES, count_chunk_file, count_tokens, iter_chunk_file, iter_text_spans
+)
+from local_vector_store import LocalCollection
+
 
 class SectionType(Enum):
     """Enumeration of document section types in priority order."""
@@ -51,6 +70,98 @@ class SectionType(Enum):
     OTHER = "other"
 
 
+# Keywords naming each section type, in SectionType priority order. Bare
+# "register" is too common in running text to count outside headings.
+SECTION_KEYWORDS = {
+    SectionType.MEMORY_MAP: (r"memory maps?", r"register maps?", r"address maps?", r"register summary"),
+    SectionType.REGISTERS: (r"register descriptions?", r"field descriptions?", r"register definitions?",
+                            r"bit fields?", r"reset values?"),
+    SectionType.FUNCTIONAL_DESCRIPTION: (r"functional descriptions?", r"functional overview",
+                                         r"modes? of operation", r"theory of operation", r"operation",
+                                         r"block diagram"),
+    SectionType.INTERRUPTS: (r"interrupts?", r"irqs?", r"exceptions?"),
+    SectionType.TIMING: (r"timing", r"clocks?", r"clocking"),
+    SectionType.EXAMPLES: (r"examples?", r"initialization sequences?", r"application information",
+                           r"code samples?")
+}
+HEADING_KEYWORDS = {
+    SectionType.REGISTERS: (r"registers?",)
+}
+
+
+def _section_pattern() -> re.Pattern:
+    """
+    Compile one pattern matching every section keyword.
+    
+    The named group that matched gives the section type, and earlier
+    alternatives win at the same position ("register map" is a memory map,
+    not a register). Matches are anchored at word starts with a keyword's
+    first letter, so the alternation is not tried at every character.
+    """
+    groups = [f"(?P<{t.value}>{'|'.join(k)})" for t, k in SECTION_KEYWORDS.items()]
+    groups += [f"(?P<{t.value}__heading>{'|'.join(k)})" for t, k in HEADING_KEYWORDS.items()]
+    initials = sorted({keyword[0] for keywords in (*SECTION_KEYWORDS.values(), *HEADING_KEYWORDS.values())
+                       for keyword in keywords})
+    return re.compile(rf"\b(?=[{''.join(initials)}])(?:{'|'.join(groups)})\b", re.IGNORECASE)
+
+
+SECTION_PATTERN = _section_pattern()
+SECTION_PRIORITY = {t.value: i for i, t in enumerate(SectionType)}
+
+
+def classify_sections(
+    headings: List[List[str]],
+    contents: List[str]
+) -> List[str]:
+    """
+    Classify a batch of chunks into SectionType values.
+    
+    The deepest heading that names a section type decides, taking the
+    highest-priority type it names; chunks whose headings name none are
+    classified by the type their content mentions most. The batch is
+    scanned as one string with SECTION_PATTERN, matched case-insensitively
+    so no lowercased copies are made.
+    
+    Args:
+        headings: Heading hierarchy of each chunk, outermost first
+        contents: Content of each chunk
+        
+    Returns:
+        Section type value of each chunk
+    """
+    # Segments per chunk: headings from deepest to outermost, then content
+    segments, owners, starts = [], [], []
+    offset = 0
+    for i, (hierarchy, content) in enumerate(zip(headings, contents)):
+        for depth, text in enumerate(list(reversed(hierarchy)) + [content]):
+            segments.append(text)
+            owners.append((i, depth if depth < len(hierarchy) else None))
+            starts.append(offset)
+            offset += len(text) + 1
+    
+    heading_types = [None] * len(contents)  # (depth, priority, type)
+    content_counts = [defaultdict(int) for _ in contents]
+    for match in SECTION_PATTERN.finditer("\0".join(segments)):
+        i, depth = owners[bisect.bisect_right(starts, match.start()) - 1]
+        section_type, _, heading_only = match.lastgroup.partition("__")
+        if depth is not None:
+            candidate = (depth, SECTION_PRIORITY[section_type], section_type)
+            if heading_types[i] is None or candidate < heading_types[i]:
+                heading_types[i] = candidate
+        elif not heading_only:
+            content_counts[i][section_type] += 1
+    
+    section_types = []
+    for heading_type, counts in zip(heading_types, content_counts):
+        if heading_type is not None:
+            section_types.append(heading_type[2])
+        elif counts:
+            section_types.append(min(counts, key=lambda t: (-counts[t], SECTION_PRIORITY[t])))
+        else:
+            section_types.append(SectionType.OTHER.value)
+    return section_types
+
+
 class MilvusConnectionError(Exception):
     """Raised when connection to Milvus fails."""
     pass
@@ -66,6 +177,517 @@ class ContextValidationError(Exception):
     pass
 
 
+class EmbeddingError(Exception):
+    """Raised when embeddings cannot be generated."""
+    pass
+
+
+class OllamaEmbeddingClient:
+    """
+    Pooled, concurrent client for the Ollama embedding API.
+    
+    Texts are sent in batches to the batch ``/api/embed`` endpoint when the
+    server provides it, falling back to one ``/api/embeddings`` request per
+    text on older servers. Requests share one pooled HTTP session, at most
+    ``concurrency`` are in flight, and failed requests are retried with
+    exponential backoff.
+    """
+    
+    def __init__(
+        self,
+        endpoint: str,
+        model: str,
+        timeout: float = 10.0,
+        concurrency: int = 4,
+        batch_size: int = 32,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5
+    ):
+        """
+        Initialize the client.
+        
+        Args:
+            endpoint: Ollama base URL, e.g. http://localhost:11434
+            model: Embedding model name
+            timeout: Per-request timeout in seconds
+            concurrency: Maximum number of concurrent requests
+            batch_size: Texts per /api/embed request
+            max_retries: Retries per request after the first attempt
+            retry_backoff: Initial retry delay in seconds, doubled per retry
+        """
+        import requests
+        from requests.adapters import HTTPAdapter
+        
+        self.logger = logging.getLogger(__name__)
+        self.endpoint = endpoint.rstrip('/')
+        self.model = model
+        self.timeout = timeout
+        self.concurrency = max(1, concurrency)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max(0, max_retries)
+        self.retry_backoff = retry_backoff
+        
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
+        # None until the first request shows whether /api/embed exists
+        self.batch_supported: Optional[bool] = None
+        self._probe_lock = threading.Lock()
+    
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts, preserving order.
+        
+        Args:
+            texts: List of text strings
+            
+        Returns:
+            List of embedding vectors, one per text
+            
+        Raises:
+            EmbeddingError: If a request still fails after all retries
+        """
+        if not texts:
+            return []
+        
+        if self.batch_supported is not False:
+            batches = [
+                texts[i:i + self.batch_size]
+                for i in range(0, len(texts), self.batch_size)
+            ]
+            # The first batch runs alone so that an old server without
+            # /api/embed is detected before the rest are sent
+            results = []
+            with self._probe_lock:
+                if self.batch_supported is None:
+                    first = self._embed_batch(batches[0])
+                    if first is not None:
+                        self.batch_supported = True
+                        results.append(first)
+                        batches = batches[1:]
+            if self.batch_supported:
+                results.extend(self._map(self._embed_batch, batches))
+                return [embedding for batch in results for embedding in batch]
+        
+        return self._map(self._embed_one, texts)
+    
+    def close(self) -> None:
+        """Close the pooled HTTP session."""
+        self.session.close()
+    
+    def _map(self, func, items: List[Any]) -> List[Any]:
+        """Run func over items with bounded concurrency, in order."""
+        if len(items) <= 1 or self.concurrency == 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items))) as executor:
+            return list(executor.map(func, items))
+    
+    def _embed_batch(self, texts: List[str]) -> Optional[List[List[float]]]:
+        """Embed a batch via /api/embed; None if the endpoint is missing."""
+        data = self._post("/api/embed", {"model": self.model, "input": texts})
+        if data is None:
+            self.batch_supported = False
+            self.logger.debug("Ollama /api/embed not available, using /api/embeddings")
+            return None
+        embeddings = data.get("embeddings")
+        if not embeddings or len(embeddings) != len(texts):
+            raise EmbeddingError(
+                f"Ollama returned {len(embeddings or [])} embeddings for {len(texts)} texts"
+            )
+        self.logger.debug(f"Embedded batch of {len(texts)} texts")
+        return embeddings
+    
+    def _embed_one(self, text: str) -> List[float]:
+        """Embed a single text via /api/embeddings."""
+        data = self._post("/api/embeddings", {"model": self.model, "prompt": text})
+        if data is None or not data.get("embedding"):
+            raise EmbeddingError(f"Embedding missing in response for text: {text[:50]}...")
+        return data["embedding"]
+    
+    def _post(self, path: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        POST payload with retries.
+        
+        Returns:
+            Decoded JSON response, or None if the endpoint returned 404
+            
+        Raises:
+            EmbeddingError: If the request fails after all retries
+        """
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            try:
+                response = self.session.post(
+                    f"{self.endpoint}{path}", json=payload, timeout=self.timeout
+                )
+                if response.status_code == 404 and path == "/api/embed":
+                    return None
+                response.raise_for_status()
+                return response.json()
+            except Exception as e:
+                last_error = e
+                self.logger.debug(
+                    f"Ollama request to {path} failed (attempt {attempt + 1}/"
+                    f"{self.max_retries + 1}): {e}"
+                )
+        raise EmbeddingError(f"Ollama request to {path} failed: {last_error}")
+
+
+def _parse_size(value: Any) -> int:
+    """Parse a size such as 1073741824, "512MB" or "1GB" into bytes."""
+    if isinstance(value, (int, float)):
+        return int(value)
+    text = str(value).strip().upper().replace(" ", "")
+    for suffix, factor in (("GB", 1024 ** 3), ("MB", 1024 ** 2), ("KB", 1024), ("B", 1)):
+        if text.endswith(suffix):
+            return int(float(text[:-len(suffix)]) * factor)
+    return int(text)
+
+
+def make_document_id(source: str, position: int, content: str) -> int:
+    """
+    Deterministic primary key for a document.
+    
+    Derived from the source path, the position within the source and a
+    hash of the content, so re-ingesting an unchanged chunk yields the same
+    key while an edited chunk gets a new one. The key fits a signed INT64.
+    """
+    digest = hashlib.sha256(f"{source}\0{position}\0{content}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") & ((1 << 63) - 1)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk embedding cache.
+    
+    Entries are keyed by the SHA-256 of (model, text) and stored as raw
+    float32 vectors, one file per entry, sharded into subdirectories by
+    the first two hex digits of the key. The total size on disk is kept
+    under max_bytes by evicting the least recently used entries; file
+    modification times record use, so the order survives restarts.
+    """
+    
+    SUFFIX = ".f32"
+    
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        Open the cache, indexing existing entries by last use.
+        
+        Args:
+            directory: Cache directory, created if missing
+            max_bytes: Upper bound on the total size of cached vectors
+        """
+        self.logger = logging.getLogger(__name__)
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        
+        self.directory.mkdir(parents=True, exist_ok=True)
+        found = []
+        for path in self.directory.glob(f"*/*{self.SUFFIX}"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((stat.st_mtime, path.stem, stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._evict()
+    
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        """Cache key for a text embedded with model."""
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+    
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Look up embeddings for texts.
+        
+        Args:
+            model: Embedding model identifier
+            texts: List of text strings
+            
+        Returns:
+            One embedding per text, or None where the text is not cached
+        """
+        results = []
+        for text in texts:
+            key = self.make_key(model, text)
+            with self._lock:
+                cached = key in self._entries
+                if cached:
+                    self._entries.move_to_end(key)
+            vector = self._read(key) if cached else None
+            if vector is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            results.append(vector)
+        return results
+    
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Store embeddings for texts, evicting old entries if over the bound.
+        
+        Args:
+            model: Embedding model identifier
+            texts: List of text strings
+            embeddings: Embedding vectors, one per text
+        """
+        for text, embedding in zip(texts, embeddings):
+            key = self.make_key(model, text)
+            path = self._path(key)
+            data = np.asarray(embedding, dtype=np.float32).tobytes()
+            try:
+                path.parent.mkdir(exist_ok=True)
+                tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+                tmp_path.write_bytes(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                self.logger.warning(f"Could not write embedding cache entry {key}: {e}")
+                continue
+            with self._lock:
+                self._total_bytes += len(data) - self._entries.pop(key, 0)
+                self._entries[key] = len(data)
+        self._evict()
+    
+    def _path(self, key: str) -> Path:
+        """File holding the vector for key."""
+        return self.directory / key[:2] / f"{key}{self.SUFFIX}"
+    
+    def _read(self, key: str) -> Optional[List[float]]:
+        """Read a cached vector, refreshing its last-use time."""
+        path = self._path(key)
+        try:
+            vector = np.fromfile(path, dtype=np.float32)
+            os.utime(path)
+        except (FileNotFoundError, ValueError):
+            with self._lock:
+                self._total_bytes -= self._entries.pop(key, 0)
+            return None
+        return vector.tolist()
+    
+    def _evict(self) -> None:
+        """Remove least recently used entries until under max_bytes."""
+        evicted = 0
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes or not self._entries:
+                    break
+                key, size = self._entries.popitem(last=False)
+                self._total_bytes -= size
+            try:
+                self._path(key).unlink()
+            except FileNotFoundError:
+                pass
+            evicted += 1
+        if evicted:
+            self.logger.debug(f"Evicted {evicted} entries from embedding cache")
+
+
+class BM25Index:
+    """
+    In-process BM25 inverted index over document chunks.
+    
+    Complements vector search for exact identifiers such as register
+    names: text is split into alphanumeric tokens, and identifiers with
+    underscores are indexed both whole and by part, so EDMA_CR matches
+    queries for "EDMA_CR" as well as "CR". Documents are keyed by their
+    Milvus primary key and keep their string metadata fields for
+    filtering. The index is saved to a JSON file and loaded on open;
+    documents can be added and removed individually.
+    """
+    
+    VERSION = 1
+    TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+    
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Open the index, loading it from path if the file exists.
+        
+        Args:
+            path: JSON file the index is saved to
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.logger = logging.getLogger(__name__)
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._docs: Dict[int, Dict[str, Any]] = {}
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._total_length = 0
+        
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == self.VERSION:
+                    for doc_id, doc in data["docs"].items():
+                        self._insert(int(doc_id), doc)
+            except (OSError, ValueError, KeyError) as e:
+                self.logger.warning(f"Ignoring unreadable lexical index {self.path}: {e}")
+                self._docs.clear()
+                self._postings.clear()
+                self._total_length = 0
+    
+    def __len__(self) -> int:
+        return len(self._docs)
+    
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._docs
+    
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Lowercased tokens of text, with underscore identifiers also split."""
+        tokens = []
+        for token in cls.TOKEN_PATTERN.findall(text.lower()):
+            tokens.append(token)
+            if "_" in token:
+                tokens.extend(part for part in token.split("_") if part)
+        return tokens
+    
+    def add(self, doc_id: int, content: str, metadata: Dict[str, Any]) -> None:
+        """Index a document, replacing any document with the same ID."""
+        terms = defaultdict(int)
+        tokens = self.tokenize(content)
+        for token in tokens:
+            terms[token] += 1
+        doc = {
+            "length": len(tokens),
+            "terms": dict(terms),
+            "fields": {key: value for key, value in metadata.items() if isinstance(value, str)}
+        }
+        with self._lock:
+            self._remove(doc_id)
+            self._insert(doc_id, doc)
+            self.dirty = True
+    
+    def remove(self, doc_ids: Iterable[int]) -> None:
+        """Remove documents from the index; unknown IDs are ignored."""
+        with self._lock:
+            for doc_id in doc_ids:
+                if self._remove(doc_id):
+                    self.dirty = True
+    
+    def ids_with_sources(self, sources: Set[str]) -> Set[int]:
+        """IDs of the indexed documents whose source is in sources."""
+        with self._lock:
+            return {
+                doc_id for doc_id, doc in self._docs.items()
+                if doc["fields"].get("source") in sources
+            }
+    
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Find the documents best matching query.
+        
+        Args:
+            query: Query text
+            top_k: Number of results to return
+            filters: Metadata field values documents must have; a list
+                value matches any of its elements
+            
+        Returns:
+            List of (document ID, BM25 score), best first
+        """
+        filters = filters or {}
+        scores = defaultdict(float)
+        with self._lock:
+            if not self._docs:
+                return []
+            average_length = self._total_length / len(self._docs)
+            for term in set(self.tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (len(self._docs) - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    length = self._docs[doc_id]["length"]
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+            
+            def matches(doc_id: int) -> bool:
+                fields = self._docs[doc_id]["fields"]
+                for field, value in filters.items():
+                    allowed = value if isinstance(value, list) else [value]
+                    if fields.get(field) not in allowed:
+                        return False
+                return True
+            
+            return heapq.nlargest(
+                top_k,
+                ((doc_id, score) for doc_id, score in scores.items() if matches(doc_id)),
+                key=lambda item: item[1]
+            )
+    
+    def save(self) -> None:
+        """Write the index to its file if it changed since it was loaded."""
+        with self._lock:
+            if not self.dirty:
+                return
+            data = {"version": self.VERSION, "docs": {str(k): v for k, v in self._docs.items()}}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+        self.logger.debug(f"Saved lexical index with {len(self._docs)} documents to {self.path}")
+    
+    def _insert(self, doc_id: int, doc: Dict[str, Any]) -> None:
+        self._docs[doc_id] = doc
+        self._total_length += doc["length"]
+        for term, frequency in doc["terms"].items():
+            self._postings[term][doc_id] = frequency
+    
+    def _remove(self, doc_id: int) -> bool:
+        doc = self._docs.pop(doc_id, None)
+        if doc is None:
+            return False
+        self._total_length -= doc["length"]
+        for term in doc["terms"]:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+        return True
+
+
+# Handlers sharing the Milvus connection (alias "default") in this process;
+# the connection is closed when the last of them is
+_connection_users = 0
+_connection_lock = threading.Lock()
+
+# Search parameters each index type accepts; other types get all of them
+SEARCH_PARAM_KEYS = {
+    "FLAT": (),
+    "IVF_FLAT": ("nprobe",),
+    "IVF_SQ8": ("nprobe",),
+    "IVF_PQ": ("nprobe",),
+    "GPU_IVF_FLAT": ("nprobe",),
+    "GPU_IVF_PQ": ("nprobe",),
+    "HNSW": ("ef",),
+    "DISKANN": ("search_list",),
+}
+
+
 class MilvusRAGHandler:
     """Handles vector database operations for RAG-based document retrieval."""
     
@@ -91,6 +713,11 @@ class MilvusRAGHandler:
         
         self.config = full_config.get('milvus', {})
         self.knowledge_config = full_config.get('knowledge_base', {})
+        self.cache_config = full_config.get('cache', {}).get('embedding_cache', {})
+        
+        # "milvus" for a Milvus server, "local" for the in-process store
+        self.backend = self.config.get("backend", "milvus")
+        self.query_cache_config = full_config.get('cache', {}).get('query_embedding_cache', {})
         
         # Initialize embedding model from config
         self.embedding_model_name = self.config["embedding_model"]
@@ -98,17 +725,47 @@ class MilvusRAGHandler:
         
         # We'll load the model when needed
         self.embedding_model = None
+        self.embedding_service = self.config.get("embedding_service", "sentence_transformers")
+        self.ollama_model = self.config.get("ollama_model", self.embedding_model_name)
+        self.ollama_endpoint = self.config.get("ollama_endpoint", "http://localhost:11434")
+        self.ollama_client: Optional[OllamaEmbeddingClient] = None
+        
+        # On-disk embedding cache, keyed by the model actually producing vectors
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        embedding_model_id = self.ollama_model if self.embedding_service == "ollama" else self.embedding_model_name
+        self.embedding_cache_model = f"{self.embedding_service}:{embedding_model_id}"
+        if self.cache_config.get("enabled", False):
+            self.embedding_cache = EmbeddingCache(
+                self.cache_config.get("directory", "cache/embeddings"),
+                _parse_size(self.cache_config.get("max_size", "1GB"))
+            )
+        
+        # In-process LRU of query embeddings, shared by all searches
+        self.query_cache_size = (
+            self.query_cache_config.get("max_entries", 256)
+            if self.query_cache_config.get("enabled", True) else 0
+        )
+        self.query_embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        
+        # Local BM25 index per collection, fused with vector search results
+        self.lexical_config = self.knowledge_config.get("lexical_index", {})
+        self.lexical_indexes: Dict[str, BM25Index] = {}
         
-        # Connect to Milvus
-        self._connect()
+        # Token counts of retrieved chunks; IDs are derived from content
+        self.token_counts: "OrderedDict[Any, int]" = OrderedDict()
+        self._token_count_lock = threading.Lock()
         
-        # Initialize collections using names from config
-        collections_config = self.config.get("collections", {})
-        doc_collection_name = collections_config.get("peripheral_docs", "peripheral_docs")
-        example_collection_name = collections_config.get("renode_examples", "renode_examples")
+        # Guards connect/close and the lazily created embedding clients and
+        # lexical indexes, so one handler can be shared across threads
+        self._lock = threading.RLock()
+        self._async_executor: Optional[ThreadPoolExecutor] = None
+        self.connected = False
+        self.doc_collection: Optional[Collection] = None
+        self.example_collection: Optional[Collection] = None
         
-        self.doc_collection = self._init_collection(doc_collection_name)
-        self.example_collection = self._init_collection(example_collection_name)
+        # Connect to Milvus and load the collections
+        self.connect()
         
         # Section type priorities for ordering
         self.section_priorities = {
@@ -120,30 +777,91 @@ class MilvusRAGHandler:
             SectionType.EXAMPLES: 6,
             SectionType.OTHER: 7
         }
+        
+        if self.query_cache_size and self.query_cache_config.get("warmup", False):
+            self.warm_query_cache(self.query_cache_config.get("warmup_queries", []))
+    
+    def connect(self) -> None:
+        """
+        Connect to Milvus and load both collections, unless already connected.
+        
+        Called by the constructor; after close() it reconnects. Safe to call
+        from several threads: the collections are loaded once.
+        
+        Raises:
+            MilvusConnectionError: If connection or collection loading fails
+        """
+        with self._lock:
+            if self.connected:
+                return
+            self._connect()
+            try:
+                # Initialize collections using names from config
+                collections_config = self.config.get("collections", {})
+                doc_collection_name = collections_config.get("peripheral_docs", "peripheral_docs")
+                example_collection_name = collections_config.get("renode_examples", "renode_examples")
+                
+                self.doc_collection = self._init_collection(doc_collection_name)
+                self.example_collection = self._init_collection(example_collection_name)
+            except Exception:
+                self._disconnect()
+                raise
+            self.connected = True
     
     def _connect(self) -> None:
         """
         Establish connection to Milvus server.
         
+        Handlers in one process share the connection: it is opened by the
+        first handler to connect and counted for each one after that. With
+        the local backend there is no server, so nothing is done.
+        
         Raises:
             MilvusConnectionError: If connection fails
         """
-        try:
-            connections.connect(
-                alias="default",
-                host=self.config["host"],
-                port=self.config["port"],
-                timeout=30
-            )
-            self.logger.info(f"Connected to Milvus at {self.config['host']}:{self.config['port']}")
-        except Exception as e:
-            self.logger.error(f"Failed to connect to Milvus: {e}")
-            raise MilvusConnectionError(f"Failed to connect to Milvus: {e}")
+        global _connection_users
+        if self.backend == "local":
+            self.logger.info(f"Using local vector store in {self.config.get('local_store_dir', 'vector_store')}")
+            return
+        with _connection_lock:
+            if _connection_users == 0:
+                try:
+                    connections.connect(
+                        alias="default",
+                        host=self.config["host"],
+                        port=self.config["port"],
+                        timeout=30
+                    )
+                    self.logger.info(f"Connected to Milvus at {self.config['host']}:{self.config['port']}")
+                except Exception as e:
+                    self.logger.error(f"Failed to connect to Milvus: {e}")
+                    raise MilvusConnectionError(f"Failed to connect to Milvus: {e}")
+            _connection_users += 1
+    
+    def _disconnect(self) -> None:
+        """Release this handler's share of the Milvus connection."""
+        global _connection_users
+        if self.backend == "local":
+            return
+        with _connection_lock:
+            if _connection_users == 0:
+                return
+            _connection_users -= 1
+            if _connection_users > 0:
+                return
+            try:
+                connections.disconnect("default")
+                self.logger.info("Disconnected from Milvus")
+            except Exception as e:
+                self.logger.error(f"Error closing Milvus connection: {e}")
     
     def _init_collection(self, collection_name: str) -> Collection:
         """
         Initialize or load a Milvus collection.
         
+        With the local backend, the collection is a LocalCollection
+        stored under milvus.local_store_dir.
+        
         Args:
             collection_name: Name of the collection
             
@@ -155,10 +873,18 @@ class MilvusRAGHandler:
         """
         try:
             self.logger.info(f"Initializing collection: {collection_name}")
-            if utility.has_collection(collection_name):
+            if self.backend == "local":
+                collection = LocalCollection(
+                    collection_name,
+                    self.config.get("local_store_dir", "vector_store"),
+                    self.config["embedding_dim"],
+                    self.config.get("index_params", {}).get("metric_type", "L2")
+                )
+            elif utility.has_collection(collection_name):
                 self.logger.info(f"Collection exists: {collection_name}")
                 collection = Collection(collection_name)
                 self.logger.info(f"Collection object created: {collection_name}")
+                self.ensure_index(collection)
                 collection.load()
                 self.logger.info(f"Loaded existing collection: {collection_name}")
             else:
@@ -188,7 +914,8 @@ class MilvusRAGHandler:
             Created collection instance
         """
         fields = [
-            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+            # IDs come from make_document_id so that updates are idempotent
+            FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=False),
             FieldSchema(name="content", dtype=DataType.VARCHAR, max_length=65535),
             FieldSchema(name="embedding", dtype=DataType.FLOAT_VECTOR, dim=self.config["embedding_dim"]),
             FieldSchema(name="metadata", dtype=DataType.JSON),
@@ -205,34 +932,138 @@ class MilvusRAGHandler:
             schema=schema
         )
         
-        # Create index for vector field
-        # NOTE: The index type is set to FLAT. This provides a brute-force, exact search
-        # that guarantees 100% recall. For the specialized and relatively small-to-medium sized
-        # knowledge base of this project, the performance is sufficient, and the guarantee of
-        # finding the absolute best match is prioritized over the speed of an Approximate
-        # Nearest Neighbor (ANN) index. If the dataset scales into the millions of vectors,
-        # consider switching to an ANN index like HNSW or IVF_FLAT for better performance.
-        index_params = self.config.get("index_params", {
-            "metric_type": "L2",
-            "index_type": "FLAT",
-            "params": {} # FLAT index has no build parameters
-        })
-        
-        collection.create_index(
-            field_name="embedding",
-            index_params=index_params
-        )
+        # Create index for vector field from milvus.index_params. FLAT gives
+        # exact search; for corpora spanning many manuals an ANN index such
+        # as IVF_FLAT or HNSW is faster (see benchmark_ann.py for tuning)
+        self.ensure_index(collection)
         
         collection.load()
         
         return collection
     
+    def index_params(self) -> Dict[str, Any]:
+        """
+        Configured index parameters in the form Milvus expects.
+        
+        Build parameters may be given under "params" or, as in older
+        configs, next to index_type (e.g. nlist); both end up in "params".
+        Without milvus.index_params, an exact FLAT index is used.
+        
+        Returns:
+            Dictionary with index_type, metric_type and params
+        """
+        configured = dict(self.config.get("index_params") or {})
+        index_type = configured.pop("index_type", "FLAT")
+        metric_type = configured.pop("metric_type", "L2")
+        params = dict(configured.pop("params", None) or {})
+        params.update(configured)
+        return {"index_type": index_type, "metric_type": metric_type, "params": params}
+    
+    def search_params(self, overrides: Optional[Dict[str, Any]] = None, top_k: int = 10) -> Dict[str, Any]:
+        """
+        Search parameters for the configured index.
+        
+        Starts from milvus.search_params, applies overrides and keeps only
+        the parameters the index type uses (nprobe for IVF indexes, ef for
+        HNSW, search_list for DISKANN). ef is raised to top_k, the
+        smallest value Milvus accepts.
+        
+        Args:
+            overrides: Per-search parameters, e.g. {"nprobe": 32} or {"ef": 128}
+            top_k: Number of results the search asks for
+            
+        Returns:
+            Dictionary with metric_type and params
+        """
+        index = self.index_params()
+        params = dict(self.config.get("search_params") or {})
+        params.update(overrides or {})
+        allowed = SEARCH_PARAM_KEYS.get(index["index_type"].upper())
+        if allowed is not None:
+            dropped = set(params) - set(allowed)
+            if dropped:
+                self.logger.debug(f"Ignoring search params {sorted(dropped)} for {index['index_type']} index")
+            params = {key: value for key, value in params.items() if key in allowed}
+        if "ef" in params:
+            params["ef"] = max(int(params["ef"]), top_k)
+        return {"metric_type": index["metric_type"], "params": params}
+    
+    def ensure_index(self, collection: Collection, rebuild: bool = False) -> Dict[str, Any]:
+        """
+        Make sure the collection's vector index matches milvus.index_params.
+        
+        A missing index is built. An index that differs from the config is
+        kept (rebuilding a large collection is slow) and a warning names
+        the command that rebuilds it, unless rebuild is set.
+        
+        Args:
+            collection: Collection to check
+            rebuild: Drop and rebuild an index that differs from the config
+            
+        Returns:
+            Index parameters of the collection afterwards
+        """
+        desired = self.index_params()
+        current = collection.indexes[0].params if collection.indexes else None
+        if current is not None:
+            if self._same_index(current, desired):
+                return current
+            if not rebuild:
+                self.logger.warning(
+                    f"Index of {collection.name} ({current}) differs from config ({desired}); "
+                    f"run 'main.py rebuild-index' to rebuild it"
+                )
+                return current
+            self.logger.info(f"Rebuilding index of {collection.name}: {current} -> {desired}")
+            collection.release()
+            collection.drop_index()
+        
+        start = time.perf_counter()
+        collection.create_index(field_name="embedding", index_params=desired)
+        self.logger.info(
+            f"Built {desired['index_type']} index on {collection.name} in {time.perf_counter() - start:.1f}s"
+        )
+        return desired
+    
+    def rebuild_index(self, collection_name: str = "peripheral_docs") -> Dict[str, Any]:
+        """
+        Rebuild a collection's vector index from milvus.index_params.
+        
+        Args:
+            collection_name: peripheral_docs or renode_examples
+            
+        Returns:
+            Index parameters of the collection afterwards
+        """
+        collection = self.doc_collection if collection_name == "peripheral_docs" else self.example_collection
+        if self.backend == "local":
+            self.logger.info("The local backend searches exactly and has no index to rebuild")
+            return {"index_type": "FLAT", "metric_type": collection.metric_type, "params": {}}
+        collection.flush()
+        params = self.ensure_index(collection, rebuild=True)
+        collection.load()
+        return params
+    
+    @staticmethod
+    def _same_index(current: Dict[str, Any], desired: Dict[str, Any]) -> bool:
+        """Compare index parameters, ignoring nesting and value types."""
+        def flatten(params: Dict[str, Any]) -> Dict[str, str]:
+            flat = {key: str(value) for key, value in params.items() if key != "params"}
+            nested = params.get("params") or {}
+            if isinstance(nested, str):
+                nested = json.loads(nested)
+            flat.update({key: str(value) for key, value in nested.items()})
+            return flat
+        return flatten(current) == flatten(desired)
+    
     def perform_similarity_search(
         self,
         query: str,
         peripheral_name: Optional[str] = None,
         section_type: Optional[str] = None,
-        top_k: int = 10
+        top_k: int = 10,
+        search_params: Optional[Dict[str, Any]] = None,
+        chunk_types: Optional[List[str]] = None
     ) -> List[Dict[str, Any]]:
         """
         Perform vector similarity search with metadata filtering.
@@ -242,6 +1073,10 @@ class MilvusRAGHandler:
             peripheral_name: Optional peripheral name filter
             section_type: Optional section type filter
             top_k: Number of results to return
+            search_params: Index search parameters, see search_documents
+            chunk_types: Optional chunk types to search, such as
+                ["table", "register_diagram"]; only chunks ingested from
+                chunk_processor output carry a chunk type
             
         Returns:
             List of documents with similarity scores
@@ -257,13 +1092,16 @@ class MilvusRAGHandler:
                 filters["peripheral_name"] = peripheral_name
             if section_type:
                 filters["section_type"] = section_type
+            if chunk_types:
+                filters["chunk_type"] = list(chunk_types)
             self.logger.info(f"[PSS_PRE_SEARCH_DOCS] Filters built: {filters}. Attempting to call search_documents.")
             
             results = self.search_documents(
                 query=query,
                 top_k=top_k,
                 filters=filters,
-                collection_name="peripheral_docs"
+                collection_name="peripheral_docs",
+                search_params=search_params
             )
             
             self.logger.info(f"[PSS_POST_SEARCH_DOCS] search_documents returned. Found {len(results)} documents for query: {query}")
@@ -286,100 +1124,318 @@ class MilvusRAGHandler:
             peripheral_name: Peripheral name to filter by
             
         Returns:
-            List of all chunks from the documents
+            List of all chunks from the documents, in position order
+            
+        Raises:
+            DocumentRetrievalError: If retrieval fails
+        """
+        chunks = list(self.iter_chunks(document_ids, peripheral_name))
+        self.logger.info(f"Retrieved {len(chunks)} chunks for peripheral: {peripheral_name}")
+        return chunks
+    
+    def iter_chunks(
+        self,
+        document_ids: List[str],
+        peripheral_name: str,
+        page_positions: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the chunks of the identified documents page by page.
+        
+        Chunks are restricted to the source files of document_ids that
+        belong to the peripheral (all of the peripheral's files if none
+        do) and are fetched in windows of page_positions chunk positions,
+        so they arrive in position order and only pages that are consumed
+        are transferred. Stop iterating to stop fetching.
+        
+        Args:
+            document_ids: IDs of the documents found by the similarity search
+            peripheral_name: Peripheral name to filter by
+            page_positions: Chunk positions per page (config
+                retrieval_page_positions, default 8)
+            
+        Yields:
+            Chunks with id, content and metadata, ordered by (position, source)
             
         Raises:
             DocumentRetrievalError: If retrieval fails
         """
+        if page_positions is None:
+            page_positions = self.config.get("retrieval_page_positions", 8)
         try:
-            # Build filter expression for peripheral name
-            expr = f'metadata["peripheral_name"] == "{peripheral_name}"'
-            
-            # Query all chunks for the peripheral
-            results = self.doc_collection.query(
-                expr=expr,
-                output_fields=["id", "content", "metadata"],
-                limit=1000  # Adjust based on expected document size
+            expr = self._chunk_scope_expr(document_ids, peripheral_name)
+            low, total = 0, 0
+            while True:
+                page = self.doc_collection.query(
+                    expr=f'{expr} and metadata["position"] >= {low} '
+                         f'and metadata["position"] < {low + page_positions}',
+                    output_fields=["id", "content", "metadata"],
+                    limit=16384  # Milvus query result window
+                )
+                if len(page) == 16384:
+                    self.logger.warning(f"Chunk page for {peripheral_name} truncated; lower retrieval_page_positions")
+                page.sort(key=lambda r: (r["metadata"].get("position", 0), r["metadata"].get("source", "")))
+                for result in page:
+                    metadata = result.get("metadata", {})
+                    total = max(total, metadata.get("total_chunks", 0))
+                    yield {
+                        "id": result.get("id"),
+                        "content": result.get("content"),
+                        "metadata": metadata
+                    }
+                low += page_positions
+                if low >= total:
+                    return
+            
+        except Exception as e:
+            self.logger.error(f"Failed to retrieve chunks: {e}")
+            raise DocumentRetrievalError(f"Failed to retrieve chunks: {e}")
+    
+    def iter_ranked_chunks(
+        self,
+        document_ids: List[str],
+        peripheral_name: str,
+        relevance: Optional[Dict[Any, float]] = None,
+        page_size: int = 32
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the chunks of the identified documents in packing order.
+        
+        Chunks are scoped as in iter_chunks, but ranked on their metadata
+        before any content is fetched: the best chunk of every section
+        first, then the rest by section priority, relevance and position,
+        the order pack_context packs them in. A token cut-off on this
+        stream therefore drops low-priority prose rather than register
+        chunks that happen to sit late in the document. Content is fetched
+        page_size chunks at a time; stop iterating to stop fetching.
+        
+        Args:
+            document_ids: IDs of the documents found by the similarity search
+            peripheral_name: Peripheral name to filter by
+            relevance: Relevance of chunks by ID, higher is better;
+                unscored chunks rank after scored ones
+            page_size: Chunks fetched per query
+            
+        Yields:
+            Chunks with id, content and metadata, in packing order
+            
+        Raises:
+            DocumentRetrievalError: If retrieval fails
+        """
+        relevance = relevance or {}
+        try:
+            expr = self._chunk_scope_expr(document_ids, peripheral_name)
+            ranked = defaultdict(list)
+            iterator = self.doc_collection.query_iterator(
+                batch_size=1000, expr=expr, output_fields=["id", "metadata"]
             )
+            try:
+                while True:
+                    rows = iterator.next()
+                    if not rows:
+                        break
+                    for row in rows:
+                        metadata = row.get("metadata") or {}
+                        ranked[metadata.get("section_type", "other")].append((
+                            -relevance.get(row["id"], float("-inf")),
+                            metadata.get("position", 0),
+                            row["id"]
+                        ))
+            finally:
+                iterator.close()
             
-            # Convert to standard format
-            chunks = []
-            for result in results:
-                chunks.append({
-                    "id": result.get("id"),
-                    "content": result.get("content"),
-                    "metadata": result.get("metadata", {})
-                })
+            section_order = sorted(ranked, key=self._section_priority)
+            for section_type in section_order:
+                ranked[section_type].sort()
+            order = [ranked[section_type][0][-1] for section_type in section_order]
+            order += [key[-1] for section_type in section_order for key in ranked[section_type][1:]]
             
-            self.logger.info(f"Retrieved {len(chunks)} chunks for peripheral: {peripheral_name}")
-            return chunks
+            for start in range(0, len(order), page_size):
+                page_ids = order[start:start + page_size]
+                rows = {
+                    row["id"]: row for row in self.doc_collection.query(
+                        expr=f"id in {page_ids}",
+                        output_fields=["id", "content", "metadata"]
+                    )
+                }
+                for chunk_id in page_ids:
+                    if chunk_id in rows:
+                        yield {
+                            "id": chunk_id,
+                            "content": rows[chunk_id].get("content"),
+                            "metadata": rows[chunk_id].get("metadata", {})
+                        }
             
         except Exception as e:
             self.logger.error(f"Failed to retrieve chunks: {e}")
             raise DocumentRetrievalError(f"Failed to retrieve chunks: {e}")
     
+    def _chunk_scope_expr(self, document_ids: List[str], peripheral_name: str) -> str:
+        """Filter for the peripheral's chunks from the source files of document_ids."""
+        expr = f'metadata["peripheral_name"] == {self._quote(peripheral_name)}'
+        if document_ids:
+            hits = self.doc_collection.query(
+                expr=f"id in {list(document_ids)}",
+                output_fields=["metadata"]
+            )
+            sources = sorted({
+                hit["metadata"]["source"] for hit in hits
+                if hit.get("metadata", {}).get("peripheral_name") == peripheral_name
+                and "source" in hit["metadata"]
+            })
+            if sources:
+                expr += f' and metadata["source"] in [{", ".join(self._quote(s) for s in sources)}]'
+        return expr
+    
+    def _section_priority(self, section_type: str) -> int:
+        """Packing priority of a section type, unknown types last."""
+        try:
+            return self.section_priorities[SectionType(section_type)]
+        except (ValueError, KeyError):
+            return len(self.section_priorities) + 1
+    
     def assemble_comprehensive_context(
         self,
-        chunks: List[Dict[str, Any]],
+        chunks: Iterable[Dict[str, Any]],
         max_tokens: int = 8000
     ) -> Tuple[str, Dict[str, List[Dict[str, Any]]]]:
         """
         Assemble chunks into comprehensive context with proper ordering.
         
+        See pack_context, which also returns the tokens used per section.
+        
         Args:
-            chunks: List of document chunks
+            chunks: Document chunks, in position order when streamed
             max_tokens: Maximum context size in tokens
             
         Returns:
-            Tuple of (assembled context string, chunks organized by section)
+            Tuple of (assembled context string, packed chunks organized by section)
+        """
+        context, sections, _ = self.pack_context(chunks, max_tokens)
+        return context, sections
+    
+    def pack_context(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        max_tokens: int = 8000,
+        relevance: Optional[Dict[Any, float]] = None,
+        overfetch: float = 1.5
+    ) -> Tuple[str, Dict[str, List[Dict[str, Any]]], Dict[str, int]]:
         """
-        # Organize chunks by section type
-        sections = defaultdict(list)
+        Pack the most useful chunks into a context of at most max_tokens.
+        
+        Tokens are counted with the tokenizer (see _count_chunk_tokens).
+        The most relevant chunk of every section is packed first, so each
+        section present gets represented, then the budget is filled in
+        section priority order, most relevant chunks first. Chunks that do
+        not fit are skipped rather than ending the section, so smaller
+        chunks after them can still be packed. Within a section, packed
+        chunks are emitted in document position order, and only sections
+        with packed chunks get a header.
+        
+        Chunks are consumed only until they add up to overfetch times
+        max_tokens, so a streamed iterable stops being fetched once there
+        is enough to choose from. Stream them in packing order (see
+        iter_ranked_chunks) so the cut-off only drops chunks that would
+        not have been packed anyway.
+        
+        Args:
+            chunks: Document chunks, in packing order when streamed
+            max_tokens: Maximum context size in tokens
+            relevance: Relevance of chunks by ID, higher is better;
+                unscored chunks rank after scored ones
+            overfetch: Candidate tokens to read, as a multiple of max_tokens
+            
+        Returns:
+            Tuple of (assembled context string, packed chunks organized by
+            section, tokens used per section including its header)
+        """
+        relevance = relevance or {}
+        
+        # Collect candidates by section type, skipping duplicates
+        candidates = defaultdict(list)
+        seen = set()
+        read_tokens = 0
         for chunk in chunks:
+            chunk_id = chunk.get("id")
+            if chunk_id is not None:
+                if chunk_id in seen:
+                    continue
+                seen.add(chunk_id)
             section_type = chunk.get("metadata", {}).get("section_type", "other")
-            sections[section_type].append(chunk)
-        
-        # Sort chunks within each section by position if available
-        for section_type, section_chunks in sections.items():
-            sections[section_type] = sorted(
-                section_chunks,
-                key=lambda x: x.get("metadata", {}).get("position", 0)
-            )
+            candidates[section_type].append(chunk)
+            read_tokens += self._count_chunk_tokens(chunk)
+            if read_tokens >= max_tokens * overfetch:
+                self.logger.info(f"Read {read_tokens} candidate tokens for a budget of {max_tokens}, not reading further chunks")
+                break
         
-        # Assemble context in priority order
-        context_parts = []
-        current_tokens = 0
+        section_order = sorted(candidates, key=self._section_priority)
+        for section_type in section_order:
+            candidates[section_type].sort(key=lambda c: (
+                -relevance.get(c.get("id"), float("-inf")),
+                c.get("metadata", {}).get("position", 0)
+            ))
+        
+        headers = {section_type: f"\n=== {section_type.upper()} ===\n" for section_type in section_order}
+        packed = defaultdict(list)
+        breakdown = defaultdict(int)
+        used_tokens = 0
+        
+        def pack(section_type: str, chunk: Dict[str, Any]) -> bool:
+            nonlocal used_tokens
+            cost = self._count_chunk_tokens(chunk) + 1
+            if not packed[section_type]:
+                cost += count_tokens(headers[section_type])
+            if used_tokens + cost > max_tokens:
+                return False
+            packed[section_type].append(chunk)
+            breakdown[section_type] += cost
+            used_tokens += cost
+            return True
+        
+        # Pass 1: the best chunk of each section; pass 2: fill by priority
+        for section_type in section_order:
+            pack(section_type, candidates[section_type][0])
+        for section_type in section_order:
+            for chunk in candidates[section_type][1:]:
+                pack(section_type, chunk)
         
-        # Define section order
-        section_order = [
-            SectionType.MEMORY_MAP.value,
-            SectionType.REGISTERS.value,
-            SectionType.FUNCTIONAL_DESCRIPTION.value,
-            SectionType.INTERRUPTS.value,
-            SectionType.TIMING.value,
-            SectionType.EXAMPLES.value,
-            SectionType.OTHER.value
-        ]
+        skipped = sum(len(c) for c in candidates.values()) - sum(len(c) for c in packed.values())
+        if skipped:
+            self.logger.info(f"Packed {used_tokens} of {max_tokens} tokens, skipped {skipped} chunks that did not fit")
         
+        context_parts = []
+        sections = {}
         for section_type in section_order:
-            if section_type in sections:
-                context_parts.append(f"\n=== {section_type.upper()} ===\n")
-                
-                for chunk in sections[section_type]:
-                    # Estimate tokens (rough approximation)
-                    chunk_tokens = len(chunk["content"]) // 4
-                    
-                    if current_tokens + chunk_tokens <= max_tokens:
-                        context_parts.append(chunk["content"])
-                        context_parts.append("\n")
-                        current_tokens += chunk_tokens
-                    else:
-                        self.logger.warning(f"Reached token limit, truncating context at {current_tokens} tokens")
-                        break
+            if not packed[section_type]:
+                continue
+            sections[section_type] = sorted(
+                packed[section_type],
+                key=lambda x: x.get("metadata", {}).get("position", 0)
+            )
+            context_parts.append(headers[section_type])
+            for chunk in sections[section_type]:
+                context_parts.append(chunk["content"])
+                context_parts.append("\n")
         
         assembled_context = "\n".join(context_parts)
-        return assembled_context, dict(sections)
-        
+        return assembled_context, sections, dict(breakdown)
+    
+    def _count_chunk_tokens(self, chunk: Dict[str, Any]) -> int:
+        """Token count of a chunk's content, cached by chunk ID."""
+        chunk_id = chunk.get("id")
+        if chunk_id is None:
+            return count_tokens(chunk["content"])
+        with self._token_count_lock:
+            tokens = self.token_counts.get(chunk_id)
+        if tokens is None:
+            tokens = count_tokens(chunk["content"])
+            with self._token_count_lock:
+                self.token_counts[chunk_id] = tokens
+                if len(self.token_counts) > 100000:
+                    self.token_counts.popitem(last=False)
+        return tokens
+    
     def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics for the current collections."""
         stats = {}
@@ -518,17 +1574,22 @@ class MilvusRAGHandler:
             # Step 2: Extract unique document IDs
             doc_ids = list(set(doc["id"] for doc in search_results))
             
-            # Step 3: Retrieve all chunks for the peripheral
-            all_chunks = self.retrieve_all_chunks(doc_ids, peripheral_name)
+            # Step 3: Stream the chunks for the peripheral in packing
+            # order; step 4 stops fetching them once it has enough
+            relevance = {doc["id"]: -rank for rank, doc in enumerate(search_results)}
+            chunks = self.iter_ranked_chunks(doc_ids, peripheral_name, relevance)
             
-            if not all_chunks:
-                raise DocumentRetrievalError(f"No chunks found for peripheral: {peripheral_name}")
-            
-            # Step 4: Assemble comprehensive context
-            context, sections = self.assemble_comprehensive_context(
-                chunks=all_chunks,
-                max_tokens=max_tokens
+            # Step 4: Pack the context by section priority and relevance
+            context, sections, token_breakdown = self.pack_context(
+                chunks=chunks,
+                max_tokens=max_tokens,
+                relevance=relevance
             )
+            chunks.close()
+            
+            total_chunks = sum(len(section_chunks) for section_chunks in sections.values())
+            if not total_chunks:
+                raise DocumentRetrievalError(f"No chunks found for peripheral: {peripheral_name}")
             
             # Step 5: Validate context
             is_valid, missing_sections = self.validate_context(context, sections)
@@ -546,9 +1607,10 @@ class MilvusRAGHandler:
                 "missing_sections": missing_sections,
                 "metadata": {
                     "peripheral_name": peripheral_name,
-                    "total_chunks": len(all_chunks),
+                    "total_chunks": total_chunks,
                     "context_length": len(context),
-                    "estimated_tokens": len(context) // 4,
+                    "estimated_tokens": sum(token_breakdown.values()),
+                    "token_breakdown": token_breakdown,
                     "retrieval_timestamp": datetime.now().isoformat()
                 }
             }
@@ -569,16 +1631,25 @@ class MilvusRAGHandler:
         query: str,
         top_k: int = 10,
         filters: Optional[Dict[str, Any]] = None,
-        collection_name: str = "peripheral_docs"
+        collection_name: str = "peripheral_docs",
+        search_params: Optional[Dict[str, Any]] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant documents using vector similarity.
         
+        When knowledge_base.lexical_index is enabled, the results are
+        merged with BM25 results for the same query (see
+        _fuse_lexical_results), which ranks exact identifiers such as
+        register names higher.
+        
         Args:
             query: Search query text
             top_k: Number of results to return
             filters: Optional metadata filters
             collection_name: Collection to search in
+            search_params: Index search parameters for this search, such
+                as {"nprobe": 32} or {"ef": 128}; defaults to
+                milvus.search_params
             
         Returns:
             List of relevant documents with scores
@@ -587,14 +1658,11 @@ class MilvusRAGHandler:
         
         # Generate query embedding
         self.logger.debug(f"Generating embedding for query: {query}")
-        query_embedding = self._generate_embeddings([query])[0]
+        query_embedding = self._embed_query(query)
         self.logger.debug(f"Embedding generated for query: {query}")
         
-        # Build search parameters
-        search_params = {
-            "metric_type": "L2",
-            "params": {} # FLAT index has no search parameters
-        }
+        # Build search parameters for the configured index
+        search_params = self.search_params(search_params, top_k)
         
         # Build filter expression if provided
         expr = self._build_filter_expression(filters) if filters else None
@@ -623,12 +1691,197 @@ class MilvusRAGHandler:
                     "score": hit.distance
                 })
         
+        index = self._lexical_index(collection_name)
+        if index is not None and len(index):
+            documents = self._fuse_lexical_results(collection, index, query, documents, top_k, filters)
+        
         return documents
     
+    def _fuse_lexical_results(
+        self,
+        collection: Collection,
+        index: BM25Index,
+        query: str,
+        documents: List[Dict[str, Any]],
+        top_k: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Merge vector search results with BM25 results by reciprocal rank fusion.
+        
+        Each document scores the sum of 1 / (rrf_k + rank) over the result
+        lists it appears in. Documents found only by BM25 are fetched from
+        the collection. Fused documents keep their vector distance as
+        "score" (None if found only by BM25) and gain "rrf_score".
+        
+        Args:
+            collection: Collection that was searched
+            index: Lexical index of the collection
+            query: Search query text
+            documents: Vector search results, best first
+            top_k: Number of results to return
+            filters: Metadata filters of the vector search
+            
+        Returns:
+            Fused results, best first
+        """
+        rrf_k = self.lexical_config.get("rrf_k", 60)
+        lexical = index.search(query, top_k, filters)
+        by_id = {doc["id"]: doc for doc in documents}
+        fused = defaultdict(float)
+        for rank, doc in enumerate(documents):
+            fused[doc["id"]] += 1.0 / (rrf_k + rank + 1)
+        for rank, (doc_id, _) in enumerate(lexical):
+            fused[doc_id] += 1.0 / (rrf_k + rank + 1)
+        
+        missing = [doc_id for doc_id, _ in lexical if doc_id not in by_id]
+        if missing:
+            for row in collection.query(expr=f"id in {missing}", output_fields=["id", "content", "metadata"]):
+                by_id[row["id"]] = {
+                    "id": row["id"],
+                    "content": row.get("content"),
+                    "metadata": row.get("metadata", {}),
+                    "score": None
+                }
+        
+        ranked = sorted((doc_id for doc_id in fused if doc_id in by_id), key=lambda doc_id: -fused[doc_id])
+        self.logger.debug(f"Fused {len(documents)} vector and {len(lexical)} lexical results")
+        return [dict(by_id[doc_id], rrf_score=fused[doc_id]) for doc_id in ranked[:top_k]]
+    
+    async def asearch_documents(
+        self,
+        query: str,
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        collection_name: str = "peripheral_docs",
+        search_params: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Awaitable search_documents.
+        
+        Query embedding and the Milvus search run on the handler's retrieval
+        threads (see _run_blocking), so the event loop is not blocked and
+        several searches can be gathered concurrently.
+        """
+        return await self._run_blocking(
+            self.search_documents, query, top_k, filters, collection_name, search_params
+        )
+    
+    async def asearch_many(
+        self,
+        queries: Iterable[str],
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        collection_name: str = "peripheral_docs",
+        search_params: Optional[Dict[str, Any]] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Run several searches concurrently.
+        
+        Queries not in the query embedding cache are embedded together in
+        one batch first, then the searches are gathered, so retrieving with
+        several sub-queries takes about as long as a single search.
+        
+        Args:
+            queries: Query texts, such as sub-questions about one peripheral
+            top_k: Number of results per query
+            filters: Optional metadata filters for every query
+            collection_name: Collection to search in
+            search_params: Index search parameters, see search_documents
+            
+        Returns:
+            Results of each query, in query order
+        """
+        queries = list(queries)
+        if self.query_cache_size and len(queries) > 1:
+            await self._run_blocking(self.warm_query_cache, queries)
+        return list(await asyncio.gather(*(
+            self.asearch_documents(query, top_k, filters, collection_name, search_params)
+            for query in queries
+        )))
+    
+    async def aperform_similarity_search(
+        self,
+        query: str,
+        peripheral_name: Optional[str] = None,
+        section_type: Optional[str] = None,
+        top_k: int = 10,
+        search_params: Optional[Dict[str, Any]] = None,
+        chunk_types: Optional[List[str]] = None
+    ) -> List[Dict[str, Any]]:
+        """Awaitable perform_similarity_search."""
+        return await self._run_blocking(
+            self.perform_similarity_search, query, peripheral_name, section_type,
+            top_k, search_params, chunk_types
+        )
+    
+    async def aretrieve_all_chunks(
+        self,
+        document_ids: List[str],
+        peripheral_name: str
+    ) -> List[Dict[str, Any]]:
+        """Awaitable retrieve_all_chunks."""
+        return await self._run_blocking(self.retrieve_all_chunks, document_ids, peripheral_name)
+    
+    async def aget_smart_context(
+        self,
+        query: str,
+        peripheral_name: str,
+        max_tokens: int = 8000,
+        validate: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Awaitable get_smart_context.
+        
+        Contexts for several peripherals or queries can be gathered
+        concurrently; each one runs on a retrieval thread.
+        """
+        return await self._run_blocking(self.get_smart_context, query, peripheral_name, max_tokens, validate)
+    
+    async def _run_blocking(self, func: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run a blocking call on the handler's retrieval thread pool.
+        
+        The pool is created on first use with milvus.async_workers threads
+        (default 8), which bounds the searches in flight at once.
+        """
+        with self._lock:
+            if self._async_executor is None:
+                self._async_executor = ThreadPoolExecutor(
+                    max_workers=self.config.get("async_workers", 8),
+                    thread_name_prefix="milvus-retrieval"
+                )
+            executor = self._async_executor
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args))
+    
+    def _lexical_index(self, collection_name: str) -> Optional[BM25Index]:
+        """
+        Get the BM25 index of a collection, loading it on first use.
+        
+        Returns:
+            The index, or None if knowledge_base.lexical_index is disabled
+        """
+        if not self.lexical_config.get("enabled", False):
+            return None
+        index = self.lexical_indexes.get(collection_name)
+        if index is None:
+            with self._lock:
+                index = self.lexical_indexes.get(collection_name)
+                if index is None:
+                    # Files are named after the Milvus collection the index mirrors
+                    name = self.config.get("collections", {}).get(collection_name, collection_name)
+                    index = BM25Index(os.path.join(self.lexical_config.get("directory", "cache/bm25"), f"{name}.json"))
+                    self.lexical_indexes[collection_name] = index
+        return index
+    
     def insert_documents(
         self,
         documents: List[Dict[str, Any]],
-        collection_name: str = "peripheral_docs"
+        collection_name: str = "peripheral_docs",
+        ids: Optional[List[int]] = None,
+        embeddings: Optional[List[List[float]]] = None,
+        flush: bool = True
     ) -> List[int]:
         """
         Insert documents into Milvus collection.
@@ -636,6 +1889,10 @@ class MilvusRAGHandler:
         Args:
             documents: List of documents with content and metadata
             collection_name: Target collection name
+            ids: Primary keys for the documents; when given, documents are
+                upserted so existing entities with these keys are replaced
+            embeddings: Precomputed embeddings; generated when omitted
+            flush: Flush the collection after inserting
             
         Returns:
             List of inserted document IDs
@@ -648,7 +1905,8 @@ class MilvusRAGHandler:
             
             # Prepare data for insertion
             contents = [doc["content"] for doc in documents]
-            embeddings = self._generate_embeddings(contents)
+            if embeddings is None:
+                embeddings = self._embed(contents)
             metadata = [doc.get("metadata", {}) for doc in documents]
             timestamps = [int(datetime.now().timestamp()) for _ in documents]
             
@@ -669,16 +1927,382 @@ class MilvusRAGHandler:
                 }
                 entities.append(entity)
             
-            insert_result = collection.insert(entities)
-            collection.flush()
+            if ids is not None:
+                for entity, doc_id in zip(entities, ids):
+                    entity["id"] = doc_id
+                insert_result = collection.upsert(entities)
+            else:
+                insert_result = collection.insert(entities)
+            if flush:
+                collection.flush()
             
-            self.logger.info(f"Inserted {len(entities)} documents into {collection_name}")
+            self.logger.debug(f"Inserted {len(entities)} documents into {collection_name}")
             return insert_result.primary_keys
             
         except Exception as e:
             self.logger.error(f"Failed to insert documents: {e}")
             raise MilvusException(f"Failed to insert documents: {e}")
     
+    def sync_documents(
+        self,
+        documents: Iterable[Dict[str, Any]],
+        collection_name: str,
+        scope_expr: str,
+        source_prefix: Optional[str] = None,
+        batch_size: int = 100,
+        dry_run: bool = False,
+        keep_sources: Optional[Set[str]] = None,
+        queue_size: int = 4
+    ) -> Dict[str, Any]:
+        """
+        Make the documents in a scope match the given documents.
+        
+        Each document gets a deterministic key from its source, position
+        and content (see make_document_id). Documents whose key already
+        exists are skipped without re-embedding, new or changed ones are
+        upserted, and existing documents in the scope that were not given,
+        such as old versions of changed chunks or chunks of deleted files,
+        are deleted. Collections created with auto-generated IDs cannot be
+        matched by key, so every document in the scope is replaced.
+        
+        Reading, embedding and inserting run as a pipeline of three stages
+        connected by bounded queues, so the stages overlap and at most
+        queue_size batches are held between stages whatever the number of
+        documents. The collection is flushed once at the end, and the
+        lexical index (see _lexical_index) is updated to match.
+        
+        Args:
+            documents: Documents with content and metadata (source, position)
+            collection_name: Target collection name
+            scope_expr: Milvus filter expression selecting the documents to sync
+            source_prefix: Only documents whose source starts with this
+                prefix are in scope (guards against wildcard matches)
+            batch_size: Number of documents per embedding and upsert call
+            dry_run: Only compute the changes, do not embed or write
+            keep_sources: Sources whose stored documents are never deleted;
+                read once documents is exhausted, so its producer may add
+                sources that failed to load
+            queue_size: Maximum number of batches queued between stages
+            
+        Returns:
+            Counts of unchanged, upserted and deleted documents, and the
+            documents and busy seconds of each stage
+        """
+        collection = self.doc_collection if collection_name == "peripheral_docs" else self.example_collection
+        explicit_ids = not collection.schema.auto_id
+        existing = self._query_ids(
+            collection, scope_expr, source_prefix,
+            with_sources=source_prefix is not None or keep_sources is not None
+        )
+        stats = {
+            "unchanged": 0, "upserted": 0, "deleted": 0,
+            "stages": {stage: {"docs": 0, "seconds": 0.0} for stage in ("read", "embed", "insert")}
+        }
+        start = time.perf_counter()
+        seen = set()
+        sources = set()
+        stop = threading.Event()
+        errors = []
+        # Lexical index entries are keyed like the documents in Milvus
+        index = self._lexical_index(collection_name) if explicit_ids and not dry_run else None
+        
+        def batches() -> Iterator[Tuple[List[Dict[str, Any]], List[int]]]:
+            """Stage 1: read documents, dropping those already stored."""
+            batch, batch_ids = [], []
+            iterator = iter(documents)
+            while True:
+                busy = time.perf_counter()
+                doc = next(iterator, None)
+                if doc is not None:
+                    meta = doc.get("metadata", {})
+                    doc_id = make_document_id(meta.get("source", ""), meta.get("position", 0), doc["content"])
+                    stats["stages"]["read"]["docs"] += 1
+                    unchanged = explicit_ids and (doc_id in existing or doc_id in seen)
+                    if index is not None and not (unchanged and doc_id in index):
+                        index.add(doc_id, doc["content"], meta)
+                    seen.add(doc_id)
+                    sources.add(meta.get("source", ""))
+                    if unchanged:
+                        stats["unchanged"] += 1
+                    else:
+                        batch.append(doc)
+                        batch_ids.append(doc_id)
+                stats["stages"]["read"]["seconds"] += time.perf_counter() - busy
+                if batch and (doc is None or len(batch) >= batch_size):
+                    yield batch, batch_ids
+                    batch, batch_ids = [], []
+                if doc is None:
+                    return
+        
+        def embed(item):
+            """Stage 2: embed a batch."""
+            batch, batch_ids = item
+            embeddings = self._embed([doc["content"] for doc in batch])
+            return batch, batch_ids, embeddings
+        
+        def insert(item) -> None:
+            """Stage 3: write a batch without flushing."""
+            batch, batch_ids, embeddings = item
+            self.insert_documents(
+                batch, collection_name,
+                ids=batch_ids if explicit_ids else None,
+                embeddings=embeddings,
+                flush=False
+            )
+        
+        if dry_run:
+            for batch, _ in batches():
+                stats["upserted"] += len(batch)
+        else:
+            read_queue = queue.Queue(maxsize=queue_size)
+            embed_queue = queue.Queue(maxsize=queue_size)
+            threads = [
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(batches(), None, read_queue, None, stop, errors),
+                    daemon=True
+                ),
+                threading.Thread(
+                    target=self._run_stage,
+                    args=(None, read_queue, embed_queue, embed, stop, errors, stats["stages"]["embed"]),
+                    daemon=True
+                )
+            ]
+            for thread in threads:
+                thread.start()
+            try:
+                self._run_stage(None, embed_queue, None, insert, stop, errors, stats["stages"]["insert"])
+            finally:
+                stop.set()
+                for thread in threads:
+                    thread.join()
+            if errors:
+                # Reload the lexical index from disk rather than keep
+                # entries for documents that may not have been written
+                self.lexical_indexes.pop(collection_name, None)
+                raise errors[0]
+            stats["upserted"] = stats["stages"]["insert"]["docs"]
+        
+        kept = keep_sources or set()
+        stale = sorted(
+            doc_id for doc_id, source in existing.items()
+            if doc_id not in seen and source not in kept
+        )
+        if stale and not dry_run:
+            for i in range(0, len(stale), 1000):
+                collection.delete(f"id in {stale[i:i + 1000]}")
+        stats["deleted"] = len(stale)
+        if not dry_run and (stats["upserted"] or stale):
+            collection.flush()
+        if index is not None:
+            index.remove(stale)
+            index.remove(index.ids_with_sources(sources) - seen)
+            index.save()
+        
+        elapsed = time.perf_counter() - start
+        rates = ", ".join(
+            f"{stage} {self._rate(stage_stats):.1f} docs/s"
+            for stage, stage_stats in stats["stages"].items()
+        )
+        self.logger.info(
+            f"{'Dry run: ' if dry_run else ''}{collection_name}: {stats['upserted']} upserted, "
+            f"{stats['unchanged']} unchanged, {stats['deleted']} deleted in {elapsed:.1f}s ({rates})"
+        )
+        return stats
+    
+    @staticmethod
+    def _rate(stage_stats: Dict[str, Any]) -> float:
+        """Documents per busy second of a pipeline stage."""
+        return stage_stats["docs"] / stage_stats["seconds"] if stage_stats["seconds"] else 0.0
+    
+    @staticmethod
+    def _run_stage(
+        source: Optional[Iterator[Any]],
+        inbox: Optional[queue.Queue],
+        outbox: Optional[queue.Queue],
+        work: Optional[Callable[[Any], Any]],
+        stop: threading.Event,
+        errors: List[Exception],
+        stage_stats: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """
+        Run one pipeline stage until its input is exhausted.
+        
+        Items come from source or inbox, are passed through work (if any)
+        and put on outbox (if any), ending with a None sentinel. The first
+        error is recorded and stops every stage; queue operations poll stop
+        so no stage blocks forever on a stage that has failed.
+        """
+        def put(item) -> bool:
+            while not stop.is_set():
+                try:
+                    outbox.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        
+        def items():
+            if source is not None:
+                yield from source
+                return
+            while not stop.is_set():
+                try:
+                    item = inbox.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is None:
+                    return
+                yield item
+        
+        try:
+            for item in items():
+                if work is not None:
+                    busy = time.perf_counter()
+                    result = work(item)
+                    stage_stats["seconds"] += time.perf_counter() - busy
+                    stage_stats["docs"] += len(item[0])
+                    item = result
+                if outbox is not None and not put(item):
+                    return
+                if stop.is_set():
+                    return
+        except Exception as e:
+            errors.append(e)
+            stop.set()
+        finally:
+            if outbox is not None and not stop.is_set():
+                put(None)
+    
+    def _query_ids(
+        self,
+        collection: Collection,
+        expr: str,
+        source_prefix: Optional[str] = None,
+        with_sources: bool = False
+    ) -> Dict[int, str]:
+        """
+        Primary keys of the documents matching expr (and source_prefix).
+        
+        Returns:
+            Mapping of primary key to source path, or chunk file for
+            documents read from one ("" unless with_sources)
+        """
+        ids = {}
+        with_sources = with_sources or source_prefix is not None
+        output_fields = ["id", "metadata"] if with_sources else ["id"]
+        iterator = collection.query_iterator(batch_size=1000, expr=expr, output_fields=output_fields)
+        try:
+            while True:
+                rows = iterator.next()
+                if not rows:
+                    break
+                for row in rows:
+                    metadata = row.get("metadata") or {}
+                    # Chunk-file documents belong to their chunk file
+                    source = (metadata.get("chunk_file") or metadata.get("source", "")) if with_sources else ""
+                    if source_prefix is not None and not source.startswith(source_prefix):
+                        continue
+                    ids[row["id"]] = source
+        finally:
+            iterator.close()
+        return ids
+    
+    @staticmethod
+    def _quote(value: str) -> str:
+        """Quote a string literal for a Milvus filter expression."""
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    
+    @classmethod
+    def _like_prefix(cls, prefix: str) -> str:
+        """Quoted LIKE pattern matching strings that start with prefix."""
+        return cls._quote(re.sub(r'([\\%_])', r'\\\1', prefix) + "%")
+    
+    def _embed_query(self, query: str) -> List[float]:
+        """
+        Get the embedding of a search query, using the query LRU cache.
+        
+        Args:
+            query: Query text
+            
+        Returns:
+            Embedding vector
+        """
+        with self._query_cache_lock:
+            embedding = self.query_embeddings.get(query)
+            if embedding is not None:
+                self.query_embeddings.move_to_end(query)
+                return embedding
+        
+        embedding = self._embed([query])[0]
+        self._remember_query_embeddings([query], [embedding])
+        return embedding
+    
+    def _remember_query_embeddings(self, queries: List[str], embeddings: List[List[float]]) -> None:
+        """Add query embeddings to the LRU cache, evicting the oldest entries."""
+        if not self.query_cache_size:
+            return
+        with self._query_cache_lock:
+            for query, embedding in zip(queries, embeddings):
+                self.query_embeddings[query] = embedding
+                self.query_embeddings.move_to_end(query)
+            while len(self.query_embeddings) > self.query_cache_size:
+                self.query_embeddings.popitem(last=False)
+    
+    def warm_query_cache(self, queries: Iterable[str]) -> int:
+        """
+        Pre-embed search queries so their first search skips embedding.
+        
+        Failures are logged and ignored, as warm-up is only an optimization.
+        
+        Args:
+            queries: Query texts, such as common peripheral questions
+            
+        Returns:
+            Number of queries embedded
+        """
+        with self._query_cache_lock:
+            missing = list(dict.fromkeys(q for q in queries if q not in self.query_embeddings))
+        if not missing:
+            return 0
+        try:
+            embeddings = self._embed(missing)
+        except Exception as e:
+            self.logger.warning(f"Query embedding warm-up failed: {e}")
+            return 0
+        self._remember_query_embeddings(missing, embeddings)
+        self.logger.info(f"Warmed query embedding cache with {len(missing)} queries")
+        return len(missing)
+    
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Get embeddings for texts, using the embedding cache when enabled.
+        
+        Only texts missing from the cache are sent to the embedding model;
+        their vectors are then added to the cache.
+        
+        Args:
+            texts: List of text strings
+            
+        Returns:
+            List of embedding vectors
+        """
+        if self.embedding_cache is None:
+            return self._generate_embeddings(texts)
+        
+        embeddings = self.embedding_cache.get_many(self.embedding_cache_model, texts)
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            generated = self._generate_embeddings(missing_texts)
+            self.embedding_cache.put_many(self.embedding_cache_model, missing_texts, generated)
+            for i, embedding in zip(missing, generated):
+                embeddings[i] = list(embedding)
+        self.logger.debug(
+            f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses"
+        )
+        return embeddings
+    
     def _generate_embeddings(self, texts: List[str]) -> List[List[float]]:
         """
         Generate embeddings for a list of texts.
@@ -688,56 +2312,34 @@ class MilvusRAGHandler:
             
         Returns:
             List of embedding vectors
+            
+        Raises:
+            EmbeddingError: If the Ollama service fails after retries
         """
-        self.logger.info(f"[_generate_embeddings_ENTRY] Called for {len(texts)} texts. Service: {self.embedding_service}")
+        self.logger.debug(f"Generating embeddings for {len(texts)} texts using {self.embedding_service}")
         if self.embedding_service == "ollama":
-            # Use Ollama embedding endpoint with batch processing
-            try:
-                import requests
-                self.logger.info(f"[_generate_embeddings_OLLAMA_TRY] Attempting Ollama embedding with batch processing.")
-                
-                # Process texts one by one since Ollama only supports single-prompt embedding
-                embeddings = []
-                ollama_request_timeout = self.config.get("ollama_request_timeout", 10.0)
-                
-                for text in texts:
-                    try:
-                        payload = {
-                            "model": self.config.get("ollama_model", self.ollama_model),
-                            "prompt": text  # Send single text per request
-                        }
-                        self.logger.info(f"[_generate_embeddings_OLLAMA_REQUEST] Processing text: {text[:50]}...")
-                        
-                        response = requests.post(
-                            f"{self.config.get('ollama_endpoint', self.ollama_endpoint)}/api/embeddings",
-                            json=payload,
-                            timeout=ollama_request_timeout
-                        )
-                        response.raise_for_status()
-                        
-                        embedding_data = response.json()
-                        if "embedding" in embedding_data:
-                            embeddings.append(embedding_data["embedding"])
-                        else:
-                            self.logger.error(f"[_generate_embeddings_OLLAMA_MISSING] Embedding missing in response for text: {text[:50]}...")
-                            embeddings.append([])  # Append empty list to maintain index alignment
-                    except Exception as e:
-                        self.logger.error(f"[_generate_embeddings_OLLAMA_ERROR] Failed to get embedding for text: {text[:50]}... Error: {e}")
-                        embeddings.append([])  # Append empty list to maintain index alignment
-                
-                self.logger.info(f"[_generate_embeddings_OLLAMA_SUCCESS] Generated {len(embeddings)} embeddings")
-                return embeddings
-            except requests.exceptions.Timeout:
-                self.logger.error(f"[_generate_embeddings_OLLAMA_TIMEOUT] Ollama batch request timed out after {ollama_request_timeout} seconds.", exc_info=True)
-                raise
-            except Exception as e:
-                self.logger.error(f"[_generate_embeddings_OLLAMA_EXCEPTION] Ollama batch embedding failed: {e}", exc_info=True)
-                raise
-        else:
-            self.logger.info(f"[_generate_embeddings_SENTENCE_TRANSFORMERS] Using SentenceTransformers.")
-            embeddings = self.embedding_model.encode(texts)
-            self.logger.info(f"[_generate_embeddings_SENTENCE_TRANSFORMERS_SUCCESS] SentenceTransformers embeddings generated.")
-            return embeddings.tolist()
+            return self._get_ollama_client().embed(texts)
+        
+        if self.embedding_model is None:
+            with self._lock:
+                if self.embedding_model is None:
+                    self.embedding_model = SentenceTransformer(self.embedding_model_name)
+        embeddings = self.embedding_model.encode(texts)
+        return embeddings.tolist()
+    
+    def _get_ollama_client(self) -> OllamaEmbeddingClient:
+        """Create the pooled Ollama client on first use."""
+        with self._lock:
+            if self.ollama_client is None:
+                self.ollama_client = OllamaEmbeddingClient(
+                    endpoint=self.ollama_endpoint,
+                    model=self.ollama_model,
+                    timeout=self.config.get("ollama_request_timeout", 10.0),
+                    concurrency=self.config.get("ollama_concurrency", 4),
+                    batch_size=self.config.get("ollama_batch_size", 32),
+                    max_retries=self.config.get("ollama_max_retries", 3)
+                )
+        return self.ollama_client
     
     def _build_filter_expression(self, filters: Dict[str, Any]) -> str:
         """
@@ -761,152 +2363,319 @@ class MilvusRAGHandler:
         
         return " and ".join(expressions)
     
-    def update_knowledge_base(self, knowledge_dir: str) -> Dict[str, int]:
+    def update_knowledge_base(self, knowledge_dir: str, dry_run: bool = False) -> Dict[str, Any]:
         """
         Update knowledge base from directory of documents.
         
+        Markdown (.md) files are split at sentence and paragraph boundaries
+        into chunks of knowledge_base.indexing.chunk_tokens tokens (see
+        chunk_processor.iter_text_chunks) in peripheral_docs, and C# (.cs)
+        files are stored whole in renode_examples. Chunk files written by
+        chunk_processor (.json or .jsonl) are ingested as they are, keeping
+        each chunk's heading_hierarchy, chunk_type, table_ids and part/of
+        as metadata; a Markdown file that a chunk file was made from
+        (matched by the chunks' source_file, relative to the working
+        directory) is then skipped rather than chunked again.
+        
+        Updates are idempotent: unchanged chunks are kept, new and changed
+        chunks are upserted and chunks of changed or deleted files under
+        knowledge_dir are removed (see sync_documents). Files are read and
+        chunked by a small thread pool and streamed into the ingestion
+        pipeline, so memory use does not grow with the size of the directory.
+        
         Args:
             knowledge_dir: Directory containing knowledge documents
+            dry_run: Report the changes without writing to Milvus
             
         Returns:
-            Statistics about updated documents
+            Statistics about updated documents, including the documents and
+            busy seconds of each pipeline stage
         """
         knowledge_path = Path(knowledge_dir)
-        stats = {"processed": 0, "inserted": 0, "errors": 0, "code_examples": 0, "docs": 0}
+        stats = {
+            "processed": 0, "inserted": 0, "errors": 0, "code_examples": 0, "docs": 0,
+            "unchanged": 0, "deleted": 0, "chunk_files": 0, "skipped": 0,
+            "stages": {stage: {"docs": 0, "seconds": 0.0} for stage in ("read", "embed", "insert")}
+        }
         
-        # Get chunking parameters from config
-        chunk_size = self.knowledge_config.get("indexing", {}).get("chunk_size", 1000)
-        chunk_overlap = self.knowledge_config.get("indexing", {}).get("chunk_overlap", 200)
+        # Get chunking parameters from config; the older chunk_size and
+        # chunk_overlap settings were in characters, about four per token
+        indexing = self.knowledge_config.get("indexing", {})
+        chunk_tokens = indexing.get("chunk_tokens", indexing.get("chunk_size", 1000) // 4)
+        chunk_overlap_tokens = indexing.get("chunk_overlap_tokens", indexing.get("chunk_overlap", 200) // 4)
+        
+        def process_file(file_path: Path) -> Iterable[Dict[str, Any]]:
+            if file_path.name.endswith(CHUNK_FILE_SUFFIXES):
+                # Chunk files from chunk_processor keep their structure and
+                # are streamed into the sync
+                return self._chunk_documents(
+                    iter_chunk_file(str(file_path)),
+                    count_chunk_file(str(file_path)),
+                    chunk_file=str(file_path)
+                )
+            
+            with open(file_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            
+            if file_path.suffix.lower() == ".cs":
+                # Process C# code examples as single documents
+                metadata = {
+                    "source": str(file_path),
+                    "filename": file_path.name,
+                    "title": file_path.stem,
+                    "type": "code_example"
+                }
+                return [{"content": content, "metadata": metadata}]
+            
+            # .md files: extract metadata from file
+            peripheral_name = self._extract_peripheral_name(file_path)
+            
+            # Chunk the document in one pass that keeps only the chunk
+            # offsets, which gives total_chunks; the chunks are sliced out
+            # and classified batch by batch as the sync consumes them
+            spans = list(iter_text_spans(content, chunk_tokens, chunk_overlap_tokens))
+            total_chunks = len(spans)
+            
+            def documents() -> Iterator[Dict[str, Any]]:
+                chunks = (content[start:end].strip() for start, end in spans)
+                position = 0
+                while True:
+                    batch = list(itertools.islice(chunks, 256))
+                    if not batch:
+                        return
+                    for chunk, section_type in zip(batch, classify_sections([[] for _ in batch], batch)):
+                        yield {
+                            "content": chunk,
+                            "metadata": {
+                                "source": str(file_path),
+                                "filename": file_path.name,
+                                "peripheral_name": peripheral_name,
+                                "section_type": section_type,
+                                "position": position,
+                                "total_chunks": total_chunks
+                            }
+                        }
+                        position += 1
+            
+            return documents()
+        
+        # Only the batch processor's chunk files are ingested as chunks;
+        # other JSON files under knowledge_dir are not documentation
+        file_paths = sorted(fp for fp in knowledge_path.rglob("*.*")
+                            if fp.suffix.lower() in (".md", ".cs")
+                            or fp.name.endswith(CHUNK_FILE_SUFFIXES))
+        chunk_paths = [fp for fp in file_paths if fp.name.endswith(CHUNK_FILE_SUFFIXES)]
+        covered = set()
+        
+        def doc_files() -> Iterator[Tuple[Path, Any]]:
+            # Chunk files go first so that the Markdown files they were
+            # made from are not chunked a second time
+            yield from self._read_files(chunk_paths, process_file)
+            markdown = []
+            for fp in file_paths:
+                if fp.suffix.lower() != ".md":
+                    continue
+                if fp.resolve() in covered:
+                    self.logger.debug(f"Skipping {fp}: ingested from its chunk file")
+                    stats["skipped"] += 1
+                else:
+                    markdown.append(fp)
+            yield from self._read_files(markdown, process_file)
+        
+        collections = {
+            "peripheral_docs": (doc_files, "docs"),
+            "renode_examples": (
+                lambda: self._read_files([fp for fp in file_paths if fp.suffix.lower() == ".cs"], process_file),
+                "code_examples"
+            )
+        }
         
-        # Use ThreadPoolExecutor for parallel file processing
-        from concurrent.futures import ThreadPoolExecutor
-        import threading
+        # Sync each collection with the documents found under knowledge_dir;
+        # files that failed to load are left untouched. Documents from chunk
+        # files are in scope through their chunk_file, as their source is
+        # the Markdown file the chunks were made from.
+        # The trailing separator keeps sibling directories such as docs2/
+        # out of the scope of docs/
+        source_prefix = os.path.join(str(knowledge_path), "")
+        scope_expr = (
+            f'metadata["source"] like {self._like_prefix(source_prefix)} or '
+            f'metadata["chunk_file"] like {self._like_prefix(source_prefix)}'
+        )
+        for collection_name, (read_files, counter) in collections.items():
+            failed_sources = set()
+            
+            def documents() -> Iterator[Dict[str, Any]]:
+                for file_path, file_documents in read_files():
+                    sources = set()
+                    try:
+                        if isinstance(file_documents, Exception):
+                            raise file_documents
+                        # Files are streamed, so errors can also surface
+                        # part way through their documents
+                        for doc in file_documents:
+                            sources.add(doc["metadata"]["source"])
+                            yield doc
+                    except Exception as e:
+                        self.logger.error(f"Error processing {file_path}: {e}")
+                        failed_sources.add(str(file_path))
+                        stats["errors"] += 1
+                        continue
+                    stats["processed"] += 1
+                    stats[counter] += 1
+                    if file_path.name.endswith(CHUNK_FILE_SUFFIXES):
+                        stats["chunk_files"] += 1
+                        covered.update(Path(source).resolve() for source in sources)
+            
+            # Insert in batches of 100, the Milvus recommended batch size
+            sync_stats = self.sync_documents(
+                documents(),
+                collection_name,
+                scope_expr,
+                source_prefix=source_prefix,
+                dry_run=dry_run,
+                keep_sources=failed_sources
+            )
+            stats["inserted"] += sync_stats["upserted"]
+            stats["unchanged"] += sync_stats["unchanged"]
+            stats["deleted"] += sync_stats["deleted"]
+            for stage, stage_stats in sync_stats["stages"].items():
+                stats["stages"][stage]["docs"] += stage_stats["docs"]
+                stats["stages"][stage]["seconds"] += stage_stats["seconds"]
         
-        # Thread-safe data structures
-        stats_lock = threading.Lock()
-        documents_lock = threading.Lock()
-        all_documents = {"peripheral_docs": [], "renode_examples": []}
+        return stats
+    
+    @staticmethod
+    def _read_files(
+        paths: List[Path],
+        process_file: Callable[[Path], Iterable[Dict[str, Any]]],
+        max_workers: int = 4
+    ) -> Iterator[Tuple[Path, Any]]:
+        """
+        Process files on a thread pool, yielding results in file order.
         
-        def process_file(file_path):
-            nonlocal stats
+        At most 2 * max_workers files are in flight, so results are not
+        accumulated when the consumer is slower than the readers. A file
+        that fails yields its exception instead of its documents; documents
+        returned as a generator are produced as the consumer iterates them.
+        """
+        def run(path):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                file_documents = []
-                collection_name = "peripheral_docs"
-                file_stats = {"code_examples": 0, "docs": 0, "inserted": 0}
-                
-                if file_path.suffix.lower() == ".cs":
-                    # Process C# code examples as single documents
-                    metadata = {
-                        "source": str(file_path),
-                        "filename": file_path.name,
-                        "title": file_path.stem,
-                        "type": "code_example"
-                    }
-                    
-                    file_documents.append({
-                        "content": content,
-                        "metadata": metadata
-                    })
-                    collection_name = "renode_examples"
-                    file_stats["code_examples"] = 1
-                    
-                else:  # .md files
-                    # Extract metadata from file
-                    peripheral_name = self._extract_peripheral_name(file_path)
-                    section_type = self._extract_section_type(content)
-                    
-                    # Chunk the document
-                    chunks = self._chunk_document(content, chunk_size, chunk_overlap)
-                    
-                    for i, chunk in enumerate(chunks):
-                        metadata = {
-                            "source": str(file_path),
-                            "filename": file_path.name,
-                            "peripheral_name": peripheral_name,
-                            "section_type": section_type,
-                            "position": i,
-                            "total_chunks": len(chunks)
-                        }
-                        
-                        file_documents.append({
-                            "content": chunk,
-                            "metadata": metadata
-                        })
-                    file_stats["docs"] = 1
-                
-                # Add to global documents list
-                with documents_lock:
-                    if collection_name == "peripheral_docs":
-                        all_documents["peripheral_docs"].extend(file_documents)
-                    else:
-                        all_documents["renode_examples"].extend(file_documents)
-                
-                # Update statistics
-                file_stats["inserted"] = len(file_documents)
-                return file_stats
-                
+                return process_file(path)
             except Exception as e:
-                self.logger.error(f"Error processing {file_path}: {e}")
-                return {"errors": 1}
-        
-        # Process files in parallel
-        file_paths = [fp for fp in knowledge_path.rglob("*.*")
-                     if fp.suffix.lower() in [".md", ".cs"]]
-        
-        with ThreadPoolExecutor(max_workers=4) as executor:
-            future_to_path = {executor.submit(process_file, fp): fp for fp in file_paths}
-            for future in future_to_path:
-                file_stats = future.result()
-                with stats_lock:
-                    for key in ["code_examples", "docs", "inserted", "errors"]:
-                        if key in file_stats:
-                            stats[key] += file_stats[key]
-                    stats["processed"] += 1 if "errors" not in file_stats else 0
-        
-        # Bulk insert documents after parallel processing
-        for collection_name, docs in all_documents.items():
-            if docs:
-                # Insert in chunks to avoid large batches
-                chunk_size = 100  # Milvus recommended batch size
-                for i in range(0, len(docs), chunk_size):
-                    batch = docs[i:i+chunk_size]
-                    self.insert_documents(batch, collection_name=collection_name)
-        
-        return stats
+                return e
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = []
+            for path in paths:
+                pending.append((path, executor.submit(run, path)))
+                if len(pending) >= 2 * max_workers:
+                    path, future = pending.pop(0)
+                    yield path, future.result()
+            for path, future in pending:
+                yield path, future.result()
     
-    def _chunk_document(self, content: str, chunk_size: int, overlap: int) -> List[str]:
+    def insert_chunks(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        collection_name: str = "peripheral_docs",
+        batch_size: int = 100,
+        total_chunks: Optional[int] = None
+    ) -> int:
         """
-        Split document into overlapping chunks.
+        Insert structured chunks produced by chunk_processor.
+        
+        Chunks are consumed lazily and inserted batch by batch, so a
+        streamed chunk file is never held in memory as a whole. Chunks
+        already stored unchanged are skipped, and stored chunks the file no
+        longer produces are deleted.
         
         Args:
-            content: Document content
-            chunk_size: Size of each chunk
-            overlap: Overlap between chunks
+            chunks: Chunk dictionaries from a single source file, in document order
+            collection_name: Target collection name
+            batch_size: Number of chunks per insert call
+            total_chunks: Number of chunks in the file; defaults to len(chunks)
             
         Returns:
-            List of text chunks
+            Number of inserted or updated chunks
+        """
+        if total_chunks is None:
+            chunks = list(chunks)
+            total_chunks = len(chunks)
+        
+        chunks = iter(chunks)
+        first = next(chunks, None)
+        if first is None:
+            return 0
+        
+        # Re-ingesting a file replaces its previous chunks (see sync_documents)
+        stats = self.sync_documents(
+            self._chunk_documents(itertools.chain([first], chunks), total_chunks),
+            collection_name,
+            f'metadata["source"] == {self._quote(first["source_file"])}',
+            batch_size=batch_size
+        )
+        return stats["upserted"]
+    
+    def _chunk_documents(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        total_chunks: int,
+        chunk_file: Optional[str] = None,
+        batch_size: int = 256
+    ) -> Iterator[Dict[str, Any]]:
         """
-        chunks = []
-        start = 0
+        Convert chunk_processor chunks into documents for sync_documents.
         
-        while start < len(content):
-            end = start + chunk_size
-            chunk = content[start:end]
-            
-            # Try to break at sentence boundary
-            if end < len(content):
-                last_period = chunk.rfind('.')
-                if last_period > chunk_size * 0.8:  # If period is in last 20%
-                    chunk = chunk[:last_period + 1]
-                    end = start + last_period + 1
-            
-            chunks.append(chunk.strip())
-            start = end - overlap
+        The chunk structure is kept as metadata, so searches can filter on
+        chunk_type and tables stay whole: the chunker never splits a table,
+        and table_ids records which tables a chunk carries. Section types
+        are classified per chunk from its headings and content, batch_size
+        chunks at a time (see classify_sections).
         
-        return chunks
+        Args:
+            chunks: Chunk dictionaries from a single source file, in document order
+            total_chunks: Number of chunks in the file
+            chunk_file: Chunk file the chunks were read from, if any
+            batch_size: Number of chunks classified together
+            
+        Yields:
+            Documents with content and metadata
+        """
+        chunks = iter(chunks)
+        position = 0
+        while True:
+            batch = list(itertools.islice(chunks, batch_size))
+            if not batch:
+                return
+            section_types = classify_sections(
+                [chunk["heading_hierarchy"] for chunk in batch],
+                [chunk["content"] for chunk in batch]
+            )
+            for chunk, section_type in zip(batch, section_types):
+                source_path = Path(chunk["source_file"])
+                metadata = {
+                    "source": chunk["source_file"],
+                    "filename": source_path.name,
+                    "chunk_id": chunk["chunk_id"],
+                    "chapter_title": chunk["chapter_title"],
+                    "heading_hierarchy": chunk["heading_hierarchy"],
+                    "chunk_type": chunk["chunk_type"],
+                    "table_ids": chunk.get("table_ids", []),
+                    "part": chunk.get("part", 1),
+                    "of": chunk.get("of", 1),
+                    "peripheral_name": self._extract_peripheral_name(source_path),
+                    "section_type": section_type,
+                    "registers": chunk.get("registers", []),
+                    "position": position,
+                    "total_chunks": total_chunks
+                }
+                if chunk_file is not None:
+                    metadata["chunk_file"] = chunk_file
+                yield {
+                    "content": chunk["content"],
+                    "metadata": metadata
+                }
+                position += 1
     
     from functools import lru_cache
 
@@ -937,38 +2706,66 @@ class MilvusRAGHandler:
         
         return filename
     
-    def _extract_section_type(self, content: str) -> str:
+    def close(self) -> None:
         """
-        Extract section type from document content.
+        Close the embedding client and release the Milvus connection.
         
-        Args:
-            content: Document content
-            
-        Returns:
-            Detected section type
-        """
-        content_lower = content.lower()
-        
-        # Check for section indicators
-        if "memory map" in content_lower or "register map" in content_lower:
-            return SectionType.MEMORY_MAP.value
-        elif "register" in content_lower and "description" in content_lower:
-            return SectionType.REGISTERS.value
-        elif "functional description" in content_lower or "operation" in content_lower:
-            return SectionType.FUNCTIONAL_DESCRIPTION.value
-        elif "interrupt" in content_lower:
-            return SectionType.INTERRUPTS.value
-        elif "timing" in content_lower or "clock" in content_lower:
-            return SectionType.TIMING.value
-        elif "example" in content_lower or "code" in content_lower:
-            return SectionType.EXAMPLES.value
-        else:
-            return SectionType.OTHER.value
+        Retrievals already started through the async API are finished
+        first. The connection itself stays open while other handlers use
+        it. Handlers from get_handler are shared and are closed with
+        close_handlers instead.
+        """
+        with self._lock:
+            executor, self._async_executor = self._async_executor, None
+        # Outside the lock: pending retrievals may still need it
+        if executor is not None:
+            executor.shutdown(wait=True)
+        with self._lock:
+            if self.ollama_client is not None:
+                self.ollama_client.close()
+                self.ollama_client = None
+            if self.connected:
+                self.connected = False
+                self._disconnect()
+
+
+# Process-wide handlers by configuration file, see get_handler
+_handlers: Dict[str, MilvusRAGHandler] = {}
+_handlers_lock = threading.Lock()
+
+
+def get_handler(config_path: Optional[str] = None) -> MilvusRAGHandler:
+    """
+    Get the shared handler for a configuration file, creating it on first use.
     
-    def close(self) -> None:
-        """Close Milvus connection."""
-        try:
-            connections.disconnect("default")
-            self.logger.info("Disconnected from Milvus")
-        except Exception as e:
-            self.logger.error(f"Error closing Milvus connection: {e}")
\ No newline at end of file
+    The CLI, the generation pipeline and batch ingestion share one
+    connected handler per configuration, so the configuration is read and
+    the collections are loaded once per process rather than once per user.
+    A handler that was closed is reconnected.
+    
+    Args:
+        config_path: Path to configuration file. If None, uses default config.yaml
+        
+    Returns:
+        Connected handler
+        
+    Raises:
+        MilvusConnectionError: If connection to Milvus fails
+    """
+    key = os.path.abspath(config_path or "config.yaml")
+    with _handlers_lock:
+        handler = _handlers.get(key)
+        if handler is None:
+            handler = MilvusRAGHandler(config_path)
+            _handlers[key] = handler
+    handler.connect()
+    return handler
+
+
+def close_handlers() -> None:
+    """Close every handler created by get_handler."""
+    with _handlers_lock:
+        handlers = list(_handlers.values())
+        _handlers.clear()
+    for handler in handlers:
+        handler.close()
\ No newline at end of file
@@ -1,7 +1,12 @@
 import unittest
 import os
 import json
-from chunk_processor import process_markdown_file
+from chunk_processor import (
+    process_markdown_file, isolate_tables, restore_tables, validate_chunks,
+    split_section, count_tokens, iter_markdown_chunks, write_chunks_jsonl,
+    iter_chunk_file, build_chunks, classify_chunk, parse_registers,
+    registers_complete, iter_text_chunks, iter_text_spans
+)
 
 class TestChunkProcessor(unittest.TestCase):
     def setUp(self):
@@ -28,8 +33,9 @@ More content here.
 """)
 
     def tearDown(self):
-        if os.path.exists(self.test_file):
-            os.remove(self.test_file)
+        for path in (self.test_file, "test_chapter_chunks.jsonl"):
+            if os.path.exists(path):
+                os.remove(path)
 
     def test_chunk_processing(self):
         chunks = process_markdown_file(self.test_file)
@@ -57,5 +63,163 @@ More content here.
         self.assertEqual(chunks[1]["chunk_id"], "section-1")
         self.assertEqual(chunks[4]["chunk_id"], "section-2_subsection-2-1")
 
+    def test_isolate_tables_placeholders(self):
+        table_a = "| A |\n|---|\n| 1 |\n| 2 |\n"
+        table_b = "| C |\n|---|\n| 3 |\n"
+        content = f"Intro\n{table_a}\nMiddle\n{table_b}\nEnd"
+
+        protected, tables = isolate_tables(content)
+
+        self.assertEqual(tables, [table_a, table_b])
+        self.assertEqual(protected, "Intro\n{TABLE_0}\nMiddle\n{TABLE_1}\nEnd")
+
+    def test_restore_tables_records_ids(self):
+        tables = ["| A |\n|---|\n| 1 |\n", "| B |\n|---|\n| 2 |\n"]
+
+        content, table_ids = restore_tables("x {TABLE_1} y {TABLE_7}", tables)
+
+        self.assertEqual(content, f"x {tables[1]} y {{TABLE_7}}")
+        self.assertEqual(table_ids, [1])
+
+    def test_validate_chunks_detects_missing_table(self):
+        chunks = process_markdown_file(self.test_file)
+        for chunk in chunks:
+            chunk["table_ids"] = []
+
+        with self.assertRaises(ValueError):
+            validate_chunks(chunks, ["| Header 1 | Header 2 |\n"])
+
+    def test_split_section_keeps_tables_atomic(self):
+        table = "| A |\n|---|\n" + "".join(f"| row {i} |\n" for i in range(40))
+        paragraph = " ".join(["word"] * 60)
+        content = f"{paragraph}\n\n{{TABLE_0}}\n\n{paragraph}\n\n{paragraph}"
+
+        parts = split_section(content, [table], max_tokens=100)
+
+        self.assertGreater(len(parts), 1)
+        self.assertEqual(sum(part.count("{TABLE_0}") for part in parts), 1)
+        for part in parts:
+            if "{TABLE_0}" not in part:
+                self.assertLessEqual(count_tokens(part), 100)
+
+    def test_text_chunks_always_make_progress(self):
+        # No sentence boundary anywhere and an overlap above the budget:
+        # the previous splitter never advanced on input like this
+        content = " ".join(f"word{i}" for i in range(500))
+
+        chunks = iter_text_chunks(content, max_tokens=40, overlap_tokens=100)
+        self.assertFalse(isinstance(chunks, list))
+        chunks = list(chunks)
+
+        self.assertLess(len(chunks), 100)
+        self.assertEqual(len(set(chunks)), len(chunks))
+        self.assertTrue(chunks[-1].endswith("word499"))
+        for chunk in chunks:
+            self.assertLessEqual(count_tokens(chunk), 40)
+
+    def test_text_chunks_break_at_sentences_with_overlap(self):
+        sentences = [f"Sentence {i} describes the register." for i in range(30)]
+        content = " ".join(sentences[:15]) + "\n\n" + " ".join(sentences[15:])
+
+        chunks = list(iter_text_chunks(content, max_tokens=30, overlap_tokens=10))
+        spans = list(iter_text_spans(content, max_tokens=30, overlap_tokens=10))
+
+        self.assertEqual([content[start:end].strip() for start, end in spans], chunks)
+        for chunk in chunks:
+            self.assertTrue(chunk.startswith("Sentence") and chunk.endswith("register."))
+        for previous, chunk in zip(chunks, chunks[1:]):
+            self.assertTrue(previous.endswith(chunk.split("register.")[0] + "register."))
+        for sentence in sentences:
+            self.assertTrue(any(sentence in chunk for chunk in chunks))
+
+    def test_sub_chunks_carry_hierarchy_and_part(self):
+        with open(self.test_file, 'a') as f:
+            f.write("\n\n".join([" ".join(["filler"] * 80)] * 4))
+
+        chunks = process_markdown_file(self.test_file, max_tokens=120)
+        parts = [c for c in chunks if "part" in c]
+
+        self.assertGreater(len(parts), 1)
+        self.assertEqual([c["part"] for c in parts], list(range(1, len(parts) + 1)))
+        self.assertTrue(all(c["of"] == len(parts) for c in parts))
+        self.assertEqual(
+            [c["chunk_id"] for c in parts],
+            [f"test-chapter-section-2-subsection-2-1-p{i}" for i in range(1, len(parts) + 1)]
+        )
+        self.assertEqual(parts[0]["heading_hierarchy"][-1], "Subsection 2.1")
+        self.assertTrue(all(
+            c["heading_hierarchy"] == parts[0]["heading_hierarchy"] for c in parts
+        ))
+
+    def test_jsonl_round_trip(self):
+        output_file = "test_chapter_chunks.jsonl"
+
+        count = write_chunks_jsonl(iter_markdown_chunks(self.test_file), output_file)
+
+        self.assertEqual(count, len(process_markdown_file(self.test_file)))
+        self.assertEqual(list(iter_chunk_file(output_file)), process_markdown_file(self.test_file))
+
+    def test_scanned_chunk_types_match_content_classification(self):
+        content = "\n".join([
+            "# Intro", "Plain text.",
+            "# Items", "Some text", "  1. numbered item",
+            "# Registers", "- see below", "Figure 12-3. CTRL Register layout",
+            "# Rows", "| not | a table |",
+        ])
+        chunks = build_chunks(content, "doc.md", "doc", [])
+
+        self.assertEqual(
+            [c["chunk_type"] for c in chunks],
+            ["text", "list", "register_diagram", "text"]
+        )
+        for chunk in chunks:
+            self.assertEqual(chunk["chunk_type"], classify_chunk(chunk["content"]))
+
+    def test_parse_registers_merges_summary_and_diagram(self):
+        content = "\n".join([
+            "Table 10-2. INTC Memory Map",
+            "",
+            "| Address            | Register Name   | Register Description | Size (bits)   |",
+            "|--------------------|-----------------|----------------------|---------------|",
+            "| Base (0xFFF4_8000) | INTC_MCR        | Configuration        | 32            |",
+            "| Base + 0x4         | -               | Reserved             | -             |",
+            "| Base + 0x8         | INTC_CPR        | Current priority     | 8             |",
+            "",
+            "Figure 10-9. INTC Current Priority Register (INTC\\_CPR)",
+            "",
+            "|          | 0          | 1          | 2          | 3          |",
+            "|----------|------------|------------|------------|------------|",
+            "| Reset    | 0          | 0          | 0          | 0          |",
+            "|          | 4          | 5          | 6          | 7          |",
+            "| Reset    | 0          | 0          | 1          | 1          |",
+            "| Reg Addr | Base + 0x8 | Base + 0x8 | Base + 0x8 | Base + 0x8 |",
+        ])
+
+        registers = parse_registers(content)
+
+        self.assertEqual(registers, [
+            {"name": "INTC_MCR", "offset": "0x00", "width": 32, "reset_value": None},
+            {"name": "INTC_CPR", "offset": "0x08", "width": 8, "reset_value": "0x03"},
+        ])
+        self.assertFalse(registers_complete(registers))
+        self.assertTrue(registers_complete(registers[1:]))
+
+    def test_parse_registers_caches_register_tables_by_id(self):
+        tables = [
+            "| Field | Description |\n|-------|-------------|\n| EN    | Enable      |\n",
+            "| Offset | Register |\n|--------|----------|\n| 0x0    | CTRL     |\n| 0x4    | STAT     |\n",
+        ]
+        protected_content = "{TABLE_0}\n\n{TABLE_1}"
+        cache = {}
+
+        first = parse_registers(protected_content, tables, cache)
+        second = parse_registers(protected_content, tables, cache)
+
+        self.assertEqual(first, parse_registers(restore_tables(protected_content, tables)[0]))
+        self.assertEqual(second, first)
+        self.assertEqual([register["name"] for register in first], ["CTRL", "STAT"])
+        # The field table has no register columns and is never parsed
+        self.assertEqual(list(cache), [(1, None)])
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
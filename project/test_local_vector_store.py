@@ -0,0 +1,162 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pytest
+
+from chunk_processor import write_chunks_jsonl
+from local_vector_store import LocalCollection, compile_filter
+
+
+class TestCompileFilter(unittest.TestCase):
+    def test_handler_expressions(self):
+        row = {"id": 7, "metadata": {"source": "docs/edma.md", "peripheral_name": "edma", "position": 3}}
+
+        self.assertTrue(compile_filter('metadata["peripheral_name"] == "edma"')(row))
+        self.assertTrue(compile_filter('metadata["source"] like "docs/%"')(row))
+        self.assertFalse(compile_filter('metadata["source"] like "doc"')(row))
+        self.assertFalse(compile_filter('metadata["source"] like "docs\\\\_edma%"')(row))
+        self.assertTrue(compile_filter('id in [1, 7]')(row))
+        self.assertTrue(compile_filter(
+            'metadata["position"] >= 0 and metadata["position"] < 8 '
+            'and not (metadata["source"] in ["docs/dspi.md"])'
+        )(row))
+        self.assertFalse(compile_filter('metadata["missing"] != "x"')(row))
+        self.assertTrue(compile_filter('metadata["source"] == "a\\"b" or id == 7')(row))
+        with self.assertRaises(ValueError):
+            compile_filter('metadata["source"] ~ "x"')
+
+
+class TestLocalCollection(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.rng = np.random.default_rng(0)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def entities(self, count, offset=0):
+        return [
+            {"id": offset + i, "content": f"chunk {offset + i}",
+             "embedding": self.rng.random(8).tolist(),
+             "metadata": {"peripheral_name": "edma" if i % 2 else "dspi", "position": i},
+             "timestamp": 0}
+            for i in range(count)
+        ]
+
+    def test_search_matches_brute_force_and_filters(self):
+        collection = LocalCollection("docs", self.directory, 8)
+        entities = self.entities(200)
+        collection.upsert(entities)
+        query = self.rng.random(8)
+
+        hits = collection.search([query.tolist()], limit=5, expr='metadata["peripheral_name"] == "edma"',
+                                 output_fields=["content", "metadata"])[0]
+
+        expected = sorted(
+            (float(np.sum((np.float32(e["embedding"]) - np.float32(query)) ** 2)), e["id"])
+            for e in entities if e["metadata"]["peripheral_name"] == "edma"
+        )[:5]
+        self.assertEqual([hit.id for hit in hits], [doc_id for _, doc_id in expected])
+        for hit, (distance, _) in zip(hits, expected):
+            self.assertAlmostEqual(hit.distance, distance, places=4)
+        self.assertEqual(hits[0].entity.get("content"), f"chunk {hits[0].id}")
+
+    def test_upsert_delete_and_reload(self):
+        collection = LocalCollection("docs", self.directory, 8)
+        collection.upsert(self.entities(10))
+        collection.upsert([dict(self.entities(1)[0], content="replaced")])
+        collection.delete("id in [3, 9]")
+        collection.flush()
+
+        reloaded = LocalCollection("docs", self.directory, 8)
+        self.assertEqual(reloaded.num_entities, 8)
+        self.assertEqual(reloaded.query("id == 0", output_fields=["content"]), [{"id": 0, "content": "replaced"}])
+        self.assertEqual(sorted(r["id"] for r in reloaded.query("id >= 0")), [0, 1, 2, 4, 5, 6, 7, 8])
+        hit = reloaded.search([collection._vectors[collection._slots[8]].tolist()], limit=1)[0][0]
+        self.assertEqual((hit.id, round(hit.distance, 6)), (8, 0.0))
+
+        reloaded.upsert(self.entities(100, offset=100))
+        self.assertEqual(reloaded.num_entities, 108)
+
+
+class TestLocalBackend(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, handler_factory):
+        self.make_handler = handler_factory
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.knowledge_dir = os.path.join(self.directory, "knowledge")
+        os.mkdir(self.knowledge_dir)
+        for name, text in (("edma.md", "# Registers\nEDMA_CR controls the engine."),
+                           ("dspi.md", "# Registers\nDSPI_MCR configures the module.")):
+            with open(os.path.join(self.knowledge_dir, name), 'w') as f:
+                f.write(text)
+        self.handler = self.make_handler({'milvus': {'backend': 'local',
+                                                     'local_store_dir': os.path.join(self.directory, 'store')}})
+        self.handler._embed = lambda texts: [[float(len(t)), float("EDMA" in t), 0.0, 1.0] for t in texts]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_update_and_search_without_server(self):
+        stats = self.handler.update_knowledge_base(self.knowledge_dir)
+        self.assertEqual(stats["inserted"], 2)
+
+        results = self.handler.search_documents("EDMA_CR controls the engine.", top_k=1)
+        self.assertEqual(results[0]["metadata"]["filename"], "edma.md")
+        chunks = self.handler.retrieve_all_chunks([results[0]["id"]], "edma")
+        self.assertEqual([c["metadata"]["source"] for c in chunks], [os.path.join(self.knowledge_dir, "edma.md")])
+
+        self.assertEqual(self.handler.update_knowledge_base(self.knowledge_dir)["unchanged"], 2)
+
+    def test_update_keeps_sibling_directory(self):
+        sibling = self.knowledge_dir + "2"
+        os.mkdir(sibling)
+        with open(os.path.join(sibling, "esci.md"), 'w') as f:
+            f.write("# Registers\nESCI_CR1 sets the baud rate.")
+
+        self.handler.update_knowledge_base(sibling)
+        stats = self.handler.update_knowledge_base(self.knowledge_dir)
+
+        self.assertEqual(stats["deleted"], 0)
+        self.assertEqual(self.handler.update_knowledge_base(sibling)["unchanged"], 1)
+
+    def test_chunk_files_replace_markdown_chunking(self):
+        source = os.path.join(self.knowledge_dir, "edma.md")
+        chunk_file = os.path.join(self.knowledge_dir, "edma_chunks.jsonl")
+        chunks = [
+            {"chunk_id": "registers", "source_file": source, "chapter_title": "edma",
+             "heading_hierarchy": ["Registers"], "chunk_type": "text", "content": "EDMA_CR controls the engine."},
+            {"chunk_id": "registers-map", "source_file": source, "chapter_title": "edma",
+             "heading_hierarchy": ["Registers", "Map"], "chunk_type": "table", "table_ids": [0],
+             "content": "| Offset | Register |\n|---|---|\n| 0x0000 | EDMA_CR |"}
+        ]
+        write_chunks_jsonl(chunks, chunk_file)
+        # Other JSON files are not chunk files and are left alone
+        with open(os.path.join(self.knowledge_dir, "edma_registers.json"), 'w') as f:
+            json.dump({"EDMA_CR": "0x0000"}, f)
+
+        stats = self.handler.update_knowledge_base(self.knowledge_dir)
+        self.assertEqual((stats["chunk_files"], stats["skipped"], stats["inserted"]), (1, 1, 3))
+        self.assertEqual(stats["errors"], 0)
+
+        results = self.handler.perform_similarity_search("EDMA_CR", chunk_types=["table"])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["metadata"]["heading_hierarchy"], ["Registers", "Map"])
+        self.assertEqual(results[0]["metadata"]["table_ids"], [0])
+        self.assertEqual(results[0]["metadata"]["chunk_file"], chunk_file)
+
+        # Without the chunk file, the Markdown file is chunked again and
+        # the chunk file's documents are deleted
+        os.remove(chunk_file)
+        stats = self.handler.update_knowledge_base(self.knowledge_dir)
+        self.assertEqual((stats["inserted"], stats["deleted"], stats["unchanged"]), (1, 2, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,12 +1,22 @@
+import asyncio
 import os
+import re
+import time
 # Disable SSL verification for tests
 os.environ['CURL_CA_BUNDLE'] = ''
 os.environ['REQUESTS_CA_BUNDLE'] = ''
-from milvus_rag_handler import MilvusRAGHandler
+from milvus_rag_handler import (
+    MilvusRAGHandler, OllamaEmbeddingClient, EmbeddingError, EmbeddingCache, DocumentRetrievalError,
+    BM25Index, classify_sections, get_handler, close_handlers
+)
 import logging
 import unittest
+from unittest.mock import MagicMock, patch
 import tempfile
 import shutil
+import threading
+
+import pytest
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -82,5 +92,542 @@ class TestMilvusRAGHandler(unittest.TestCase):
         self.assertEqual(example_results[0]['metadata']['type'], "code_example")
         self.assertEqual(example_results[0]['metadata']['title'], "test_example")
 
+class TestOllamaEmbeddingClient(unittest.TestCase):
+    def _response(self, status, body):
+        response = MagicMock(status_code=status)
+        response.json.return_value = body
+        if status >= 400:
+            response.raise_for_status.side_effect = Exception(f"HTTP {status}")
+        return response
+
+    def test_falls_back_to_single_requests_and_retries(self):
+        client = OllamaEmbeddingClient("http://ollama", "model", concurrency=1, retry_backoff=0)
+        client.session = MagicMock()
+        client.session.post.side_effect = [
+            self._response(404, {}),                       # no /api/embed
+            self._response(500, {}),                       # first text fails once
+            self._response(200, {"embedding": [1.0]}),
+            self._response(200, {"embedding": [2.0]}),
+        ]
+
+        self.assertEqual(client.embed(["a", "b"]), [[1.0], [2.0]])
+        self.assertFalse(client.batch_supported)
+
+    def test_raises_after_retries(self):
+        client = OllamaEmbeddingClient("http://ollama", "model", max_retries=1, retry_backoff=0)
+        client.session = MagicMock()
+        client.session.post.return_value = self._response(500, {})
+
+        with self.assertRaises(EmbeddingError):
+            client.embed(["a"])
+        self.assertEqual(client.session.post.call_count, 2)
+
+    def test_batches_preserve_order(self):
+        client = OllamaEmbeddingClient("http://ollama", "model", batch_size=2, concurrency=2)
+        client.session = MagicMock()
+        client.session.post.side_effect = lambda url, json, timeout: self._response(
+            200, {"embeddings": [[float(text)] for text in json["input"]]}
+        )
+
+        texts = [str(i) for i in range(7)]
+        self.assertEqual(client.embed(texts), [[float(t)] for t in texts])
+        self.assertTrue(client.batch_supported)
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir)
+
+    def test_round_trip_is_keyed_by_model(self):
+        cache = EmbeddingCache(self.cache_dir, max_bytes=1024)
+        cache.put_many("model-a", ["text"], [[0.5, 0.25]])
+
+        self.assertEqual(cache.get_many("model-a", ["text", "other"]), [[0.5, 0.25], None])
+        self.assertEqual(cache.get_many("model-b", ["text"]), [None])
+
+    def test_evicts_least_recently_used(self):
+        # Room for two 4-float vectors (16 bytes each)
+        cache = EmbeddingCache(self.cache_dir, max_bytes=32)
+        cache.put_many("m", ["a", "b"], [[1.0] * 4, [2.0] * 4])
+        cache.get_many("m", ["a"])
+        cache.put_many("m", ["c"], [[3.0] * 4])
+
+        self.assertEqual(cache.get_many("m", ["a", "b", "c"]), [[1.0] * 4, None, [3.0] * 4])
+        reopened = EmbeddingCache(self.cache_dir, max_bytes=32)
+        self.assertEqual(reopened.get_many("m", ["a", "c"]), [[1.0] * 4, [3.0] * 4])
+
+class FakeCollection:
+    """In-memory stand-in for a Milvus collection with explicit IDs."""
+
+    def __init__(self):
+        self.rows = {}
+        self.flushes = 0
+        self.schema = MagicMock(auto_id=False)
+
+    def upsert(self, entities):
+        for entity in entities:
+            self.rows[entity["id"]] = entity
+        return MagicMock(primary_keys=[entity["id"] for entity in entities])
+
+    def delete(self, expr):
+        for doc_id in eval(expr[len("id in "):]):
+            self.rows.pop(doc_id, None)
+
+    def flush(self):
+        self.flushes += 1
+
+    def query(self, expr, output_fields, limit=None):
+        return [self.rows[doc_id] for doc_id in eval(expr[len("id in "):]) if doc_id in self.rows]
+
+    def query_iterator(self, batch_size, expr, output_fields):
+        iterator = MagicMock()
+        iterator.next.side_effect = [
+            [{"id": i, "metadata": row["metadata"]} for i, row in self.rows.items()], []
+        ]
+        return iterator
+
+
+class TestIdempotentUpdate(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, handler_factory):
+        self.make_handler = handler_factory
+
+    def setUp(self):
+        self.handler = self.make_handler(collection=FakeCollection)
+        self.handler._embed = lambda texts: [[0.0] * 4 for _ in texts]
+        self.knowledge_dir = tempfile.mkdtemp()
+        for name in ("a.md", "b.md"):
+            with open(os.path.join(self.knowledge_dir, name), 'w') as f:
+                f.write(f"# {name}\nSome documentation for {name}.")
+
+    def tearDown(self):
+        shutil.rmtree(self.knowledge_dir)
+
+    def test_repeated_update_keeps_collection_stable(self):
+        first = self.handler.update_knowledge_base(self.knowledge_dir)
+        size = len(self.handler.doc_collection.rows)
+        second = self.handler.update_knowledge_base(self.knowledge_dir)
+
+        self.assertEqual(first["inserted"], size)
+        self.assertEqual(second["inserted"], 0)
+        self.assertEqual(second["unchanged"], size)
+        self.assertEqual(len(self.handler.doc_collection.rows), size)
+
+    def test_changed_and_deleted_files_replace_their_chunks(self):
+        self.handler.update_knowledge_base(self.knowledge_dir)
+        with open(os.path.join(self.knowledge_dir, "a.md"), 'w') as f:
+            f.write("# a.md\nRewritten documentation.")
+        os.remove(os.path.join(self.knowledge_dir, "b.md"))
+
+        preview = self.handler.update_knowledge_base(self.knowledge_dir, dry_run=True)
+        self.assertEqual((preview["inserted"], preview["deleted"]), (1, 2))
+        self.assertEqual(len(self.handler.doc_collection.rows), 2)
+
+        self.handler.update_knowledge_base(self.knowledge_dir)
+        contents = [row["content"] for row in self.handler.doc_collection.rows.values()]
+        self.assertEqual(contents, ["# a.md\nRewritten documentation."])
+
+    def test_file_failing_mid_stream_keeps_its_chunks(self):
+        self.handler.update_knowledge_base(self.knowledge_dir)
+        rows = dict(self.handler.doc_collection.rows)
+
+        # Splitting succeeds; the stream fails while the sync consumes it
+        with patch('milvus_rag_handler.classify_sections', side_effect=ValueError("classifier failed")):
+            stats = self.handler.update_knowledge_base(self.knowledge_dir)
+
+        self.assertEqual((stats["errors"], stats["processed"], stats["deleted"]), (2, 0, 0))
+        self.assertEqual(self.handler.doc_collection.rows, rows)
+
+    def test_pipelined_sync_flushes_once(self):
+        documents = (
+            {"content": f"chunk {i}", "metadata": {"source": "big.md", "position": i}}
+            for i in range(250)
+        )
+        stats = self.handler.sync_documents(
+            documents, "peripheral_docs", 'metadata["source"] == "big.md"', batch_size=10, queue_size=2
+        )
+
+        self.assertEqual(stats["upserted"], 250)
+        self.assertEqual(stats["stages"]["embed"]["docs"], 250)
+        self.assertEqual(len(self.handler.doc_collection.rows), 250)
+        self.assertEqual(self.handler.doc_collection.flushes, 1)
+
+    def test_pipeline_error_is_raised(self):
+        def failing_embed(texts):
+            raise EmbeddingError("embedding service unavailable")
+        self.handler._embed = failing_embed
+        documents = (
+            {"content": f"chunk {i}", "metadata": {"source": "big.md", "position": i}}
+            for i in range(250)
+        )
+
+        with self.assertRaises(EmbeddingError):
+            self.handler.sync_documents(
+                documents, "peripheral_docs", 'metadata["source"] == "big.md"', batch_size=10, queue_size=2
+            )
+        self.assertEqual(self.handler.doc_collection.flushes, 0)
+
+
+
+class TestQueryEmbeddingCache(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, handler_factory):
+        self.make_handler = handler_factory
+
+    def setUp(self):
+        self.handler = self.make_handler({'cache': {'query_embedding_cache': {'max_entries': 2}}}, collection=MagicMock)
+        self.embedded = []
+
+        def embed(texts):
+            self.embedded.extend(texts)
+            return [[float(len(text))] * 4 for text in texts]
+        self.handler._embed = embed
+
+    def test_filtered_and_fallback_searches_embed_query_once(self):
+        self.handler.doc_collection.num_entities = 1
+        self.handler.doc_collection.search.return_value = [[]]
+
+        with self.assertRaises(DocumentRetrievalError):
+            self.handler.get_smart_context("UART registers", "UART")
+
+        self.assertEqual(self.handler.doc_collection.search.call_count, 2)
+        self.assertEqual(self.embedded, ["UART registers"])
+
+    def test_warm_up_and_eviction(self):
+        self.assertEqual(self.handler.warm_query_cache(["a", "bb", "a"]), 2)
+        self.handler._embed_query("a")
+        self.handler._embed_query("ccc")
+
+        self.assertEqual(self.embedded, ["a", "bb", "ccc"])
+        self.assertEqual(list(self.handler.query_embeddings), ["a", "ccc"])
+
+
+
+class TestChunkRetrieval(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, handler_factory):
+        self.make_handler = handler_factory
+
+    def setUp(self):
+        self.handler = self.make_handler(collection=MagicMock)
+        # 100 chunks of 100 tokens, stored out of order
+        self.rows = [
+            {"id": i, "content": "x" * 400, "metadata": {
+                "source": "docs/edma.md", "peripheral_name": "edma", "section_type": "registers",
+                "position": i, "total_chunks": 100
+            }}
+            for i in reversed(range(100))
+        ]
+        self.pages = []
+
+        def query(expr, output_fields, limit=None):
+            if expr.startswith("id in"):
+                return [row for row in self.rows if row["id"] in eval(expr[len("id in "):])]
+            low, high = map(int, re.findall(r'metadata\["position"\] [<>]=? (\d+)', expr))
+            self.pages.append(low)
+            return [row for row in self.rows if low <= row["metadata"]["position"] < high]
+        self.handler.doc_collection.query.side_effect = query
+
+    def test_retrieval_is_paginated_in_position_order(self):
+        chunks = self.handler.retrieve_all_chunks([5], "edma")
+
+        self.assertEqual([c["metadata"]["position"] for c in chunks], list(range(100)))
+        self.assertEqual(len(self.pages), 13)
+
+    @patch('milvus_rag_handler.count_tokens', side_effect=lambda text: len(text) // 4)
+    def test_assembly_stops_fetching_at_token_budget(self, mock_count_tokens):
+        context, sections = self.handler.assemble_comprehensive_context(
+            self.handler.iter_chunks([5], "edma"), max_tokens=1000
+        )
+
+        # 1.5x the budget is read; 9 chunks of 100 tokens plus separators fit
+        self.assertEqual(len(sections["registers"]), 9)
+        self.assertEqual(self.pages, [0, 8])
+
+    @patch('milvus_rag_handler.count_tokens', side_effect=lambda text: len(text) // 4)
+    def test_packing_fills_budget_by_priority_and_relevance(self, mock_count_tokens):
+        def chunk(chunk_id, section_type, tokens, position):
+            return {"id": chunk_id, "content": "x" * (4 * tokens),
+                    "metadata": {"section_type": section_type, "position": position}}
+        chunks = [
+            chunk(1, "other", 50, 0),
+            chunk(2, "registers", 300, 1),
+            chunk(3, "registers", 500, 2),
+            chunk(4, "registers", 40, 3),
+            chunk(5, "memory_map", 200, 4),
+        ]
+
+        context, sections, breakdown = self.handler.pack_context(chunks, max_tokens=820, relevance={3: 1.0})
+
+        # The relevant chunk 3 goes first; chunk 2 does not fit but chunk 4 does
+        self.assertEqual(list(sections), ["memory_map", "registers", "other"])
+        self.assertEqual([c["id"] for c in sections["registers"]], [3, 4])
+        self.assertEqual(breakdown, {"memory_map": 206, "registers": 546, "other": 54})
+        self.assertTrue(context.index("=== MEMORY_MAP ===") < context.index("=== REGISTERS ==="))
+
+    @patch('milvus_rag_handler.count_tokens', side_effect=lambda text: len(text) // 4)
+    def test_late_register_chunks_are_packed_ahead_of_prose(self, mock_count_tokens):
+        # Prose fills the first 46 positions, registers come after
+        for row in self.rows:
+            if row["metadata"]["position"] < 46:
+                row["metadata"]["section_type"] = "other"
+        iterator = MagicMock()
+        iterator.next.side_effect = [[{"id": row["id"], "metadata": row["metadata"]} for row in self.rows], []]
+        self.handler.doc_collection.query_iterator.return_value = iterator
+
+        relevance = {60: 1.0}
+        chunks = self.handler.iter_ranked_chunks([5], "edma", relevance)
+        context, sections, breakdown = self.handler.pack_context(chunks, max_tokens=1000, relevance=relevance)
+        chunks.close()
+
+        # One prose chunk represents its section, registers take the rest
+        self.assertEqual([c["id"] for c in sections["other"]], [0])
+        self.assertEqual([c["id"] for c in sections["registers"]], [46, 47, 48, 49, 50, 51, 52, 60])
+        self.assertGreater(breakdown["registers"], 7 * breakdown["other"])
+
+
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "index.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_register_names_rank_first_and_persist(self):
+        index = BM25Index(self.path)
+        index.add(1, "The EDMA_CR register controls the eDMA engine.", {"peripheral_name": "edma"})
+        index.add(2, "The DSPI_MCR register configures the DSPI module.", {"peripheral_name": "dspi"})
+        index.add(3, "Register access and module configuration overview.", {"peripheral_name": "dspi"})
+        index.save()
+
+        reloaded = BM25Index(self.path)
+        self.assertEqual(reloaded.search("DSPI_MCR")[0][0], 2)
+        self.assertEqual([doc_id for doc_id, _ in reloaded.search("register", filters={"peripheral_name": "edma"})], [1])
+
+        reloaded.remove([2])
+        self.assertEqual(len(reloaded), 2)
+        self.assertNotIn(2, [doc_id for doc_id, _ in reloaded.search("DSPI_MCR")])
+
+
+class TestHybridSearch(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, handler_factory):
+        self.make_handler = handler_factory
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.handler = self.make_handler(
+            {'knowledge_base': {'lexical_index': {'enabled': True, 'directory': self.directory}}},
+            collection=FakeCollection
+        )
+        self.handler._embed = lambda texts: [[0.0] * 4 for _ in texts]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lexical_hits_are_fused_with_vector_results(self):
+        documents = [
+            {"content": text, "metadata": {"source": "edma.md", "position": i}}
+            for i, text in enumerate(["eDMA overview", "Channel arbitration", "EDMA_CR fields"])
+        ]
+        self.handler.sync_documents(documents, "peripheral_docs", 'metadata["source"] == "edma.md"')
+        vector_hit = next(row for row in self.handler.doc_collection.rows.values() if row["content"] == "eDMA overview")
+        hit = MagicMock(id=vector_hit["id"], distance=0.5)
+        hit.entity.get.side_effect = vector_hit.get
+        self.handler.doc_collection.search = MagicMock(return_value=[[hit]])
+        self.handler.doc_collection.name = "peripheral_docs"
+
+        results = self.handler.search_documents("EDMA_CR", top_k=2)
+
+        self.assertEqual([r["content"] for r in results], ["eDMA overview", "EDMA_CR fields"])
+        self.assertIsNone(results[1]["score"])
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "peripheral_docs.json")))
+
+        # Stale documents leave the index with the collection
+        self.handler.sync_documents(documents[:1], "peripheral_docs", 'metadata["source"] == "edma.md"')
+        self.assertEqual(len(self.handler._lexical_index("peripheral_docs")), 1)
+
+
+
+class TestSectionClassification(unittest.TestCase):
+    def test_headings_decide_before_content(self):
+        headings = [
+            ["eDMA", "Memory Map and Register Descriptions", "Register Map"],
+            ["eDMA", "Memory Map and Register Descriptions", "eDMA Interrupt Request Register (EDMA_IRQRH)"],
+            ["eDMA", "Functional Description"],
+            ["eDMA", "Introduction"],
+            ["eDMA", "Introduction"],
+            []
+        ]
+        contents = [
+            "| Offset | Register |",
+            "Each bit signals an interrupt request.",
+            "The register map lists all registers.",
+            "The interrupt and the clock interrupt are described in the timing section.",
+            "The register holds the channel number.",
+            "SRAM clocks and memory maps: see timing."
+        ]
+
+        self.assertEqual(classify_sections(headings, contents), [
+            "memory_map", "registers", "functional_description", "interrupts", "other", "timing"
+        ])
+
+    def test_one_chunk_at_a_time_matches_batch(self):
+        headings = [["Timing"], [], ["Examples"]]
+        contents = ["Operation", "Interrupt vectors", "Reset values"]
+
+        batch = classify_sections(headings, contents)
+
+        self.assertEqual(batch, [classify_sections([h], [c])[0] for h, c in zip(headings, contents)])
+
+
+class TestIndexManagement(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, handler_factory):
+        self.make_handler = handler_factory
+
+    def test_index_and_search_params_from_config(self):
+        handler = self.make_handler({'milvus': {
+            'index_params': {'index_type': 'IVF_FLAT', 'metric_type': 'L2', 'nlist': 128},
+            'search_params': {'nprobe': 16, 'ef': 64}
+        }}, collection=MagicMock)
+
+        self.assertEqual(handler.index_params(),
+                         {'index_type': 'IVF_FLAT', 'metric_type': 'L2', 'params': {'nlist': 128}})
+        self.assertEqual(handler.search_params(), {'metric_type': 'L2', 'params': {'nprobe': 16}})
+        self.assertEqual(handler.search_params({'nprobe': 64}), {'metric_type': 'L2', 'params': {'nprobe': 64}})
+
+        handler.config['index_params'] = {'index_type': 'HNSW', 'metric_type': 'IP', 'params': {'M': 16}}
+        self.assertEqual(handler.search_params(top_k=100), {'metric_type': 'IP', 'params': {'ef': 100}})
+
+    def test_ensure_index_builds_missing_and_rebuilds_on_request(self):
+        handler = self.make_handler({'milvus': {'index_params': {'index_type': 'HNSW', 'metric_type': 'L2',
+                                                                 'params': {'M': 16, 'efConstruction': 200}}}},
+                                    collection=MagicMock)
+        collection = MagicMock(indexes=[])
+        handler.ensure_index(collection)
+        collection.create_index.assert_called_once()
+
+        collection = MagicMock(indexes=[MagicMock(params={
+            'index_type': 'IVF_FLAT', 'metric_type': 'L2', 'params': {'nlist': '128'}
+        })])
+        handler.ensure_index(collection)
+        collection.create_index.assert_not_called()
+        handler.ensure_index(collection, rebuild=True)
+        collection.drop_index.assert_called_once()
+        self.assertEqual(collection.create_index.call_args.kwargs['index_params']['index_type'], 'HNSW')
+
+        collection = MagicMock(indexes=[MagicMock(params={
+            'index_type': 'HNSW', 'metric_type': 'L2', 'params': {'M': '16', 'efConstruction': '200'}
+        })])
+        handler.ensure_index(collection, rebuild=True)
+        collection.drop_index.assert_not_called()
+
+
+class TestAsyncRetrieval(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, handler_factory):
+        self.make_handler = handler_factory
+
+    def setUp(self):
+        self.handler = self.make_handler(collection=FakeCollection)
+        self.embedded = []
+        self.handler._embed = lambda texts: self.embedded.append(list(texts)) or [[0.0] * 4 for _ in texts]
+        self.addCleanup(self.handler.close)
+
+        def search_documents(query, top_k=10, filters=None, collection_name="peripheral_docs", search_params=None):
+            self.handler._embed_query(query)
+            time.sleep(0.2)  # Milvus round trip
+            return [{"id": query, "score": 0.0}]
+        self.handler.search_documents = search_documents
+
+    def test_gathered_queries_take_as_long_as_one(self):
+        queries = ["UART registers", "UART interrupts", "UART clocks", "UART FIFO"]
+        ticks = []
+
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        async def run():
+            start = time.perf_counter()
+            results, _ = await asyncio.gather(self.handler.asearch_many(queries, top_k=3), ticker())
+            return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(run())
+
+        self.assertEqual([r[0]["id"] for r in results], queries)
+        self.assertLess(elapsed, 0.5)
+        # Sub-queries are embedded in one batch, and the loop kept running
+        self.assertEqual(self.embedded, [queries])
+        self.assertEqual(len(ticks), 5)
+
+
+class TestHandlerLifecycle(unittest.TestCase):
+    @pytest.fixture(autouse=True)
+    def _fixtures(self, write_config):
+        self.config_path = write_config({'milvus': {'host': 'localhost', 'port': 19530}})
+
+    def setUp(self):
+        patchers = [
+            patch('milvus_rag_handler.connections'),
+            patch('milvus_rag_handler.MilvusRAGHandler._init_collection', side_effect=lambda name: FakeCollection())
+        ]
+        self.connections = patchers[0].start()
+        self.init_collection = patchers[1].start()
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        self.addCleanup(close_handlers)
+
+    def test_registry_shares_one_handler_per_config(self):
+        handler = get_handler(self.config_path)
+
+        self.assertIs(get_handler(self.config_path), handler)
+        self.assertEqual(self.init_collection.call_count, 2)
+        self.connections.connect.assert_called_once()
+
+        close_handlers()
+        self.connections.disconnect.assert_called_once_with("default")
+        self.assertFalse(handler.connected)
+        self.assertIsNot(get_handler(self.config_path), handler)
+
+    def test_connection_is_released_by_the_last_handler(self):
+        first = MilvusRAGHandler(self.config_path)
+        second = MilvusRAGHandler(self.config_path)
+        self.connections.connect.assert_called_once()
+
+        first.close()
+        first.close()
+        self.connections.disconnect.assert_not_called()
+        second.close()
+        self.connections.disconnect.assert_called_once_with("default")
+
+        # An explicitly reconnected handler opens the connection again
+        first.connect()
+        self.assertEqual(self.connections.connect.call_count, 2)
+        self.assertTrue(first.connected)
+        first.close()
+
+    def test_concurrent_connect_loads_collections_once(self):
+        handler = MilvusRAGHandler(self.config_path)
+        handler.close()
+        self.init_collection.reset_mock()
+
+        threads = [threading.Thread(target=handler.connect) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.init_collection.call_count, 2)
+        handler.close()
+        self.assertEqual(self.connections.disconnect.call_count, 2)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file